@@ -0,0 +1,148 @@
+# MIT License
+# Copyright (c) 2016 https://github.com/sndnv
+# See the project's LICENSE file for the full text
+
+"""
+Runs a distributed build of generated sources with several local workers ('utils.Distributed.WorkerServer' on
+127.0.0.1) and checks that the jobs are spread over all workers and that, once a worker is stopped, its jobs are
+compiled locally (and all objects are still produced).
+
+Usage:
+    python benchmarks/distributed.py [workers count] [files count] [compiler]
+"""
+
+import collections
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from multiprocessing.pool import ThreadPool
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from cadb.utils import Distributed
+
+Source = collections.namedtuple('Source', ['file_path', 'object_file_path'])
+
+
+class JobCounter(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.jobs = collections.Counter()
+
+    def emit(self, record):
+        # records are emitted while holding the handler's lock, so the counter is never updated concurrently
+        if record.getMessage().startswith("Compiled job"):
+            self.jobs[record.name] += 1
+
+
+def create_sources(sources_dir, files_count):
+    sources = []
+    for index in range(files_count):
+        file_path = os.path.join(sources_dir, "file_{0}.cpp".format(index))
+        with open(file_path, "w") as source_file:
+            source_file.write(
+                "#include <string>\n"
+                "std::string function_{0}(int value) {{ return std::to_string(value * {0}); }}\n".format(index)
+            )
+        sources.append(Source(file_path, os.path.splitext(file_path)[0] + ".o"))
+
+    return sources
+
+
+def start_worker(name, token, counter):
+    logger = logging.getLogger("worker_{0}".format(name))
+    logger.propagate = False
+    logger.addHandler(counter)
+    logger.setLevel(logging.INFO)
+
+    server = Distributed.WorkerServer("127.0.0.1:0", 1, logger, token)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return logger.name, server
+
+
+def run_build(executor, sources, compiler_config):
+    for source in sources:
+        if os.path.isfile(source.object_file_path):
+            os.remove(source.object_file_path)
+
+    start = time.perf_counter()
+    pool = ThreadPool(processes=executor.slots)
+    try:
+        results = pool.map(lambda source: executor.compile_object_timed(source, compiler_config), sources)
+    finally:
+        pool.close()
+        pool.join()
+
+    failed = [source.file_path for source, result in zip(sources, results) if result[0] != 0]
+    missing = [source.file_path for source in sources if not os.path.isfile(source.object_file_path)]
+    return time.perf_counter() - start, failed, missing
+
+
+def main():
+    workers_count = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    files_count = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    compiler_config = {'path': sys.argv[3] if len(sys.argv) > 3 else "g++", 'options': ["-c", "-O1"]}
+
+    logger = logging.getLogger("build")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    token = uuid.uuid4().hex
+    counter = JobCounter()
+    workers = [start_worker(index, token, counter) for index in range(workers_count)]
+    addresses = {name: "127.0.0.1:{0}".format(server.server_address[1]) for name, server in workers}
+
+    sources_dir = tempfile.mkdtemp(prefix="cadb_distributed_")
+    errors = []
+    try:
+        sources = create_sources(sources_dir, files_count)
+
+        for stopped in [[], workers[:1]]:
+            for name, server in stopped:
+                server.shutdown()
+                server.server_close()
+
+            counter.jobs.clear()
+            executor = Distributed.Executor(
+                [{'address': address} for address in addresses.values()], 1, logger, token=token
+            )
+            duration, failed, missing = run_build(executor, sources, compiler_config)
+            remote = sum(counter.jobs.values())
+            stopped_names = [name for name, _ in stopped]
+
+            print("Workers: [{0}], stopped: [{1}], files: [{2}], time: [{3:.2f}] s".format(
+                workers_count, len(stopped), files_count, duration
+            ))
+            for name in sorted(addresses):
+                print("    {0:<10} {1:<17} {2:>4} job(s){3}".format(
+                    name, addresses[name], counter.jobs[name], " (stopped)" if name in stopped_names else ""
+                ))
+            print("    {0:<28} {1:>4} job(s)".format("local", files_count - remote))
+
+            if len(failed) > 0 or len(missing) > 0:
+                errors.append("failed: [{0}], missing objects: [{1}]".format(len(failed), len(missing)))
+            idle = [name for name in addresses if name not in stopped_names and counter.jobs[name] == 0]
+            if len(idle) > 0:
+                errors.append("no jobs sent to running worker(s) [{0}]".format(", ".join(sorted(idle))))
+            stopped_addresses = sorted(addresses[name] for name in stopped_names)
+            if len(stopped) > 0 and sorted(executor.failed_workers) != stopped_addresses:
+                errors.append("unexpected failed workers [{0}]".format(", ".join(sorted(executor.failed_workers))))
+    finally:
+        for _, server in workers[1:]:
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(sources_dir, ignore_errors=True)
+
+    for error in errors:
+        print("Error: {0}".format(error))
+
+    sys.exit(1 if len(errors) > 0 else 0)
+
+
+if __name__ == '__main__':
+    main()
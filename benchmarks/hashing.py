@@ -0,0 +1,72 @@
+# MIT License
+# Copyright (c) 2016 https://github.com/sndnv
+# See the project's LICENSE file for the full text
+
+"""
+Compares the throughput of the hash algorithms supported by 'utils.FileSystem.get_file_hash', for a small file
+(read in chunks) and for a large file (memory-mapped and, for comparison, read in chunks).
+
+Usage:
+    python benchmarks/hashing.py [small file size in KB] [large file size in MB] [repetitions]
+"""
+
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from cadb.utils import FileSystem
+
+
+def create_file(size):
+    file_descriptor, path = tempfile.mkstemp(suffix=".cpp")
+    with os.fdopen(file_descriptor, "wb") as data_file:
+        data_file.write(os.urandom(size))
+    return path
+
+
+def main():
+    small_size = int(sys.argv[1]) * 1024 if len(sys.argv) > 1 else 64 * 1024
+    large_size = int(sys.argv[2]) * 1024 * 1024 if len(sys.argv) > 2 else 64 * 1024 * 1024
+    repetitions = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    paths = [create_file(small_size), create_file(large_size)]
+    try:
+        for path in paths:
+            size = os.path.getsize(path)
+            number = max(1, (16 * 1024 * 1024) // size)
+            modes = [("chunked", sys.maxsize)]
+            if size >= FileSystem.MMAP_THRESHOLD:
+                modes.append(("mmap", FileSystem.MMAP_THRESHOLD))
+
+            print("File: [{0:.2f}] MB".format(size / 1024 / 1024))
+            for algorithm in sorted(FileSystem.HASH_ALGORITHMS):
+                try:
+                    FileSystem.get_file_hash(path, algorithm)
+                except ValueError as e:
+                    print("    {0:<10} skipped: {1}".format(algorithm, e))
+                    continue
+
+                for mode, threshold in modes:
+                    best = min(
+                        timeit.repeat(
+                            lambda: FileSystem.get_file_hash(path, algorithm, threshold),
+                            number=number,
+                            repeat=repetitions
+                        )
+                    ) / number
+                    print("    {0:<10} {1:<8} {2:>10.3f} ms  {3:>10.1f} MB/s".format(
+                        algorithm,
+                        mode,
+                        best * 1000,
+                        size / 1024 / 1024 / best
+                    ))
+    finally:
+        for path in paths:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
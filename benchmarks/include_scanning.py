@@ -0,0 +1,95 @@
+# MIT License
+# Copyright (c) 2016 https://github.com/sndnv
+# See the project's LICENSE file for the full text
+
+"""
+Compares the whole-buffer include scanner (utils.Includes.scan_includes) with the per-line loop that was
+previously used by 'SourceFile'.
+
+Usage:
+    python benchmarks/include_scanning.py [lines count] [repetitions]
+"""
+
+import os
+import re
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from cadb.utils import Includes
+
+PATTERN_DIRECTIVES = re.compile(r"^(#.+)")
+PATTERN_INCLUDES = re.compile(r"^#include (.+)")
+
+
+def per_line_loop(path):
+    includes = []
+    with open(path, "r") as current_file:
+        for current_line in current_file:
+            for _ in PATTERN_DIRECTIVES.findall(current_line):
+                includes.extend(PATTERN_INCLUDES.findall(current_line))
+    return includes
+
+
+def whole_buffer(path, stop_at_code=False):
+    with open(path, "r") as current_file:
+        return Includes.scan_includes(current_file.read(), stop_at_code)
+
+
+def create_source_file(lines_count):
+    header = [
+        "// Generated benchmark file",
+        "#include <string>",
+        "#include <vector>",
+        "#include \"some/header.h\"",
+        "/* #include \"commented/out.h\" */",
+        "#ifdef SOME_FLAG",
+        "#  include <map>",
+        "#endif",
+        ""
+    ]
+
+    body = [
+        "int function_{0}(int value) {{",
+        "    // some comment about the value",
+        "    const char* text = \"/* not a comment */\";",
+        "    return value * {0} + static_cast<int>(sizeof(text));",
+        "}}",
+        ""
+    ]
+
+    lines = list(header)
+    while len(lines) < lines_count:
+        lines.extend(line.format(len(lines)) for line in body)
+
+    file_descriptor, path = tempfile.mkstemp(suffix=".cpp")
+    with os.fdopen(file_descriptor, "w") as source_file:
+        source_file.write("\n".join(lines))
+
+    return path
+
+
+def main():
+    lines_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    repetitions = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    path = create_source_file(lines_count)
+    try:
+        results = [
+            ("per-line loop", lambda: per_line_loop(path)),
+            ("whole-buffer scan", lambda: whole_buffer(path)),
+            ("whole-buffer scan (stop at code)", lambda: whole_buffer(path, stop_at_code=True))
+        ]
+
+        print("File: [{0}] lines, [{1:.2f}] MB".format(lines_count, os.path.getsize(path) / 1024 / 1024))
+        for name, function in results:
+            best = min(timeit.repeat(function, number=1, repeat=repetitions))
+            print("{0:<35} {1:>8.2f} ms  (includes found: {2})".format(name, best * 1000, len(function())))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,12 +4,16 @@
 
 import logging
 import multiprocessing
+import os
 import sys
+import threading
 from datetime import datetime
 from getopt import getopt, GetoptError
+from multiprocessing.pool import ThreadPool
 
 from cadb.data import Processing
-from cadb.utils import Config, Database, Build, Graph, Interactive, Stats
+from cadb.data.UnityGroup import UnityGroup
+from cadb.utils import Config, Database, Build, Distributed, Graph, Interactive, RemoteCache, Stats
 from cadb.utils.Types import SourceType
 
 usageMessage = """
@@ -20,7 +24,13 @@ Usage:
     cadb clean          --build <build name>
     cadb clean,build    --build <build name>
     cadb clean,build    --build <build name> [--source-file <path>] [--config-data <data>] [--config-file <path>]
+    cadb build          --build <build name> --shard <index/count> [--artifact-dir <path>]
+    cadb merge          --build <build name> [--artifact-dir <path>]
+    cadb check          --build <build name> [--source-file <path>] [--replay-diagnostics]
+    cadb build          --build <build name> --replay-diagnostics
     cadb interactive    --build <build name> [--source-file <path>] [--config-data <data>] [--config-file <path>]
+    cadb worker         [--listen <host:port>] [--slots <count>]
+    cadb cache-server   [--listen <host:port>] [--cache-dir <path>] [--read-only]
     cadb help
 
 Actions:
@@ -29,14 +39,32 @@ Actions:
 
     build       If '--source-file' is NOT specified, compile all files that have changed since the last build and link
                 them into an executable. If '--source-file' is specified, compile only that file; no linking is done.
+                If '--shard' is specified, compile only this machine's part of the changed files and store their
+                object files in the directory set with '--artifact-dir'; no linking is done.
+    check       Check all files that would be compiled by 'build' (changed files and the files that include changed
+                headers; or only '--source-file', if specified) for errors, without producing object files or
+                linking ('-fsyntax-only'); the diagnostics are reported grouped by the file they refer to.
+    merge       Combine the object files and database entries stored by all shards of a sharded build (see
+                '--shard') and link them.
     clean       If '--source-file' is NOT specified, remove all object files and the target executable, if they exist.
                 If '--source-file' is specified, remove only that file.
     deps        If '--source-file' is NOT specified, generate a dependency table for all sources. If '--source-file' is
-                specified, generate a dependency table only for that file.
+                specified, generate a dependency table only for that file. If '--transitive' is specified, dependencies
+                included indirectly (through other internal dependencies) are listed as well.
     graph       If '--source-file' is NOT specified, generate a Graphviz '.dot' file representing the dependencies of
                 all sources. If '--source-file' is specified, generate a Graphviz '.dot' file only for that source.
-    stats       Show information about all source files ('--source-file' value is ignored).
+    impact      Show all implementation files that need to be rebuilt if the file set with '--source-file' (required)
+                is modified.
+    stats       Show information about all source files, including the rebuild cost of changing each header and the
+                stored compiler warnings of up-to-date files ('--source-file' value is ignored).
     help        Show this message.
+    worker      Starts a compilation worker, for distributed builds (see the 'distributed' build option); the worker
+                compiles preprocessed sources sent by other machines and cannot be combined with other actions. The
+                'CADB_WORKER_TOKEN' environment variable must be set to a shared secret, which is also set for all
+                builds that use the worker.
+    cache-server
+                Starts a reference remote cache server (see the 'remoteCache' build option), storing objects in the
+                directory set with '--cache-dir'; cannot be combined with other actions.
     interactive Starts an interactive session; '--source-file' is passed to the session as part of the 'options' dict
                 and can be used by any of the available commands (run 'help' or 'help <command>' in the interactive
                 session to see more information).
@@ -45,7 +73,11 @@ Options:
     The options can be specified in any order, with each one directly followed by its value (separated by whitespace).
 
     --build         <build name>    (required)  Specifies the build configuration name to be used (as defined in the
-                                                configuration file/data).
+                                                configuration file/data). Multiple names can be separated with
+                                                commas ('dev,prod') and 'all' selects all configurations; they
+                                                share a single scan of the sources (if their source paths,
+                                                extensions, include paths and change detection match) and
+                                                their builds are run at the same time, in a shared pool.
     --source-file   <path>          (optional)  Sets the source file with which to work (see each action for more
                                                 information on how they use this option).
     --config-data   <data>          (optional)  Sets additional config data to be merged with what is set in the
@@ -55,14 +87,43 @@ Options:
                                                 {'a': {'b': {'c': 123}}}. Multiple piece of data can be separated with
                                                 commas: 'a.b=123,a.c="d"' (resulting in {'a': {'b': 123, 'c': 'd'}}).
     --config-file   <path>          (optional)  Sets the configuration file to be used (default: './config/core.conf').
+    --transitive                    (optional)  Makes the 'deps' action include transitive dependencies.
+    --orphans                       (optional)  Makes the 'clean' action only remove the object files (and other
+                                                produced files) of sources that no longer exist, the directories
+                                                left empty and their database entries (see 'pruneOrphans').
+    --listen        <host:port>     (optional)  Sets the address on which the 'worker' action listens for jobs
+                                                (default: '127.0.0.1:8765') or the 'cache-server' action listens
+                                                for requests (default: '127.0.0.1:8766').
+    --slots         <count>         (optional)  Sets the number of jobs the 'worker' action compiles at the same time
+                                                (default: the number of CPUs).
+    --cache-dir     <path>          (optional)  Sets the directory in which the 'cache-server' action stores objects
+                                                (default: './cadb_cache').
+    --read-only                     (optional)  Makes the 'cache-server' action reject all new objects.
+    --shard         <index/count>   (optional)  Makes the 'build' action compile only one part (for example, '2/4'),
+                                                out of 'count' parts with similar compile costs, of the files that
+                                                need to be rebuilt; used for splitting a build over several machines.
+    --artifact-dir  <path>          (optional)  Sets the directory in which the 'build' action stores the outputs of
+                                                its shard and from which the 'merge' action reads the outputs of all
+                                                shards (default: '<build dir>/cadb_shards').
+    --replay-diagnostics            (optional)  Makes the 'build' and 'check' actions also show the compiler messages
+                                                (warnings) stored for all up-to-date files, without compiling them
+                                                again. The 'stats' action always shows the stored warnings.
 
 Examples:
     cadb clean          --build prod
     cadb build          --build prod
     cadb clean,build    --build prod
     cadb clean,build    --build dev --source-file "/home/myUser/repos/awesome_app/src/main/main.cpp"
+    cadb impact         --build dev --source-file "/home/myUser/repos/awesome_app/src/main/utils.h"
+    cadb deps           --build dev --transitive
+    cadb clean          --build dev --orphans
     cadb build          --build dev --config-data "builds.dev.options.parallel=False,builds.dev.compiler.path=\"g++\""
     cadb build          --build dev --config-file "/home/myUser/repos/awesome_app/config/dev.conf"
+    cadb clean,build    --build dev,prod
+    cadb worker         --listen 127.0.0.1:8765 --slots 8
+    cadb cache-server   --listen 0.0.0.0:8766 --cache-dir "/var/cache/cadb"
+    cadb build          --build prod --shard 1/4 --artifact-dir "/tmp/shards"
+    cadb merge          --build prod --artifact-dir "/tmp/shards"
     cadb help
 
 Notes:
@@ -73,11 +134,10 @@ Notes:
 """
 
 
-def build_action(config, options, db, sources, logger):
+def build_action(config, options, db, sources, logger, shared_pool=None):
     build_config = config['builds'][options['build']]
     general_options = build_config['options']
     compiler_config = build_config['compiler']
-    linker_config = build_config['linker']
 
     # runs pre-compile commands
     pre_compile_commands = build_config['pre']['compile']
@@ -86,53 +146,257 @@ def build_action(config, options, db, sources, logger):
             "Running [{0}] pre-compile command(s) ...".format(len(pre_compile_commands)),
             extra={'action': 'build'}
         )
-        for current_command in pre_compile_commands:
-            Build.process_external_command(current_command, logger)
+        run_hooks('pre-compile', pre_compile_commands, build_config, db, logger)
     else:
         logger.info("No pre-compile commands defined", extra={'action': 'build'})
 
     # gathers sources for re-build
-    rebuild_sources = []
-    if 'source-file' in options:
-        requested_file = options['source-file']
-        if requested_file in sources:
-            requested_source = sources[requested_file]
-            if requested_source.file_type == SourceType.Implementation:
-                rebuild_sources = [requested_source]
+    rebuild_sources = Processing.select_rebuild_sources(sources, options.get('source-file'))
+    if 'source-file' not in options:
+        for source in sources.values():
+            if source.file_type == SourceType.Header:
+                db[source.file_path] = source.file_hash
+
+    # prepares the precompiled header (if enabled)
+    precompiled_header_config = general_options.get('precompiledHeader', {})
+    precompiled_header_path = None
+    precompiled_header_users = set()
+    precompiled_header_rebuilt = False
+    if precompiled_header_config.get('enabled', False) is True:
+        external_headers, internal_headers, users = Processing.select_precompiled_headers(
+            sources,
+            precompiled_header_config.get('threshold', 0.75),
+            precompiled_header_config.get('internalHeaders', False)
+        )
+
+        recorded_precompiled_header = Database.get_metadata(db, 'precompiled_header')
+        if len(users) > 0:
+            header_path = Build.get_precompiled_header_path(build_config['paths']['build'])
+            header_content = Build.get_precompiled_header_content(external_headers, internal_headers)
+            header_key = Processing.get_precompiled_header_key(header_content, compiler_config)
+
+            if Processing.is_precompiled_header_valid(recorded_precompiled_header, header_key, header_path):
+                logger.info("Precompiled header is up to date", extra={'action': 'build'})
+                precompiled_header_path = header_path
+                precompiled_header_users = set(users)
+                recorded_precompiled_header['users'] = users
             else:
-                raise ValueError(
-                    "Failed to compile single source file [{0}]; type [{1}] is not supported".format(
-                        requested_file,
-                        requested_source.file_type
-                    )
+                logger.info(
+                    "Compiling precompiled header [{0}] with [{1}] header(s) for [{2}] source files ...".format(
+                        header_path,
+                        len(external_headers) + len(internal_headers),
+                        len(users)
+                    ),
+                    extra={'action': 'build'}
                 )
-    else:
-        for source in sources.values():
-            if source.file_type == SourceType.Implementation:
-                object_file_exists = Build.object_file_exists(source.object_file_path)
 
-                if source.has_changed or not object_file_exists:
-                    rebuild_sources.append(source)
+                previous_users = set(recorded_precompiled_header.get('users', []))
+                Build.write_precompiled_header(header_path, header_content)
+                return_code, stdout, stderr = Build.compile_precompiled_header(header_path, compiler_config)
+
+                if len(stderr) > 0:
+                    logger.error("[{0}]: {1}".format(header_path, stderr), extra={'action': 'build'})
+
+                if return_code == 0:
+                    Processing.record_precompiled_header(db, header_key, header_path, users)
+                    precompiled_header_path = header_path
+                    precompiled_header_users = set(users)
+                    precompiled_header_rebuilt = True
+
+                    # all files compiled with the previous header or to be compiled with the new one are rebuilt
+                    if 'source-file' not in options:
+                        queued_sources = {source.file_path for source in rebuild_sources}
+                        for current in sorted((previous_users | precompiled_header_users) - queued_sources):
+                            if current in sources and sources[current].file_type == SourceType.Implementation:
+                                rebuild_sources.append(sources[current])
+
+                    logger.info("... precompiled header compiled successfully", extra={'action': 'build'})
                 else:
-                    for c in source.internal_dependencies:
-                        current_dependency = sources[c]
-                        if current_dependency.has_changed:
-                            rebuild_sources.append(source)
-                            break
-            elif source.file_type == SourceType.Header:
-                db[source.file_path] = source.file_hash
-            else:
-                raise ValueError(
-                    "Unexpected source type encountered: [{0}] for file [{1}]".format(
-                        source.file_type,
-                        source.file_path
+                    recorded_precompiled_header.clear()
+                    logger.error(
+                        "... precompiled header compilation failed with return code [{0}]; "
+                        "continuing without it".format(return_code),
+                        extra={'action': 'build'}
                     )
+        else:
+            recorded_precompiled_header.clear()
+            logger.info("No headers found for precompiling", extra={'action': 'build'})
+
+    # groups sources for a unity build (if enabled)
+    unity_config = general_options.get('unity', {})
+    unity_groups = None
+    if unity_config.get('enabled', False) is True and 'source-file' not in options and 'shard' not in options:
+        compile_costs, _ = Processing.estimate_compile_costs(sources, Database.get_metadata(db, 'compile_times'))
+        unity_groups, individual_files = Processing.prepare_unity_build(
+            unity_config,
+            Build.get_unity_dir(build_config['paths']['build']),
+            db,
+            sources,
+            compile_costs
+        )
+
+        rebuild_sources = [source for source in rebuild_sources if source.file_path in individual_files]
+        for group in unity_groups.values():
+            group_rewritten = Build.write_unity_file(group)
+            if group_rewritten or not Build.object_file_exists(group.object_file_path) or any(
+                    member.has_changed
+                    or Processing.has_changed_dependencies(member, sources)
+                    or (precompiled_header_rebuilt and member.file_path in precompiled_header_users)
+                    for member in group.members
+            ):
+                rebuild_sources.append(group)
+
+        logger.info(
+            "Unity build with [{0}] group(s) and [{1}] individual file(s)".format(
+                len(unity_groups),
+                len(individual_files)
+            ),
+            extra={'action': 'build'}
+        )
+
+    # selects the sources of this machine's shard (if sharded)
+    shard = get_shard(options)
+    if shard is not None:
+        shard_index, shard_count = shard
+        compile_costs, _ = Processing.estimate_compile_costs(sources, Database.get_metadata(db, 'compile_times'))
+        shards = Processing.partition_shards(rebuild_sources, compile_costs, shard_count)
+
+        logger.info(
+            "Shard [{0}/{1}] selected [{2}] out of [{3}] source files for re-build".format(
+                shard_index,
+                shard_count,
+                len(shards[shard_index - 1]),
+                len(rebuild_sources)
+            ),
+            extra={'action': 'build'}
+        )
+
+        rebuild_sources = shards[shard_index - 1]
+        shard_source_paths = [source.file_path for source in rebuild_sources]
+    else:
+        shard_source_paths = []
+
+    # retrieves objects from the remote cache (if enabled)
+    remote_cache_config = general_options.get('remoteCache', {})
+    remote_cache_enabled = remote_cache_config.get('enabled', False) is True
+    remote_cache_keys = {}
+    remote_cache_uploads = {}
+    if remote_cache_enabled:
+        build_digest = RemoteCache.get_build_digest(compiler_config)
+        precompiled_header_key = Database.get_metadata(db, 'precompiled_header').get('key', "")
+
+        for source in rebuild_sources:
+            if not isinstance(source, UnityGroup):
+                extra = precompiled_header_key if source.file_path in precompiled_header_users else ""
+                key, dependencies = Processing.get_object_cache_key(
+                    source,
+                    sources,
+                    build_config['paths']['sources'],
+                    build_digest,
+                    extra
                 )
+                remote_cache_keys[source.file_path] = (key, dependencies, extra)
+
+        cached_objects, cache_errors = RemoteCache.fetch_cached_objects(
+            remote_cache_config,
+            [key for key, _, _ in remote_cache_keys.values()],
+            build_config['paths']['sources']
+        )
+
+        if len(cache_errors) > 0:
+            logger.warning(
+                "Failed to retrieve [{0}] object(s) from remote cache: [{1}]".format(
+                    len(cache_errors),
+                    cache_errors[0]
+                ),
+                extra={'action': 'build'}
+            )
+
+        if len(cached_objects) > 0:
+            recorded_dependencies = Database.get_metadata(db, 'dependencies')
+            remaining_sources = []
+            for source in rebuild_sources:
+                key, dependencies, extra = remote_cache_keys.get(source.file_path, (None, None, None))
+                if key in cached_objects:
+                    Build.create_object_file_dir(source.object_file_path)
+                    with open(source.object_file_path, "wb") as object_file:
+                        object_file.write(cached_objects[key])
+
+                    db[source.file_path] = source.file_hash
+                    Processing.record_object_cache_key(db, source, key, dependencies, extra)
+                    Processing.record_artifacts(db, source.file_path, [source.object_file_path])
+
+                    # no dependency file is available, so the file's includes are scanned again by the next build
+                    recorded_dependencies.pop(source.file_path, None)
+                    Processing.record_diagnostics(db, source.file_path, "", "")
+                else:
+                    remaining_sources.append(source)
+
+            logger.info(
+                "Retrieved [{0}] out of [{1}] object(s) from remote cache".format(
+                    len(rebuild_sources) - len(remaining_sources),
+                    len(remote_cache_keys)
+                ),
+                extra={'action': 'build'}
+            )
+
+            rebuild_sources = remaining_sources
+            Database.store_files_db(build_config['paths']['database'], db)
+
+    # splits small sources into batches, compiled with a single compiler invocation each (if enabled)
+    batch_config = general_options.get('batch', {})
+    rebuild_batches = []
+    if batch_config.get('enabled', False) is True:
+        rebuild_batches, batched_remaining = Processing.process_compilation_batches(
+            [source for source in rebuild_sources if not isinstance(source, UnityGroup)],
+            batch_config.get('size', 8),
+            batch_config.get('maxFileSize', 16384),
+            key=lambda current: (
+                os.path.splitext(current.file_path)[1],
+                current.file_path in precompiled_header_users
+            )
+        )
+
+        rebuild_sources = batched_remaining + [
+            source for source in rebuild_sources if isinstance(source, UnityGroup)
+        ]
+
+    rebuild_count = len(rebuild_sources) + sum(len(batch) for batch in rebuild_batches)
+
+    compiled_paths = {source.file_path for batch in rebuild_batches for source in batch}
+    for source in rebuild_sources:
+        if isinstance(source, UnityGroup):
+            compiled_paths.update(member.file_path for member in source.members)
+        else:
+            compiled_paths.add(source.file_path)
 
     build_failed = False
 
+    compile_times = Database.get_metadata(db, 'compile_times')
+
+    dependency_files = general_options.get('dependencyFiles', False) is True
+    if dependency_files:
+        known_paths = {os.path.abspath(current): current for current in sources}
+    else:
+        known_paths = {}
+
+    def get_compilation_arguments(source_data):
+        if isinstance(source_data, UnityGroup):
+            members = source_data.members
+        else:
+            members = [source_data]
+
+        uses_precompiled_header = any(member.file_path in precompiled_header_users for member in members)
+
+        return (
+            source_data,
+            compiler_config,
+            dependency_files and not isinstance(source_data, UnityGroup),
+            precompiled_header_path if uses_precompiled_header else None
+        )
+
     def process_compilation_result(source_data, result):
-        return_code, stdout, stderr = result
+        return_code, stdout, stderr, compile_time = result
 
         if len(stdout) > 0:
             logger.info("[{0}]: {1}".format(source_data.file_path, stdout), extra={'action': 'build'})
@@ -148,7 +412,41 @@ def build_action(config, options, db, sources, logger):
                 extra={'action': 'build'}
             )
 
-            db[source_data.file_path] = source_data.file_hash
+            if isinstance(source_data, UnityGroup):
+                # the group's compile time is split between its members, based on their size
+                total_lines = max(sum(member.total_lines for member in source_data.members), 1)
+                members_stdout = Build.split_batch_messages(stdout, source_data.members)
+                members_stderr = Build.split_batch_messages(stderr, source_data.members)
+                for member in source_data.members:
+                    db[member.file_path] = member.file_hash
+                    compile_times[member.file_path] = round(compile_time * member.total_lines / total_lines, 3)
+                    Processing.record_diagnostics(
+                        db,
+                        member.file_path,
+                        members_stdout[member.file_path],
+                        members_stderr[member.file_path]
+                    )
+            else:
+                db[source_data.file_path] = source_data.file_hash
+                compile_times[source_data.file_path] = round(compile_time, 3)
+                Processing.record_diagnostics(db, source_data.file_path, stdout, stderr)
+
+                artifacts = [source_data.object_file_path]
+                if dependency_files:
+                    artifacts.append(Build.get_dependency_file_path(source_data.object_file_path))
+                Processing.record_artifacts(db, source_data.file_path, artifacts)
+
+                if source_data.file_path in remote_cache_keys:
+                    key, dependencies, extra = remote_cache_keys[source_data.file_path]
+                    Processing.record_object_cache_key(db, source_data, key, dependencies, extra)
+                    if remote_cache_config.get('readOnly', False) is not True:
+                        remote_cache_uploads[key] = source_data
+
+                if dependency_files and not Processing.record_compiler_dependencies(db, source_data, known_paths):
+                    logger.warning(
+                        "... no valid dependency file found for [{0}]".format(source_data.file_path),
+                        extra={'action': 'build'}
+                    )
         else:
             logger.error(
                 "... compilation failed with return code [{0}] for file [{1}]".format(
@@ -161,54 +459,188 @@ def build_action(config, options, db, sources, logger):
             nonlocal build_failed
             build_failed = True
 
+    def get_batch_compilation_arguments(batch):
+        return (
+            batch,
+            compiler_config,
+            build_config['paths']['build'],
+            dependency_files,
+            precompiled_header_path if batch[0].file_path in precompiled_header_users else None
+        )
+
+    def process_batch_compilation_results(batch, results):
+        for source_data, result in zip(batch, results):
+            process_compilation_result(source_data, result)
+
     # builds sources
-    if len(rebuild_sources) > 0:
-        if general_options.get('parallel', False) is True:
-            # does a parallel build
-            logger.info(
-                "Starting parallel build with [{0}] processes for [{1}] out of [{2}] source files ...".format(
-                    multiprocessing.cpu_count(),
-                    len(rebuild_sources),
-                    len(sources)
-                ),
-                extra={'action': 'build'}
-            )
+    distributed_config = general_options.get('distributed', {})
+    distributed_build = distributed_config.get('enabled', False) is True and len(
+        distributed_config.get('workers', [])
+    ) > 0
+
+    if rebuild_count > 0:
+        if distributed_build or general_options.get('parallel', False) is True:
+            if distributed_build:
+                # does a distributed build; the pool's threads only wait for the workers and local compilers
+                executor = Distributed.Executor(
+                    distributed_config['workers'],
+                    distributed_config.get('localSlots', multiprocessing.cpu_count()),
+                    logger,
+                    distributed_config.get('timeout', Distributed.DEFAULT_TIMEOUT),
+                    os.environ.get(Distributed.TOKEN_VARIABLE, "")
+                )
+
+                logger.info(
+                    "Starting distributed build with [{0}] worker(s) and [{1}] slots for [{2}] out of [{3}] "
+                    "source files ...".format(
+                        len(distributed_config['workers']),
+                        executor.slots,
+                        rebuild_count,
+                        len(sources)
+                    ),
+                    extra={'action': 'build'}
+                )
+
+                pool = ThreadPool(processes=executor.slots)
+                compile_batch_timed = executor.compile_batch_timed
+                compile_object_timed = executor.compile_object_timed
+            elif shared_pool is not None:
+                # does a parallel build, in a pool shared with other builds
+                logger.info(
+                    "Starting parallel build in shared pool for [{0}] out of [{1}] source files ...".format(
+                        rebuild_count,
+                        len(sources)
+                    ),
+                    extra={'action': 'build'}
+                )
+
+                pool = shared_pool
+                compile_batch_timed = Build.compile_batch_timed
+                compile_object_timed = Build.compile_object_timed
+            else:
+                # does a parallel build
+                logger.info(
+                    "Starting parallel build with [{0}] processes for [{1}] out of [{2}] source files ...".format(
+                        multiprocessing.cpu_count(),
+                        rebuild_count,
+                        len(sources)
+                    ),
+                    extra={'action': 'build'}
+                )
+
+                pool = multiprocessing.Pool(processes=multiprocessing.cpu_count())
+                compile_batch_timed = Build.compile_batch_timed
+                compile_object_timed = Build.compile_object_timed
+
+            compile_results = []
+            for batch in rebuild_batches:
+                for source in batch:
+                    Build.remove_object_file(source.object_file_path)
+                    Build.create_object_file_dir(source.object_file_path)
+                compile_results.append(pool.apply_async(
+                    compile_batch_timed,
+                    args=get_batch_compilation_arguments(batch),
+                    callback=lambda results, captured_batch=batch: process_batch_compilation_results(
+                        captured_batch,
+                        results
+                    )
+                ))
 
-            pool = multiprocessing.Pool(processes=multiprocessing.cpu_count())
             for source in rebuild_sources:
                 Build.remove_object_file(source.object_file_path)
                 Build.create_object_file_dir(source.object_file_path)
-                pool.apply_async(
-                    Build.compile_object,
-                    args=(source, compiler_config),
+                compile_results.append(pool.apply_async(
+                    compile_object_timed,
+                    args=get_compilation_arguments(source),
                     callback=lambda result, captured_source=source: process_compilation_result(captured_source, result)
-                )
+                ))
 
-            pool.close()
-            pool.join()
+            if pool is shared_pool:
+                # the results are set only after their callbacks complete
+                for compile_result in compile_results:
+                    compile_result.wait()
+            else:
+                pool.close()
+                pool.join()
         else:
             # does a sequential build
             logger.info(
                 "Starting sequential build for [{1}] out of [{2}] source files ...".format(
                     multiprocessing.cpu_count(),
-                    len(rebuild_sources),
+                    rebuild_count,
                     len(sources)
                 ),
                 extra={'action': 'build'}
             )
 
+            for batch in rebuild_batches:
+                for source in batch:
+                    Build.remove_object_file(source.object_file_path)
+                    Build.create_object_file_dir(source.object_file_path)
+                compile_results = Build.compile_batch_timed(*get_batch_compilation_arguments(batch))
+                process_batch_compilation_results(batch, compile_results)
+                if build_failed:
+                    break
+
             for source in rebuild_sources:
+                if build_failed:
+                    break
                 Build.remove_object_file(source.object_file_path)
                 Build.create_object_file_dir(source.object_file_path)
-                compile_result = Build.compile_object(source, compiler_config)
+                compile_result = Build.compile_object_timed(*get_compilation_arguments(source))
                 process_compilation_result(source, compile_result)
-                if build_failed:
-                    break
+
+        if len(remote_cache_uploads) > 0:
+            # the objects are stored with all headers used for them (including external ones), as reported by the
+            # compiler, so that they are only retrieved by clients with the same headers
+            def get_object_headers(source):
+                try:
+                    return Processing.get_object_headers(
+                        source,
+                        compiler_config,
+                        build_config['paths']['sources'],
+                        build_config['paths']['build']
+                    ), None
+                except ValueError as e:
+                    return None, str(e)
+
+            with ThreadPool(processes=multiprocessing.cpu_count()) as pool:
+                upload_headers = pool.map(get_object_headers, remote_cache_uploads.values())
+
+            cache_errors = [error for _, error in upload_headers if error is not None]
+            cache_errors.extend(
+                RemoteCache.store_cached_objects(
+                    remote_cache_config,
+                    {
+                        key: (source.object_file_path, headers)
+                        for (key, source), (headers, _) in zip(remote_cache_uploads.items(), upload_headers)
+                        if headers is not None
+                    },
+                    build_config['paths']['sources']
+                )
+            )
+            if len(cache_errors) > 0:
+                logger.warning(
+                    "Failed to store [{0}] out of [{1}] object(s) in remote cache: [{2}]".format(
+                        len(cache_errors),
+                        len(remote_cache_uploads),
+                        cache_errors[0]
+                    ),
+                    extra={'action': 'build'}
+                )
+            else:
+                logger.info(
+                    "Stored [{0}] object(s) in remote cache".format(len(remote_cache_uploads)),
+                    extra={'action': 'build'}
+                )
 
         Database.store_files_db(config['builds'][options['build']]['paths']['database'], db)
     else:
         logger.info("No new or updated sources found ...", extra={'action': 'build'})
 
+    if 'replay-diagnostics' in options and 'source-file' not in options:
+        replay_diagnostics(db, sources, compiled_paths, logger)
+
     if build_failed:
         logger.error("... build failed.", extra={'action': 'build'})
     else:
@@ -220,45 +652,162 @@ def build_action(config, options, db, sources, logger):
                 extra={'action': 'build'}
             )
 
-            for current_command in post_compile_commands:
-                Build.process_external_command(current_command, logger)
+            run_hooks('post-compile', post_compile_commands, build_config, db, logger)
         else:
             logger.info("... no post-compile commands defined ...", extra={'action': 'build'})
 
-        if 'source-file' not in options:
-            # runs pre-link commands
-            pre_link_commands = build_config['pre']['link']
-            if len(pre_link_commands) > 0:
-                logger.info(
-                    "... running [{0}] pre-link command(s) ...".format(len(pre_link_commands)),
-                    extra={'action': 'build'}
-                )
-
-                for current_command in pre_link_commands:
-                    Build.process_external_command(current_command, logger)
-            else:
-                logger.info("... no pre-link commands defined ...", extra={'action': 'build'})
-
-            Build.link_objects(sources, linker_config, logger)
+        if shard is not None:
+            shard_dir = Build.get_shard_dir(
+                options.get('artifact-dir', Build.get_shards_dir(build_config['paths']['build'])),
+                shard_index,
+                shard_count
+            )
+            shard_source_paths = [path for path in shard_source_paths if db.get(path) == sources[path].file_hash]
+            copied = Build.export_shard(
+                shard_dir,
+                Processing.get_shard_fragment(db, shard_source_paths),
+                build_config['paths']['build']
+            )
 
-            # run post-link commands
-            post_link_commands = build_config['post']['link']
-            if len(post_link_commands) > 0:
-                logger.info(
-                    "... running [{0}] post-link command(s) ...".format(len(post_link_commands)),
-                    extra={'action': 'build'}
-                )
-                for current_command in post_link_commands:
-                    Build.process_external_command(current_command, logger)
-            else:
-                logger.info("... no post-link commands defined ...", extra={'action': 'build'})
+            logger.info(
+                "... stored [{0}] file(s) of [{1}] source(s) in [{2}]; sharded build requested; linking "
+                "skipped ...".format(copied, len(shard_source_paths), shard_dir),
+                extra={'action': 'build'}
+            )
+        elif 'source-file' not in options:
+            link_stage(build_config, db, sources, unity_groups, logger)
         else:
             logger.info("... single file compilation requested; linking skipped ...", extra={'action': 'build'})
 
+        if general_options.get('pruneOrphans', False) is True and 'source-file' not in options and shard is None:
+            prune_orphans(config, options, db, sources, logger)
+
         logger.info("... build completed.", extra={'action': 'build'})
 
 
-def clean_action(config, options, _, sources, logger):
+def replay_diagnostics(db, sources, compiled_paths, logger):
+    cached_diagnostics = Processing.get_cached_diagnostics(db, sources, compiled_paths)
+    if len(cached_diagnostics) > 0:
+        logger.info(
+            "Replaying compiler messages of [{0}] up-to-date source files ...".format(len(cached_diagnostics)),
+            extra={'action': 'build'}
+        )
+
+        for source_path, stdout, stderr in cached_diagnostics:
+            if len(stdout) > 0:
+                logger.info("[{0}] (cached): {1}".format(source_path, stdout), extra={'action': 'build'})
+
+            if len(stderr) > 0:
+                logger.warning("[{0}] (cached): {1}".format(source_path, stderr), extra={'action': 'build'})
+    else:
+        logger.info("No compiler messages found for up-to-date source files", extra={'action': 'build'})
+
+
+def link_stage(build_config, db, sources, unity_groups, logger):
+    # runs pre-link commands
+    pre_link_commands = build_config['pre']['link']
+    if len(pre_link_commands) > 0:
+        logger.info(
+            "... running [{0}] pre-link command(s) ...".format(len(pre_link_commands)),
+            extra={'action': 'build'}
+        )
+
+        run_hooks('pre-link', pre_link_commands, build_config, db, logger)
+    else:
+        logger.info("... no pre-link commands defined ...", extra={'action': 'build'})
+
+    link_targets(build_config, db, sources, unity_groups, logger)
+
+    # run post-link commands
+    post_link_commands = build_config['post']['link']
+    if len(post_link_commands) > 0:
+        logger.info(
+            "... running [{0}] post-link command(s) ...".format(len(post_link_commands)),
+            extra={'action': 'build'}
+        )
+        run_hooks('post-link', post_link_commands, build_config, db, logger)
+    else:
+        logger.info("... no post-link commands defined ...", extra={'action': 'build'})
+
+
+def link_targets(build_config, db, sources, unity_groups, logger):
+    targets = Build.get_link_targets(build_config['linker'])
+
+    def link_target(target_config):
+        target_sources = Processing.select_target_sources(sources, build_config['paths']['sources'], target_config)
+        Build.link_objects(target_sources, target_config, logger, unity_groups)
+
+    if len(targets) > 1:
+        logger.info("... linking [{0}] targets ...".format(len(targets)), extra={'action': 'build'})
+
+    # links are independent of each other, so all targets are linked at the same time
+    with ThreadPool(min(len(targets), multiprocessing.cpu_count())) as pool:
+        results = {name: pool.apply_async(link_target, (target_config,)) for name, target_config in targets.items()}
+
+        errors = []
+        for name, result in results.items():
+            try:
+                result.get()
+                Processing.record_output(db, targets[name]['output']['name'])
+            except (RuntimeError, ValueError) as e:
+                if name is not None:
+                    logger.error("... linking target [{0}] failed: [{1}]".format(name, e), extra={'action': 'build'})
+                errors.append(e)
+
+    Database.store_files_db(build_config['paths']['database'], db)
+
+    if len(errors) > 0:
+        raise errors[0]
+
+
+def run_hooks(stage, commands, build_config, db, logger):
+    recorded = Database.get_metadata(db, 'hooks').setdefault(stage, {})
+    if Build.process_external_commands(commands, logger, recorded) > 0:
+        Database.store_files_db(build_config['paths']['database'], db)
+
+
+def prune_orphans(config, options, db, sources, logger):
+    build_config = config['builds'][options['build']]
+    build_dir = build_config['paths']['build']
+    output_files = [target['output']['name'] for target in Build.get_link_targets(build_config['linker']).values()]
+
+    orphaned_sources = Processing.find_orphaned_sources(db, sources)
+    orphaned_files = Processing.find_orphaned_artifacts(
+        db,
+        orphaned_sources,
+        sources,
+        build_config['paths']['sources'],
+        build_dir,
+        output_files,
+        build_config['implementationFileExtensions']
+    )
+
+    if len(orphaned_sources) > 0 or len(orphaned_files) > 0:
+        logger.info(
+            "Pruning [{0}] orphaned file(s) of [{1}] removed source(s) ...".format(
+                len(orphaned_files),
+                len(orphaned_sources)
+            ),
+            extra={'action': 'prune'}
+        )
+
+        removed_files, removed_dirs = Build.remove_files(orphaned_files, build_dir)
+        Processing.remove_orphaned_sources(db, orphaned_sources, output_files)
+        Database.store_files_db(build_config['paths']['database'], db)
+
+        logger.info(
+            "... removed [{0}] file(s) and [{1}] empty director(ies).".format(removed_files, removed_dirs),
+            extra={'action': 'prune'}
+        )
+    else:
+        logger.info("No orphaned files found", extra={'action': 'prune'})
+
+
+def clean_action(config, options, db, sources, logger):
+    if 'orphans' in options:
+        prune_orphans(config, options, db, sources, logger)
+        return
+
     target_object_files = []
 
     if 'source-file' in options:
@@ -280,24 +829,196 @@ def clean_action(config, options, _, sources, logger):
 
         for current_file in target_object_files:
             Build.remove_object_file(current_file)
+            Build.remove_object_file(Build.get_dependency_file_path(current_file))
             logger.info("... removed object file [{0}]".format(current_file), extra={'action': 'clean'})
 
         logger.info("... done.", extra={'action': 'clean'})
     else:
         logger.info("No object files found", extra={'action': 'clean'})
 
-    output_file = config['builds'][options['build']]['linker']['output']['name']
-    if Build.object_file_exists(output_file):
+    targets = Build.get_link_targets(config['builds'][options['build']]['linker'])
+    for output_file in [target['output']['name'] for target in targets.values()]:
+        if Build.object_file_exists(output_file):
+            logger.info(
+                "Removing output file [{0}] ...".format(output_file),
+                extra={'action': 'clean'}
+            )
+
+            Build.remove_object_file(output_file)
+            Build.remove_object_file(Build.get_archive_manifest_path(output_file))
+
+            logger.info("... done.", extra={'action': 'clean'})
+        else:
+            logger.info("No output file [{0}] found".format(output_file), extra={'action': 'clean'})
+
+    precompiled_header_path = Build.get_precompiled_header_path(config['builds'][options['build']]['paths']['build'])
+    if 'source-file' not in options and Build.object_file_exists(precompiled_header_path + ".gch"):
         logger.info(
-            "Removing output file [{0}] ...".format(output_file),
+            "Removing precompiled header [{0}] ...".format(precompiled_header_path),
             extra={'action': 'clean'}
         )
 
-        Build.remove_object_file(output_file)
+        Build.remove_object_file(precompiled_header_path + ".gch")
+        Build.remove_object_file(precompiled_header_path)
+        Build.remove_object_file(Build.get_dependency_file_path(precompiled_header_path))
 
         logger.info("... done.", extra={'action': 'clean'})
+
+    if 'source-file' not in options:
+        removed_unity_files = Build.remove_unity_files(config['builds'][options['build']]['paths']['build'])
+        if removed_unity_files > 0:
+            logger.info("Removed [{0}] unity build file(s)".format(removed_unity_files), extra={'action': 'clean'})
+
+
+def check_action(config, options, db, sources, logger):
+    compiler_config = config['builds'][options['build']]['compiler']
+    check_sources = Processing.select_rebuild_sources(sources, options.get('source-file'))
+
+    if 'replay-diagnostics' in options and 'source-file' not in options:
+        checked_paths = {source.file_path for source in check_sources}
+        cached_diagnostics = Processing.get_cached_diagnostics(db, sources, checked_paths)
     else:
-        logger.info("No output file found", extra={'action': 'clean'})
+        cached_diagnostics = []
+
+    if len(check_sources) == 0 and len(cached_diagnostics) == 0:
+        logger.info("No new or updated sources found", extra={'action': 'check'})
+        return
+
+    logger.info(
+        "Checking [{0}] out of [{1}] source files{2} ...".format(
+            len(check_sources),
+            len(sources),
+            " (with cached messages of [{0}] up-to-date files)".format(len(cached_diagnostics))
+            if len(cached_diagnostics) > 0 else ""
+        ),
+        extra={'action': 'check'}
+    )
+
+    with ThreadPool(processes=multiprocessing.cpu_count()) as pool:
+        results = pool.map(lambda source: Build.check_syntax(source, compiler_config), check_sources)
+
+    # the cached messages of up-to-date files (if replayed) are reported together with the new ones
+    for source_path, stdout, stderr in cached_diagnostics:
+        check_sources.append(sources[source_path])
+        results.append((0, stdout, stderr))
+
+    # diagnostics are grouped by the file they refer to, so that errors in a header are reported only once
+    diagnostics = {}
+    failed_sources = []
+    for source, (return_code, stdout, stderr) in zip(check_sources, results):
+        parsed = Build.parse_diagnostics(stdout + stderr)
+        for path, line, column, severity, message in parsed:
+            file_diagnostics = diagnostics.setdefault(path, [])
+            if (line, column, severity, message) not in file_diagnostics:
+                file_diagnostics.append((line, column, severity, message))
+
+        if return_code != 0:
+            failed_sources.append(source.file_path)
+            if len(parsed) == 0:
+                logger.error("[{0}]: {1}".format(source.file_path, stderr), extra={'action': 'check'})
+
+    errors_count = 0
+    warnings_count = 0
+    for path in sorted(diagnostics):
+        file_diagnostics = diagnostics[path]
+        file_errors = sum(1 for current in file_diagnostics if current[2] in ('error', 'fatal error'))
+        file_warnings = sum(1 for current in file_diagnostics if current[2] == 'warning')
+        errors_count += file_errors
+        warnings_count += file_warnings
+
+        message = "[{0}]: [{1}] error(s), [{2}] warning(s)\n{3}".format(
+            path,
+            file_errors,
+            file_warnings,
+            "\n".join(
+                "    {0}:{1}: {2}: {3}".format(line, column, severity, text)
+                for line, column, severity, text in file_diagnostics
+            )
+        )
+
+        if file_errors > 0:
+            logger.error(message, extra={'action': 'check'})
+        else:
+            logger.warning(message, extra={'action': 'check'})
+
+    if len(failed_sources) > 0:
+        logger.error(
+            "... check failed for [{0}] out of [{1}] source files with [{2}] error(s) and [{3}] warning(s).".format(
+                len(failed_sources),
+                len(check_sources),
+                errors_count,
+                warnings_count
+            ),
+            extra={'action': 'check'}
+        )
+    else:
+        logger.info(
+            "... check completed with [{0}] warning(s).".format(warnings_count),
+            extra={'action': 'check'}
+        )
+
+
+def merge_action(config, options, db, sources, logger):
+    build_config = config['builds'][options['build']]
+    build_dir = build_config['paths']['build']
+    shards_dir = options.get('artifact-dir', Build.get_shards_dir(build_dir))
+
+    shards = Build.find_shards(shards_dir)
+    if len(shards) == 0:
+        raise RuntimeError("No shards found in [{0}]".format(shards_dir))
+
+    shard_counts = sorted({shard_count for _, shard_count, _ in shards})
+    if len(shard_counts) > 1:
+        raise RuntimeError(
+            "Shards of builds with different shard counts [{0}] found in [{1}]".format(shard_counts, shards_dir)
+        )
+
+    shard_count = shard_counts[0]
+    missing_shards = sorted(set(range(1, shard_count + 1)) - {shard_index for shard_index, _, _ in shards})
+    if len(missing_shards) > 0:
+        raise RuntimeError(
+            "Shard(s) {0} out of [{1}] not found in [{2}]".format(missing_shards, shard_count, shards_dir)
+        )
+
+    logger.info("Merging [{0}] shard(s) from [{1}] ...".format(shard_count, shards_dir), extra={'action': 'merge'})
+
+    for shard_index, _, shard_dir in shards:
+        fragment, copied = Build.import_shard(shard_dir, build_dir)
+        Processing.merge_shard_fragment(db, fragment)
+        logger.info(
+            "... merged shard [{0}/{1}] with [{2}] source(s) and [{3}] file(s) ...".format(
+                shard_index,
+                shard_count,
+                len(fragment['files']),
+                copied
+            ),
+            extra={'action': 'merge'}
+        )
+
+    Database.store_files_db(build_config['paths']['database'], db)
+
+    not_built = sorted(
+        source.file_path for source in sources.values()
+        if source.file_type == SourceType.Implementation and (
+            db.get(source.file_path) != source.file_hash or not Build.object_file_exists(source.object_file_path)
+        )
+    )
+
+    if len(not_built) > 0:
+        raise RuntimeError(
+            "[{0}] source file(s) not built by any shard (for example, [{1}]); all shards must be built from the "
+            "same sources and database".format(len(not_built), not_built[0])
+        )
+
+    for source in sources.values():
+        if source.file_type == SourceType.Header:
+            db[source.file_path] = source.file_hash
+
+    Database.store_files_db(build_config['paths']['database'], db)
+
+    link_stage(build_config, db, sources, None, logger)
+
+    logger.info("... merge completed.", extra={'action': 'merge'})
 
 
 def deps_action(config, options, _, sources, logger):
@@ -317,7 +1038,14 @@ def deps_action(config, options, _, sources, logger):
 
     sources_dir = config['builds'][options['build']]['paths']['sources']
 
-    internal_dependencies, external_dependencies = Processing.process_dependencies(sources, requested_file)
+    if 'transitive' in options:
+        internal_dependencies, external_dependencies = Processing.process_transitive_dependencies(
+            sources,
+            requested_file
+        )
+    else:
+        internal_dependencies, external_dependencies = Processing.process_dependencies(sources, requested_file)
+
     data = [("Dependency", "Type", "Used By")]
 
     internal_dependencies_list = list(internal_dependencies.keys())
@@ -408,7 +1136,7 @@ def graph_action(config, options, _, sources, logger):
     )
 
 
-def stats_action(config, options, _, sources, logger):
+def stats_action(config, options, db, sources, logger):
     try:
         from terminaltables import AsciiTable
     except ImportError:
@@ -474,6 +1202,23 @@ def stats_action(config, options, _, sources, logger):
         key=lambda current: len(external_dependencies[current])
     )
 
+    compile_costs, costs_in_seconds = Processing.estimate_compile_costs(
+        sources,
+        Database.get_metadata(db, 'compile_times')
+    )
+    header_impact = Processing.process_header_impact(sources, compile_costs)
+    headers_by_impact = sorted(header_impact.keys(), key=lambda current: header_impact[current][1])
+
+    # the warnings of up-to-date files are taken from their last compilation, without running the compiler
+    warnings_by_file = {}
+    warnings_by_option = {}
+    for source_path, stdout, stderr in Processing.get_cached_diagnostics(db, sources):
+        for _, _, _, severity, message in Build.parse_diagnostics(stdout + stderr):
+            if severity == 'warning':
+                warnings_by_file[source_path] = warnings_by_file.get(source_path, 0) + 1
+                option = message.rsplit("[", 1)[-1].rstrip("]") if message.endswith("]") else "(other)"
+                warnings_by_option[option] = warnings_by_option.get(option, 0) + 1
+
     main_data = []
     main_data.extend(Stats.get_header_files_size_data(sources_dir, header_files_by_size, 10))
     main_data.extend(Stats.get_implementation_files_size_data(sources_dir, implementation_files_by_size, 10))
@@ -481,6 +1226,12 @@ def stats_action(config, options, _, sources, logger):
     main_data.extend(Stats.get_implementation_files_deps_data(sources_dir, implementation_files_by_deps_count, 10))
     main_data.extend(Stats.get_internal_deps_data(sources_dir, internal_deps_by_use_count, internal_dependencies, 10))
     main_data.extend(Stats.get_external_deps_data(external_deps_by_use_count, external_dependencies, 10))
+    main_data.extend(
+        Stats.get_header_impact_data(
+            sources_dir, headers_by_impact, header_impact, sum(compile_costs.values()), costs_in_seconds, 10
+        )
+    )
+    main_data.extend(Stats.get_cached_warnings_data(sources_dir, warnings_by_file, warnings_by_option, 10))
 
     main_table = AsciiTable(main_data)
     main_table.inner_heading_row_border = False
@@ -495,7 +1246,8 @@ def stats_action(config, options, _, sources, logger):
             ("Header Files", "{0:,}".format(header_files_count)),
             ("Implementation Files", "{0:,}".format(implementation_files_count)),
             ("Internal Dependencies", "{0:,}".format(internal_deps_count)),
-            ("External Dependencies", "{0:,}".format(external_deps_count))
+            ("External Dependencies", "{0:,}".format(external_deps_count)),
+            ("Cached Warnings", "{0:,}".format(sum(warnings_by_file.values())))
         ]
     )
     misc_table.inner_heading_row_border = False
@@ -509,6 +1261,81 @@ def stats_action(config, options, _, sources, logger):
     )
 
 
+def impact_action(config, options, _, sources, logger):
+    if 'source-file' not in options:
+        logger.error("A '--source-file' is required", extra={'action': 'impact'})
+        return
+
+    requested_file = options['source-file']
+    sources_dir = config['builds'][options['build']]['paths']['sources']
+    graph = Processing.get_dependency_graph(sources)
+
+    if requested_file not in graph:
+        logger.error(
+            "File [{0}] is not a known source or dependency".format(requested_file),
+            extra={'action': 'impact'}
+        )
+        return
+
+    impacted_names = [
+        current.replace(sources_dir, '~') for current in graph.get_impacted_implementations(requested_file)
+    ]
+    impacted_names.sort()
+
+    implementation_files_count = len(
+        [current for current in sources.values() if current.file_type == SourceType.Implementation]
+    )
+
+    logger.info(
+        "Modifying [{0}] requires rebuilding [{1}] out of [{2}] implementation files\n{3}".format(
+            requested_file.replace(sources_dir, '~'),
+            len(impacted_names),
+            implementation_files_count,
+            "\n".join(impacted_names)
+        ),
+        extra={'action': 'impact'}
+    )
+
+
+def worker_action(_, options, __, ___, logger):
+    address = options.get('listen', Distributed.DEFAULT_WORKER_ADDRESS)
+    slots = int(options.get('slots', multiprocessing.cpu_count()))
+
+    token = os.environ.get(Distributed.TOKEN_VARIABLE, "")
+
+    with Distributed.WorkerServer(address, slots, logger, token) as server:
+        logger.info(
+            "Worker listening on [{0}] with [{1}] slots ...".format(address, slots),
+            extra={'action': 'worker'}
+        )
+
+        try:
+            server.serve_forever()
+        finally:
+            logger.info("... worker stopped.", extra={'action': 'worker'})
+
+
+def cache_server_action(_, options, __, ___, logger):
+    address = options.get('listen', RemoteCache.DEFAULT_SERVER_ADDRESS)
+    cache_dir = options.get('cache-dir', RemoteCache.DEFAULT_SERVER_PATH)
+    read_only = 'read-only' in options
+
+    with RemoteCache.CacheServer(Distributed.parse_address(address), cache_dir, logger, read_only) as server:
+        logger.info(
+            "Cache server listening on [{0}] with objects in [{1}]{2} ...".format(
+                address,
+                cache_dir,
+                " (read-only)" if read_only else ""
+            ),
+            extra={'action': 'cache-server'}
+        )
+
+        try:
+            server.serve_forever()
+        finally:
+            logger.info("... cache server stopped.", extra={'action': 'cache-server'})
+
+
 def help_action(*_):
     print(usageMessage)
 
@@ -531,21 +1358,29 @@ def interactive_action(config, options, db, sources, logger):
 
 available_actions = {
     'build': build_action,
+    'check': check_action,
+    'merge': merge_action,
     'clean': clean_action,
     'deps': deps_action,
     'graph': graph_action,
     'stats': stats_action,
+    'impact': impact_action,
     'help': help_action,
-    'interactive': interactive_action
+    'interactive': interactive_action,
+    'worker': worker_action,
+    'cache-server': cache_server_action
 }
 
+# actions that do not need a build configuration and cannot be combined with other actions
+standalone_actions = ['worker', 'cache-server']
+
 
 def get_command_input():
     if len(sys.argv) == 2 and sys.argv[1] == 'help':
         help_action()
         sys.exit(0)
 
-    if len(sys.argv) < 3:
+    if len(sys.argv) < 3 and not (len(sys.argv) == 2 and sys.argv[1] in standalone_actions):
         print("Error: Not enough arguments supplied.")
         print(usageMessage)
         sys.exit(2)
@@ -559,7 +1394,14 @@ def get_command_input():
 
     options = {}
     try:
-        opts, _ = getopt(sys.argv[2:], '', ['build=', 'source-file=', 'config-data=', 'config-file='])
+        opts, _ = getopt(
+            sys.argv[2:],
+            '',
+            [
+                'build=', 'source-file=', 'config-data=', 'config-file=', 'transitive', 'listen=', 'slots=',
+                'cache-dir=', 'read-only', 'orphans', 'shard=', 'artifact-dir=', 'replay-diagnostics'
+            ]
+        )
         for currentOpt in opts:
             options[currentOpt[0].replace('--', '')] = currentOpt[1]
     except GetoptError as e:
@@ -567,14 +1409,46 @@ def get_command_input():
         print(usageMessage)
         sys.exit(2)
 
-    if 'build' not in options:
+    standalone_requested = [current for current in actions if current in standalone_actions]
+    if len(standalone_requested) > 0:
+        if len(actions) > 1:
+            print("Error: Action [" + standalone_requested[0] + "] cannot be combined with other actions.")
+            print(usageMessage)
+            sys.exit(2)
+    elif 'build' not in options:
         print("Error: '--build' is a required option.")
         print(usageMessage)
         sys.exit(2)
 
+    if 'shard' in options:
+        try:
+            get_shard(options)
+        except ValueError as e:
+            print("Error: " + str(e))
+            print(usageMessage)
+            sys.exit(2)
+
+        if 'source-file' in options:
+            print("Error: '--shard' cannot be combined with '--source-file'.")
+            print(usageMessage)
+            sys.exit(2)
+
     return actions, options
 
 
+def get_shard(options):
+    if 'shard' not in options:
+        return None
+
+    shard_index, _, shard_count = options['shard'].partition('/')
+    if not (shard_index.isdigit() and shard_count.isdigit() and 1 <= int(shard_index) <= int(shard_count)):
+        raise ValueError(
+            "Invalid shard [{0}]; expected '<index>/<count>' (for example, '1/4')".format(options['shard'])
+        )
+
+    return int(shard_index), int(shard_count)
+
+
 def get_config(options=None):
     config = Config.load_from_file(options.get('config-file', "config/core.conf"))
 
@@ -586,17 +1460,75 @@ def get_config(options=None):
     return config
 
 
-def main():
-    # gathers all config and data
-    actions, options = get_command_input()
-    config = get_config(options)
-    options.pop('config-data', None)
-    options.pop('config-file', None)
-    db = Database.load_files_db(config['builds'][options['build']]['paths']['database'])
-    sources = Processing.process_sources(config, options, db)
+def get_build_names(config, options):
+    if options['build'] == 'all':
+        return list(config['builds'])
 
-    # configures logging
-    logging_options = config['builds'][options['build']]['options']['logging']
+    build_names = options['build'].split(',')
+    for build_name in build_names:
+        if build_name not in config['builds']:
+            raise ValueError("Build configuration [{0}] is not defined".format(build_name))
+
+    return build_names
+
+
+class BuildLoggerAdapter(logging.LoggerAdapter):
+    def process(self, msg, kwargs):
+        return "[{0}] {1}".format(self.extra['build'], msg), kwargs
+
+
+def build_configurations(config, options, build_names, dbs, sources, logger):
+    """
+    Builds all specified configurations at the same time, compiling all of their sources in a single shared pool
+    (if any of them is a parallel build); each build keeps its own database and object files.
+
+    :param config: the config to be used
+    :param options: all user-supplied options
+    :param build_names: the names of the build configurations
+    :param dbs: the database of each build
+    :param sources: the source files of each build
+    :param logger: the object used for logging
+    :return: nothing
+    :raise: the first error raised by any of the builds
+    """
+    if any(config['builds'][build_name]['options'].get('parallel', False) is True for build_name in build_names):
+        shared_pool = multiprocessing.Pool(processes=multiprocessing.cpu_count())
+    else:
+        shared_pool = None
+
+    errors = []
+
+    def run_build(build_name):
+        try:
+            build_action(
+                config,
+                dict(options, build=build_name),
+                dbs[build_name],
+                sources[build_name],
+                BuildLoggerAdapter(logger, {'build': build_name}),
+                shared_pool
+            )
+        except Exception as e:
+            errors.append(e)
+
+    if shared_pool is not None:
+        threads = [threading.Thread(target=run_build, args=(build_name,)) for build_name in build_names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        shared_pool.close()
+        shared_pool.join()
+    else:
+        for build_name in build_names:
+            run_build(build_name)
+
+    if len(errors) > 0:
+        raise errors[0]
+
+
+def get_logger(logging_options):
     logger = logging.getLogger(name="logger")
     formatter = logging.Formatter('%(asctime)s | %(action)s | %(levelname)s > %(message)s')
     logger.setLevel(logging.getLevelName(logging_options['level'].upper()))
@@ -619,10 +1551,49 @@ def main():
 
     logger.addHandler(logger_handler)
 
+    return logger, logger_handler
+
+
+def main():
+    actions, options = get_command_input()
+
+    if actions[0] in standalone_actions:
+        # standalone actions only serve requests from other machines; no config, database or sources are needed
+        logger, logger_handler = get_logger({'level': 'info', 'target': 'console'})
+        available_actions[actions[0]](None, options, None, None, logger)
+        logger_handler.close()
+        return
+
+    # gathers all config and data
+    config = get_config(options)
+    options.pop('config-data', None)
+    options.pop('config-file', None)
+    build_names = get_build_names(config, options)
+    dbs = {
+        build_name: Database.load_files_db(config['builds'][build_name]['paths']['database'])
+        for build_name in build_names
+    }
+    sources = Processing.process_build_sources(config, build_names, dbs)
+
+    # configures logging
+    logger, logger_handler = get_logger(config['builds'][build_names[0]]['options']['logging'])
+
     # executes all actions
     for currentAction in actions:
         action_start = datetime.now()
-        available_actions[currentAction](config, options, db, sources, logger)
+        if len(build_names) == 1:
+            available_actions[currentAction](config, options, dbs[build_names[0]], sources[build_names[0]], logger)
+        elif currentAction == 'build':
+            build_configurations(config, options, build_names, dbs, sources, logger)
+        else:
+            for build_name in build_names:
+                available_actions[currentAction](
+                    config,
+                    dict(options, build=build_name),
+                    dbs[build_name],
+                    sources[build_name],
+                    BuildLoggerAdapter(logger, {'build': build_name})
+                )
         action_end = datetime.now()
         logger.info(
             "Action completed in [{0:.2f}] seconds".format((action_end - action_start).total_seconds()),
@@ -0,0 +1,185 @@
+# MIT License
+# Copyright (c) 2016 https://github.com/sndnv
+# See the project's LICENSE file for the full text
+
+from cadb.data.PathTable import PATHS
+from cadb.utils.Types import SourceType
+
+
+def iterate_bits(bits):
+    """
+    Iterates over the indices of all set bits in the supplied integer (lowest first).
+
+    :param bits: the integer bitset to iterate over
+    :return: a generator of bit indices
+    """
+    binary = bin(bits)[:1:-1]
+    index = binary.find('1')
+    while index >= 0:
+        yield index
+        index = binary.find('1', index + 1)
+
+
+def bits_from_indices(indices):
+    """
+    Creates an integer bitset with the supplied bit indices set.
+
+    :param indices: the indices of the bits to set
+    :return: the integer bitset
+    """
+    if len(indices) == 0:
+        return 0
+
+    buffer = bytearray(max(indices) // 8 + 1)
+    for index in indices:
+        buffer[index >> 3] |= 1 << (index & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+class DependencyGraph:
+    def __init__(self, sources):
+        """
+        Creates a new dependency graph based on the internal dependencies of the supplied sources.
+
+        Files are identified by their IDs in the shared path table (data.PathTable.PATHS) and transitive closures
+        are stored as integer bitsets of those IDs. The closures are computed lazily and memoized per file, so that
+        each one is only calculated once for the lifetime of the graph.
+
+        :param sources: a dict of the processed source files
+        """
+        self._files = set()
+        self._includes = {}
+        self._included_by = {}
+        implementations = []
+
+        for source in sources.values():
+            self._files.add(source.file_id)
+            self._files.update(source.internal_dependency_ids)
+            self._includes[source.file_id] = source.internal_dependency_ids
+            if source.file_type == SourceType.Implementation:
+                implementations.append(source.file_id)
+
+            for dependency_id in source.internal_dependency_ids:
+                self._included_by.setdefault(dependency_id, []).append(source.file_id)
+
+        self._implementations = bits_from_indices(implementations)
+        self._includes_closure = {}
+        self._included_by_closure = {}
+
+    def __contains__(self, path):
+        return PATHS.find_id(path) in self._files
+
+    def __len__(self):
+        return len(self._files)
+
+    def get_includes(self, path):
+        """
+        Retrieves all files that are included by the specified file, directly or transitively.
+
+        :param path: the file to check
+        :return: a list of file paths (empty, if the file is not part of the graph)
+        """
+        return self._to_paths(self._get_closure(path, self._includes, self._includes_closure))
+
+    def get_dependents(self, path):
+        """
+        Retrieves all files that include the specified file, directly or transitively.
+
+        :param path: the file to check
+        :return: a list of file paths (empty, if the file is not part of the graph)
+        """
+        return self._to_paths(self._get_closure(path, self._included_by, self._included_by_closure))
+
+    def get_impacted_implementations(self, path):
+        """
+        Retrieves all implementation files that need to be rebuilt if the specified file is modified.
+
+        :param path: the modified file
+        :return: a list of implementation file paths, including the file itself (if it is an implementation file)
+        """
+        if path not in self:
+            return []
+
+        impacted = self._get_closure(path, self._included_by, self._included_by_closure)
+        impacted |= 1 << PATHS.find_id(path)
+        return self._to_paths(impacted & self._implementations)
+
+    def _to_paths(self, bits):
+        return [PATHS.get_path(index) for index in iterate_bits(bits)]
+
+    def _get_closure(self, path, edges, closures):
+        """
+        Retrieves the transitive closure of the specified file, computing it if it is not already available.
+
+        The strongly connected components reachable from the file are found (iterative Tarjan); as each component
+        is completed, all of its successors are already resolved, so a single bitset is calculated and shared by
+        all members of the component. This keeps include cycles from causing infinite recursion.
+
+        :param path: the file for which to get the closure
+        :param edges: the direct edges to follow (file ID -> file IDs)
+        :param closures: the memoized closures (file ID -> bitset)
+        :return: a bitset with all reachable files (excluding the file itself)
+        """
+        start = PATHS.find_id(path)
+        if start not in self._files:
+            return 0
+
+        if start not in closures:
+            order = {start: 0}
+            low = {start: 0}
+            stack = [start]
+            on_stack = {start}
+            pending = [(start, iter(edges.get(start, ())))]
+
+            while len(pending) > 0:
+                node, children = pending[-1]
+
+                descended = False
+                for child in children:
+                    if child in closures:
+                        continue
+                    elif child not in order:
+                        order[child] = low[child] = len(order)
+                        stack.append(child)
+                        on_stack.add(child)
+                        pending.append((child, iter(edges.get(child, ()))))
+                        descended = True
+                        break
+                    elif child in on_stack:
+                        low[node] = min(low[node], order[child])
+
+                if descended:
+                    continue
+
+                pending.pop()
+                if len(pending) > 0:
+                    parent = pending[-1][0]
+                    low[parent] = min(low[parent], low[node])
+
+                if low[node] == order[node]:
+                    members = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        members.append(member)
+                        if member == node:
+                            break
+
+                    children = set()
+                    for member in members:
+                        children.update(edges.get(member, ()))
+
+                    successor_closures = {}
+                    for child in children:
+                        child_closure = closures.get(child, 0)
+                        if child_closure:
+                            successor_closures[id(child_closure)] = child_closure
+
+                    reachable = bits_from_indices(children)
+                    for child_closure in successor_closures.values():
+                        reachable |= child_closure
+
+                    for member in members:
+                        closures[member] = reachable
+
+        return closures[start] & ~(1 << start)
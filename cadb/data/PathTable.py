@@ -0,0 +1,61 @@
+# MIT License
+# Copyright (c) 2016 https://github.com/sndnv
+# See the project's LICENSE file for the full text
+
+import sys
+
+
+class PathTable:
+    __slots__ = ('_ids', '_paths')
+
+    def __init__(self):
+        """
+        Creates a new (empty) path table.
+
+        Each path added to the table is interned and assigned a stable integer ID, so that source files can store
+        their dependencies as compact arrays of IDs instead of repeating the same path strings.
+        """
+        self._ids = {}
+        self._paths = []
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __contains__(self, path):
+        return path in self._ids
+
+    def get_id(self, path):
+        """
+        Retrieves the ID of the specified path, adding it to the table if it is not already there.
+
+        :param path: the path to look up
+        :return: the path's ID
+        """
+        path_id = self._ids.get(path)
+        if path_id is None:
+            path = sys.intern(path)
+            path_id = len(self._paths)
+            self._ids[path] = path_id
+            self._paths.append(path)
+        return path_id
+
+    def find_id(self, path):
+        """
+        Retrieves the ID of the specified path, without adding it to the table.
+
+        :param path: the path to look up
+        :return: the path's ID or None, if the path is not in the table
+        """
+        return self._ids.get(path)
+
+    def get_path(self, path_id):
+        """
+        Retrieves the path with the specified ID.
+
+        :param path_id: the ID to look up
+        :return: the (interned) path
+        """
+        return self._paths[path_id]
+
+
+PATHS = PathTable()
@@ -2,57 +2,987 @@
 # Copyright (c) 2016 https://github.com/sndnv
 # See the project's LICENSE file for the full text
 
-from cadb.utils import FileSystem, Build
+import fnmatch
+import hashlib
+import heapq
+import json
+import math
+import os
+
+from cadb.utils import Database, FileSystem, Fingerprint, Build, Git, Includes, Preprocessor, RemoteCache
 from cadb.utils.Types import SourceType
 
+from cadb.data.DependencyGraph import DependencyGraph
 from cadb.data.SourceFile import SourceFile
+from cadb.data.UnityGroup import UnityGroup
+
+MAX_CACHED_DEPENDENCY_GRAPHS = 8
+SHARD_METADATA_SECTIONS = ['compile_times', 'dependencies', 'remote_cache', 'diagnostics']
+
+_dependency_graph_cache = []
+_content_hash_cache = {}
 
 
 def process_sources(config, options, db):
     """
     Builds a dict of source files and their data, based on the supplied configuration.
 
+    See 'process_build_sources' for more information.
+
     :param config: the config to be used for processing
     :param options: all user-supplied options
     :param db: data loaded from the database, if any
     :return: a dict containing all source files data
     """
-    build_config = config['builds'][options['build']]
-    sources_dir = build_config['paths']['sources']
-    excludes = build_config['paths']['excludes']
-    build_dir = build_config['paths']['build']
-    header_file_extensions = build_config['headerFileExtensions']
-    implementation_file_extensions = build_config['implementationFileExtensions']
+    return process_build_sources(config, [options['build']], {options['build']: db})[options['build']]
 
-    header_files = FileSystem.get_source_files_list(sources_dir, header_file_extensions)
-    implementation_files = FileSystem.get_source_files_list(sources_dir, implementation_file_extensions)
 
-    sources = {}
-    for current_file in header_files:
-        if not any(current_file.startswith(current_exclude) for current_exclude in excludes):
-            source_file = SourceFile(
-                includes_config=config['includes'],
-                path=current_file,
-                file_type=SourceType.Header,
-                db_hash=db.get(current_file),
-                object_file_path=None
-            )
+def process_build_sources(config, build_names, dbs):
+    """
+    Builds a dict of source files and their data for each of the specified build configurations.
+
+    The name of the hash algorithm is stored in each database's metadata; if it does not match the configured one,
+    the stored hashes are ignored and all files are considered changed.
+
+    If a build uses compiler-generated dependency files ('dependencyFiles' option), the dependencies recorded for
+    unchanged implementation files are used as they are, instead of scanning the files for includes.
+
+    If a build uses a remote cache ('remoteCache' option, with 'prefetch' enabled), the objects that will likely be
+    needed are retrieved in the background while the files are scanned (see 'predict_object_cache_keys').
+
+    Builds with the same scan settings (see 'get_scan_key') share a single scan: the files are found, hashed and
+    scanned for includes only once, and each build gets its own copy of every file (with its own database hash and
+    object file path). Builds that end up with the same dependencies also share the dependency graph.
+
+    :param config: the config to be used for processing
+    :param build_names: the names of the build configurations to process
+    :param dbs: a dict with the data loaded from the database of each build, if any
+    :return: a dict with the source files data (a dict) of each build
+    """
+    _dependency_graph_cache.clear()
+    _content_hash_cache.clear()
+
+    scan_groups = {}
+    for build_name in build_names:
+        scan_groups.setdefault(get_scan_key(config, config['builds'][build_name]), []).append(build_name)
+
+    sources_by_build = {}
+    for group_builds in scan_groups.values():
+        scan_config = config['builds'][group_builds[0]]
+        sources_dir = scan_config['paths']['sources']
+        excludes = scan_config['paths'].get('exclude', scan_config['paths'].get('excludes', []))
+        include_resolver = Includes.get_include_resolver(scan_config)
+
+        conditionals_config = config['includes'].get('conditionals', {})
+        if conditionals_config.get('enabled', False) is True:
+            macros = Preprocessor.get_macros(scan_config['compiler']['options'], conditionals_config)
+        else:
+            macros = None
+
+        extensions = {extension: SourceType.Header for extension in scan_config['headerFileExtensions']}
+        extensions.update(
+            {extension: SourceType.Implementation for extension in scan_config['implementationFileExtensions']}
+        )
+        source_files = FileSystem.get_source_files(sources_dir, extensions, excludes)
+
+        hash_algorithm = get_hash_algorithm(scan_config)
+        file_hashes = get_file_hashes(scan_config, [path for paths in source_files.values() for path in paths])
+        known_files = set(file_hashes)
+
+        # files that have been scanned for includes and files that have been read (with recorded dependencies)
+        scanned_files = {}
+        read_files = {}
 
-            sources[current_file] = source_file
+        def get_source_file(path, file_type, db_hash, object_file_path, dependencies):
+            if dependencies is None:
+                base = scanned_files.get(path)
+            else:
+                base = read_files.get(path, scanned_files.get(path))
+
+            if base is not None:
+                return base.derive(db_hash, object_file_path, dependencies)
 
-    for current_file in implementation_files:
-        if not any(current_file.startswith(current_exclude) for current_exclude in excludes):
             source_file = SourceFile(
                 includes_config=config['includes'],
-                path=current_file,
-                file_type=SourceType.Implementation,
-                db_hash=db.get(current_file),
-                object_file_path=Build.get_object_file_path(current_file, sources_dir, build_dir)
+                path=path,
+                file_type=file_type,
+                db_hash=db_hash,
+                object_file_path=object_file_path,
+                include_resolver=include_resolver,
+                macros=macros,
+                file_hash=file_hashes.get(path),
+                dependencies=dependencies
             )
 
-            sources[current_file] = source_file
+            if dependencies is None:
+                scanned_files[path] = source_file
+            else:
+                read_files[path] = source_file
+
+            return source_file
+
+        for build_name in group_builds:
+            build_config = config['builds'][build_name]
+            build_dir = build_config['paths']['build']
+            db = dbs[build_name]
+
+            hashing_metadata = Database.get_metadata(db, 'hashing')
+            if hashing_metadata.get('algorithm', FileSystem.DEFAULT_HASH_ALGORITHM) == hash_algorithm:
+                db_hashes = db
+            else:
+                db_hashes = {}
+            hashing_metadata['algorithm'] = hash_algorithm
+
+            recorded_dependencies = Database.get_metadata(db, 'dependencies')
+            if build_config['options'].get('dependencyFiles', False) is not True:
+                recorded_dependencies.clear()
+
+            remote_cache_config = build_config['options'].get('remoteCache', {})
+            if remote_cache_config.get('enabled', False) is True and remote_cache_config.get('prefetch', True) is True:
+                # only the manifests are prefetched; the objects' keys depend on the headers listed in them
+                predicted_keys = predict_object_cache_keys(
+                    Database.get_metadata(db, 'remote_cache'),
+                    file_hashes,
+                    sources_dir,
+                    build_dir,
+                    RemoteCache.get_build_digest(build_config['compiler'])
+                )
+                RemoteCache.prefetch_objects(
+                    remote_cache_config,
+                    [RemoteCache.get_manifest_key(key) for key in predicted_keys]
+                )
+
+            sources = {}
+            for current_file in source_files.get(SourceType.Header, []):
+                sources[current_file] = get_source_file(
+                    current_file,
+                    SourceType.Header,
+                    db_hashes.get(current_file),
+                    None,
+                    None
+                )
+
+            for current_file in source_files.get(SourceType.Implementation, []):
+                db_hash = db_hashes.get(current_file)
+                dependencies = get_recorded_dependencies(
+                    recorded_dependencies.get(current_file),
+                    file_hashes.get(current_file),
+                    known_files
+                )
+                if dependencies is None and current_file in recorded_dependencies:
+                    # the recorded dependencies are outdated (the file has changed or a dependency was removed)
+                    del recorded_dependencies[current_file]
+                    db_hash = None
+
+                sources[current_file] = get_source_file(
+                    current_file,
+                    SourceType.Implementation,
+                    db_hash,
+                    Build.get_object_file_path(current_file, sources_dir, build_dir),
+                    dependencies
+                )
+
+            # builds with exactly the same dependencies (the same scanned or recorded files) share a graph
+            for other_build in group_builds:
+                other_sources = sources_by_build.get(other_build)
+                if other_sources is not None and all(
+                        source.internal_dependency_ids is other_sources[path].internal_dependency_ids
+                        for path, source in sources.items()
+                ):
+                    share_dependency_graph(other_sources, sources)
+                    break
+
+            sources_by_build[build_name] = sources
+
+    return sources_by_build
+
+
+def get_scan_key(config, build_config):
+    """
+    Creates a key identifying the settings used for finding, hashing and scanning the source files of the supplied
+    build configuration; builds with the same key can share a single scan (see 'process_build_sources').
+
+    :param config: the config to be used for processing
+    :param build_config: the build configuration to be used
+    :return: the scan key (a string)
+    """
+    paths = build_config['paths']
+    compiler_options = build_config['compiler']['options']
+    conditionals_enabled = config['includes'].get('conditionals', {}).get('enabled', False) is True
+
+    return json.dumps([
+        paths['sources'],
+        paths.get('exclude', paths.get('excludes', [])),
+        build_config['headerFileExtensions'],
+        build_config['implementationFileExtensions'],
+        get_hash_algorithm(build_config),
+        Includes.get_search_paths(compiler_options),
+        compiler_options if conditionals_enabled else None
+    ])
+
+
+def get_hash_algorithm(build_config):
+    """
+    Retrieves the name of the algorithm used for calculating the hashes of source files.
+
+    :param build_config: the build configuration to be used
+    :return: the configured hash algorithm, with the 'semantic-' prefix for semantic hashes, or 'git', if the hashes
+    are git blob IDs
+    """
+    general_options = build_config['options']
+    change_detection = general_options.get('changeDetection', 'content')
+    hash_algorithm = general_options.get('hashAlgorithm', FileSystem.DEFAULT_HASH_ALGORITHM)
+    if change_detection == 'git':
+        return 'git'
+    elif change_detection == 'semantic':
+        return Fingerprint.SEMANTIC_HASH_PREFIX + hash_algorithm
+    else:
+        return hash_algorithm
+
+
+def get_file_hashes(build_config, file_paths):
+    """
+    Calculates the hashes of the supplied files, based on the configured change detection mode.
+
+    With the 'content' mode (default), each file is hashed with the configured 'hashAlgorithm'. With the 'semantic'
+    mode, the file's source code is hashed without its comments and insignificant whitespace. With the 'git'
+    mode, the hashes are git blob IDs; they are taken from the git index for all unmodified tracked files and only
+    the untracked/modified files are hashed. If git cannot be used (for example, the sources are not in a git
+    working tree), all files are hashed as git blobs, so that the stored hashes remain comparable.
+
+    :param build_config: the build configuration to be used
+    :param file_paths: the files for which to get hashes
+    :return: a dict with file paths as keys and hashes as values
+    :raise: ValueError if the configured hash algorithm is not supported
+    """
+    general_options = build_config['options']
+    hash_algorithm = get_hash_algorithm(build_config)
+    if hash_algorithm == 'git':
+        try:
+            return Git.get_blob_ids(general_options.get('gitPath', 'git'), build_config['paths']['sources'], file_paths)
+        except RuntimeError:
+            return {path: FileSystem.get_git_blob_hash(path) for path in file_paths}
+    elif hash_algorithm.startswith(Fingerprint.SEMANTIC_HASH_PREFIX):
+        hash_algorithm = hash_algorithm[len(Fingerprint.SEMANTIC_HASH_PREFIX):]
+        return {path: Fingerprint.get_semantic_hash(path, hash_algorithm) for path in file_paths}
+    else:
+        return {path: FileSystem.get_file_hash(path, hash_algorithm) for path in file_paths}
+
+
+def get_recorded_dependencies(recorded, file_hash, known_files):
+    """
+    Retrieves the dependencies recorded from a compiler-generated dependency file, if they are still valid.
+
+    :param recorded: the recorded dependencies data (from the database), if any
+    :param file_hash: the current hash of the file
+    :param known_files: a set of the paths of all source files
+    :return: a tuple of (internal dependencies list, external dependencies list) or None, if no dependencies were
+    recorded, the file has changed since they were recorded or any of its internal dependencies no longer exists
+    """
+    if recorded is None or recorded.get('hash') != file_hash:
+        return None
+    elif any(current not in known_files for current in recorded['internal']):
+        return None
+    else:
+        return recorded['internal'], recorded['external']
+
+
+def record_compiler_dependencies(db, source, known_paths):
+    """
+    Parses the dependency file generated by the compiler for the supplied source and stores its dependencies in the
+    files database.
+
+    Dependencies that are known source files are recorded as internal (with the same paths as the sources), all
+    others (for example, headers from other libraries) as external (with their full paths). The external includes
+    found by scanning the file are kept as well, as dependency files ('-MMD') do not list system headers.
+
+    :param db: the files database
+    :param source: the compiled source file
+    :param known_paths: a dict with the full paths of all source files as keys and their source paths as values
+    :return: True, if the dependencies were recorded; False, if the dependency file is missing or invalid
+    """
+    recorded_dependencies = Database.get_metadata(db, 'dependencies')
+
+    try:
+        prerequisites = Build.parse_dependency_file(Build.get_dependency_file_path(source.object_file_path))
+    except (OSError, ValueError):
+        recorded_dependencies.pop(source.file_path, None)
+        return False
+
+    source_path = os.path.abspath(source.file_path)
+    internal_dependencies = []
+    external_dependencies = source.external_dependencies
+    for current in prerequisites:
+        if current != source_path:
+            known_path = known_paths.get(current)
+            if known_path is not None:
+                internal_dependencies.append(known_path)
+            elif current not in external_dependencies:
+                external_dependencies.append(current)
+
+    recorded_dependencies[source.file_path] = {
+        'hash': source.file_hash,
+        'internal': internal_dependencies,
+        'external': external_dependencies
+    }
+
+    return True
+
+
+def select_precompiled_headers(sources, threshold, internal_headers=False):
+    """
+    Selects the headers to be precompiled, based on how many implementation files include them.
+
+    A header is selected if it is included (directly) by at least the specified fraction of all implementation files;
+    external headers are always considered, internal ones only if requested. Headers are ordered by use count.
+
+    :param sources: a dict of the processed source files
+    :param threshold: the minimum fraction (0.0 - 1.0) of implementation files that must include a header
+    :param internal_headers: set to True to also select internal headers (default is False)
+    :return: (selected external headers list, selected internal headers list, list of implementation files that
+    include any of the selected headers); all lists are empty if fewer than two files would use the headers
+    """
+    implementations = [source for source in sources.values() if source.file_type == SourceType.Implementation]
+    internal_dependencies, external_dependencies = process_dependencies(
+        {source.file_path: source for source in implementations}
+    )
+
+    def select(dependencies):
+        return sorted(
+            (
+                current for current, users in dependencies.items()
+                if len(users) >= 2 and len(users) >= threshold * len(implementations)
+            ),
+            key=lambda current: (-len(dependencies[current]), current)
+        )
+
+    selected_external = select(external_dependencies)
+    if internal_headers:
+        selected_internal = [
+            current for current in select(internal_dependencies)
+            if current in sources and sources[current].file_type == SourceType.Header
+        ]
+    else:
+        selected_internal = []
 
-    return sources
+    users = {
+        source.file_path
+        for current in selected_external for source in external_dependencies[current]
+    }
+    users.update(source.file_path for current in selected_internal for source in internal_dependencies[current])
+
+    if len(users) < 2:
+        return [], [], []
+    else:
+        return selected_external, selected_internal, sorted(users)
+
+
+def get_precompiled_header_key(content, compiler_config):
+    """
+    Calculates a key identifying a precompiled header, based on its content and the compiler configuration.
+
+    :param content: the content of the header
+    :param compiler_config: the compiler configuration to be used
+    :return: the key (a hash)
+    """
+    hasher = hashlib.sha256()
+    hasher.update(content.encode())
+    hasher.update(compiler_config['path'].encode())
+    hasher.update("\0".join(compiler_config['options']).encode())
+    return hasher.hexdigest()
+
+
+def is_precompiled_header_valid(recorded, key, header_path):
+    """
+    Checks if the previously compiled precompiled header can be used without rebuilding it.
+
+    :param recorded: the recorded precompiled header data (from the database)
+    :param key: the key of the requested precompiled header (see 'get_precompiled_header_key')
+    :param header_path: the path of the precompiled header
+    :return: True, if the header was compiled with the same key and none of its dependencies have changed
+    """
+    if recorded.get('key') != key or not os.path.isfile(header_path + ".gch"):
+        return False
+
+    for dependency, dependency_hash in recorded.get('dependencies', {}).items():
+        if not os.path.isfile(dependency) or FileSystem.get_file_hash(dependency) != dependency_hash:
+            return False
+
+    return True
+
+
+def record_precompiled_header(db, key, header_path, users):
+    """
+    Stores the data of a newly compiled precompiled header in the files database, including the hashes of all of its
+    dependencies (from the dependency file generated by the compiler).
+
+    :param db: the files database
+    :param key: the key of the precompiled header (see 'get_precompiled_header_key')
+    :param header_path: the path of the precompiled header
+    :param users: the implementation files that use the precompiled header
+    :return: nothing
+    """
+    try:
+        dependencies = Build.parse_dependency_file(Build.get_dependency_file_path(header_path))
+    except (OSError, ValueError):
+        dependencies = []
+
+    recorded = Database.get_metadata(db, 'precompiled_header')
+    recorded.clear()
+    recorded['key'] = key
+    recorded['users'] = list(users)
+    recorded['dependencies'] = {
+        current: FileSystem.get_file_hash(current) for current in dependencies if os.path.isfile(current)
+    }
+
+
+def get_content_hash(file_path):
+    """
+    Calculates the content hash of the specified file, as used in remote cache keys (see
+    'utils.RemoteCache.KEY_HASH_ALGORITHM'), independently of the configured hash algorithm.
+
+    The hashes are kept until the sources are processed again (see 'process_build_sources').
+
+    :param file_path: the path to the file
+    :return: the file's hash
+    """
+    file_hash = _content_hash_cache.get(file_path)
+    if file_hash is None:
+        file_hash = FileSystem.get_file_hash(file_path, RemoteCache.KEY_HASH_ALGORITHM)
+        _content_hash_cache[file_path] = file_hash
+
+    return file_hash
+
+
+def get_object_cache_key(source, sources, sources_dir, build_digest, extra=""):
+    """
+    Calculates the remote cache key of the supplied source's object file (see 'utils.RemoteCache.get_object_key').
+
+    The key is always based on the content hashes of the files (see 'get_content_hash'); the configured hashes of
+    the dependencies are only returned, so that unchanged objects can be skipped when predicting keys (see
+    'predict_object_cache_keys').
+
+    :param source: the source file to be compiled
+    :param sources: a dict of the processed source files
+    :param sources_dir: the sources directory; all paths in the key are relative to it
+    :param build_digest: the build settings digest (see 'utils.RemoteCache.get_build_digest')
+    :param extra: any additional data that affects the compilation (default is empty)
+    :return: a tuple: (the key, a dict with the configured hashes of all (transitive) internal dependencies used
+             for it)
+    """
+    dependencies = sorted(
+        current for current in get_dependency_graph(sources).get_includes(source.file_path) if current in sources
+    )
+
+    key = RemoteCache.get_object_key(
+        os.path.relpath(source.file_path, sources_dir),
+        get_content_hash(source.file_path),
+        {os.path.relpath(current, sources_dir): get_content_hash(current) for current in dependencies},
+        build_digest,
+        extra
+    )
+
+    return key, {current: sources[current].file_hash for current in dependencies}
+
+
+def predict_object_cache_keys(recorded, file_hashes, sources_dir, build_dir, build_digest):
+    """
+    Predicts the remote cache keys of the objects that will need to be rebuilt, before the sources are scanned.
+
+    The keys are calculated with the current content hashes of the files and the dependencies recorded when each
+    object was last built (or retrieved), so they are correct as long as the files' includes have not changed.
+    Objects that exist and whose file and dependencies have the same (configured) hashes as when they were recorded
+    are skipped, without hashing their contents.
+
+    :param recorded: the recorded remote cache data (from the database)
+    :param file_hashes: a dict with the current (configured) hashes of all source files
+    :param sources_dir: the sources directory
+    :param build_dir: the build directory
+    :param build_digest: the build settings digest (see 'utils.RemoteCache.get_build_digest')
+    :return: a list of keys
+    """
+    keys = []
+    for current_file, record in recorded.items():
+        dependencies = record['dependencies']
+        if current_file not in file_hashes or any(current not in file_hashes for current in dependencies):
+            continue
+
+        object_file_path = Build.get_object_file_path(current_file, sources_dir, build_dir)
+        unchanged = (
+            isinstance(dependencies, dict)
+            and record.get('hash') == file_hashes[current_file]
+            and all(file_hashes[current] == current_hash for current, current_hash in dependencies.items())
+        )
+        if unchanged and Build.object_file_exists(object_file_path):
+            continue
+
+        key = RemoteCache.get_object_key(
+            os.path.relpath(current_file, sources_dir),
+            get_content_hash(current_file),
+            {os.path.relpath(current, sources_dir): get_content_hash(current) for current in dependencies},
+            build_digest,
+            record['extra']
+        )
+
+        if key != record['key'] or not Build.object_file_exists(object_file_path):
+            keys.append(key)
+
+    return keys
+
+
+def get_object_headers(source, compiler_config, sources_dir, build_dir):
+    """
+    Retrieves all headers used when compiling the supplied source, as reported by the compiler (see
+    'utils.Build.get_header_dependencies'), for the manifest of its cached object (see
+    'utils.RemoteCache.store_cached_objects').
+
+    Files in the build directory (for example, generated unity files) are ignored; files in the sources directory
+    are made relative to it and all other (external) files are kept as absolute paths.
+
+    :param source: the compiled source file
+    :param compiler_config: the compiler configuration
+    :param sources_dir: the sources directory
+    :param build_dir: the build directory
+    :return: a sorted list of header paths
+    :raise: ValueError if the headers could not be retrieved
+    """
+    sources_dir = os.path.abspath(sources_dir)
+    build_dir = os.path.join(os.path.abspath(build_dir), "")
+
+    headers = set()
+    for current in Build.get_header_dependencies(source, compiler_config):
+        if current.startswith(build_dir):
+            continue
+        elif current.startswith(os.path.join(sources_dir, "")):
+            headers.add(os.path.relpath(current, sources_dir))
+        else:
+            headers.add(current)
+
+    return sorted(headers)
+
+
+def record_object_cache_key(db, source, key, dependencies, extra=""):
+    """
+    Stores the remote cache key of the supplied source's object file, and the data used for calculating it, in the
+    files database (see 'predict_object_cache_keys').
+
+    :param db: the files database
+    :param source: the compiled (or retrieved) source file
+    :param key: the object's key
+    :param dependencies: the dependencies used for calculating the key, with their (configured) hashes
+    :param extra: the additional data used for calculating the key (default is empty)
+    :return: nothing
+    """
+    Database.get_metadata(db, 'remote_cache')[source.file_path] = {
+        'key': key,
+        'hash': source.file_hash,
+        'dependencies': dependencies,
+        'extra': extra
+    }
+
+
+def record_diagnostics(db, source_path, stdout, stderr):
+    """
+    Stores the messages sent by the compiler while compiling the specified source in the files database, so that
+    they can be shown again while the source is up to date (see 'get_cached_diagnostics').
+
+    Only non-empty messages are stored.
+
+    :param db: the files database
+    :param source_path: the source file's path
+    :param stdout: the messages sent to stdout by the compiler
+    :param stderr: the messages sent to stderr by the compiler
+    :return: nothing
+    """
+    recorded = Database.get_metadata(db, 'diagnostics')
+    if len(stdout) > 0 or len(stderr) > 0:
+        recorded[source_path] = {'stdout': stdout, 'stderr': stderr}
+    else:
+        recorded.pop(source_path, None)
+
+
+def get_cached_diagnostics(db, sources, skipped_paths=None):
+    """
+    Retrieves the stored compiler messages (see 'record_diagnostics') of all up-to-date implementation files.
+
+    :param db: the files database
+    :param sources: a dict of the processed source files
+    :param skipped_paths: the paths of the sources to ignore (for example, the ones compiled by the current build),
+    if any (default is None)
+    :return: a sorted list of tuples: (source file path, messages sent to stdout, messages sent to stderr)
+    """
+    skipped_paths = skipped_paths if skipped_paths is not None else set()
+    recorded = Database.get_metadata(db, 'diagnostics')
+
+    return [
+        (path, recorded[path]['stdout'], recorded[path]['stderr'])
+        for path in sorted(recorded)
+        if path in sources
+        and path not in skipped_paths
+        and sources[path].file_type == SourceType.Implementation
+        and db.get(path) == sources[path].file_hash
+        and not has_changed_dependencies(sources[path], sources)
+    ]
+
+
+def record_artifacts(db, source_path, artifact_paths):
+    """
+    Stores the paths of the files produced for the specified source (for example, its object file) in the files
+    database's artifacts manifest, so that they can be removed once the source no longer exists (see
+    'find_orphaned_artifacts').
+
+    :param db: the files database
+    :param source_path: the source file's path
+    :param artifact_paths: the paths of the produced files
+    :return: nothing
+    """
+    Database.get_metadata(db, 'artifacts').setdefault('sources', {})[source_path] = list(artifact_paths)
+
+
+def record_output(db, output_path):
+    """
+    Stores the path of a produced linker output in the files database's artifacts manifest, so that it can be
+    removed if the output's name changes (see 'find_orphaned_artifacts').
+
+    :param db: the files database
+    :param output_path: the output's path
+    :return: nothing
+    """
+    outputs = Database.get_metadata(db, 'artifacts').setdefault('outputs', [])
+    if output_path not in outputs:
+        outputs.append(output_path)
+
+
+def find_orphaned_sources(db, sources):
+    """
+    Finds all source files that are known to the files database (or its artifacts manifest), but no longer exist
+    (for example, deleted, renamed or excluded files).
+
+    :param db: the files database
+    :param sources: a dict of the processed source files
+    :return: a sorted list of the orphaned source paths
+    """
+    known = {path for path in db if path != Database.METADATA_KEY}
+    known.update(Database.get_metadata(db, 'artifacts').get('sources', {}))
+    return sorted(path for path in known if path not in sources)
+
+
+def find_orphaned_artifacts(db, orphaned_sources, sources, sources_dir, build_dir, output_paths,
+                            implementation_extensions):
+    """
+    Finds all files produced for the supplied orphaned sources and all stale linker outputs.
+
+    The files are taken from the artifacts manifest; for implementation files that are not in the manifest (built
+    before it was introduced), the default object and dependency file paths are used. Stale outputs are all recorded
+    outputs other than the current ones, together with their response files and archive manifests.
+
+    Files that are still in use are never returned, even if they were recorded for an orphaned source (for example,
+    the object file of 'a.cpp', after 'a.cc' is removed): the object and dependency files of all existing sources,
+    the files in their artifacts manifest, the current linker outputs, the precompiled header files and all files in
+    the unity directory.
+
+    :param db: the files database
+    :param orphaned_sources: the orphaned source paths (see 'find_orphaned_sources')
+    :param sources: a dict of the processed source files
+    :param sources_dir: the sources directory
+    :param build_dir: the build directory
+    :param output_paths: the current linker output paths (of all link targets)
+    :param implementation_extensions: the extensions (without '.') of implementation files
+    :return: a sorted list of the paths of all existing orphaned files
+    """
+    artifacts = Database.get_metadata(db, 'artifacts')
+    recorded_sources = artifacts.get('sources', {})
+    implementation_extensions = {".{0}".format(extension) for extension in implementation_extensions}
+
+    orphaned = set()
+    for source_path in orphaned_sources:
+        if source_path in recorded_sources:
+            orphaned.update(recorded_sources[source_path])
+        elif os.path.splitext(source_path)[1] in implementation_extensions:
+            object_file_path = Build.get_object_file_path(source_path, sources_dir, build_dir)
+            orphaned.add(object_file_path)
+            orphaned.add(Build.get_dependency_file_path(object_file_path))
+
+    for recorded_output in artifacts.get('outputs', []):
+        if recorded_output not in output_paths:
+            orphaned.add(recorded_output)
+            orphaned.add(recorded_output + ".rsp")
+            orphaned.add(Build.get_archive_manifest_path(recorded_output))
+
+    precompiled_header_path = Build.get_precompiled_header_path(build_dir)
+    live = set(output_paths)
+    live.update([
+        precompiled_header_path,
+        precompiled_header_path + ".gch",
+        Build.get_dependency_file_path(precompiled_header_path)
+    ])
+    for source in sources.values():
+        if source.file_type == SourceType.Implementation:
+            live.add(source.object_file_path)
+            live.add(Build.get_dependency_file_path(source.object_file_path))
+        live.update(recorded_sources.get(source.file_path, []))
+
+    unity_dir = os.path.join(Build.get_unity_dir(build_dir), "")
+    return sorted(
+        path for path in orphaned
+        if path not in live and not path.startswith(unity_dir) and os.path.isfile(path)
+    )
+
+
+def remove_orphaned_sources(db, orphaned_sources, output_paths):
+    """
+    Removes all data of the supplied orphaned sources (and of all stale linker outputs) from the files database.
+
+    :param db: the files database
+    :param orphaned_sources: the orphaned source paths (see 'find_orphaned_sources')
+    :param output_paths: the current linker output paths (of all link targets)
+    :return: nothing
+    """
+    sections = [
+        Database.get_metadata(db, current)
+        for current in ('compile_times', 'dependencies', 'remote_cache', 'diagnostics')
+    ]
+    artifacts = Database.get_metadata(db, 'artifacts')
+    sections.append(artifacts.setdefault('sources', {}))
+
+    for source_path in orphaned_sources:
+        db.pop(source_path, None)
+        for section in sections:
+            section.pop(source_path, None)
+
+    artifacts['outputs'] = [current for current in artifacts.get('outputs', []) if current in output_paths]
+
+
+def select_rebuild_sources(sources, requested_file=None):
+    """
+    Selects the implementation files that need to be rebuilt: all files that have changed, that have no object file
+    or that include a changed internal dependency (see 'has_changed_dependencies').
+
+    :param sources: a dict of the processed source files
+    :param requested_file: a path to a specific file that is needed, if any; it is selected if it is a known
+    implementation file, whether it has changed or not (default is None)
+    :return: a list of the selected source files
+    :raise: ValueError if the requested file is not an implementation file or if an unexpected source type is found
+    """
+    rebuild_sources = []
+    if requested_file is not None:
+        if requested_file in sources:
+            requested_source = sources[requested_file]
+            if requested_source.file_type == SourceType.Implementation:
+                rebuild_sources = [requested_source]
+            else:
+                raise ValueError(
+                    "Failed to compile single source file [{0}]; type [{1}] is not supported".format(
+                        requested_file,
+                        requested_source.file_type
+                    )
+                )
+    else:
+        for source in sources.values():
+            if source.file_type == SourceType.Implementation:
+                object_file_exists = Build.object_file_exists(source.object_file_path)
+
+                if source.has_changed or not object_file_exists or has_changed_dependencies(source, sources):
+                    rebuild_sources.append(source)
+            elif source.file_type != SourceType.Header:
+                raise ValueError(
+                    "Unexpected source type encountered: [{0}] for file [{1}]".format(
+                        source.file_type,
+                        source.file_path
+                    )
+                )
+
+    return rebuild_sources
+
+
+def has_changed_dependencies(source, sources):
+    """
+    Checks if any of the internal dependencies of the supplied source have changed.
+
+    :param source: the source file to check
+    :param sources: a dict of the processed source files
+    :return: True, if at least one (known) internal dependency has changed
+    """
+    return any(
+        current in sources and sources[current].has_changed
+        for current in source.internal_dependencies
+    )
+
+
+def process_unity_groups(sources, compile_costs, group_size, group_by='directory'):
+    """
+    Splits the supplied implementation files into balanced unity groups.
+
+    Files are first split by extension (so that C and C++ files are never mixed) and then either by directory
+    ('directory') or not at all ('includes'). Each bucket gets ceil(files / group_size) groups:
+
+    - with 'directory', files are assigned to the group with the lowest total compile cost, from the most to the
+      least expensive file (longest processing time first), so that all groups take about the same time to compile;
+    - with 'includes', files are ordered by their dependencies (so files that include the same headers are next to
+      each other) and split into consecutive groups of about the same total compile cost.
+
+    Groups with fewer than two files are dropped (their files are compiled individually).
+
+    :param sources: a dict of the implementation files to be grouped
+    :param compile_costs: a dict of implementation file compile costs (see 'estimate_compile_costs')
+    :param group_size: the (average) number of files per group
+    :param group_by: 'directory' or 'includes' (default is 'directory')
+    :return: a dict with group names as keys and lists of file paths as values
+    """
+    buckets = {}
+    for source in sources.values():
+        directory, file_name = os.path.split(source.file_path)
+        extension = os.path.splitext(file_name)[1]
+        key = (directory, extension) if group_by == 'directory' else ('', extension)
+        buckets.setdefault(key, []).append(source)
+
+    groups = {}
+    names_count = {}
+    for (directory, extension), bucket in sorted(buckets.items()):
+        groups_count = int(math.ceil(len(bucket) / group_size))
+        cost = {source.file_path: compile_costs.get(source.file_path, source.total_lines) for source in bucket}
+        bucket_groups = [[] for _ in range(groups_count)]
+
+        if group_by == 'directory':
+            heap = [(0, index) for index in range(groups_count)]
+            for source in sorted(bucket, key=lambda current: (-cost[current.file_path], current.file_path)):
+                group_cost, index = heapq.heappop(heap)
+                bucket_groups[index].append(source.file_path)
+                heapq.heappush(heap, (group_cost + cost[source.file_path], index))
+        else:
+            target_cost = sum(cost.values()) / groups_count
+            accumulated_cost = 0
+            ordered = sorted(bucket, key=lambda current: (sorted(current.internal_dependencies), current.file_path))
+            for source in ordered:
+                index = min(int(accumulated_cost / target_cost) if target_cost > 0 else 0, groups_count - 1)
+                bucket_groups[index].append(source.file_path)
+                accumulated_cost += cost[source.file_path]
+
+        prefix = os.path.basename(directory) if len(directory) > 0 else "unity"
+        for members in bucket_groups:
+            if len(members) >= 2:
+                index = names_count.get((prefix, extension), 0)
+                names_count[(prefix, extension)] = index + 1
+                groups["{0}_{1}{2}".format(prefix, index, extension)] = sorted(members)
+
+    return groups
+
+
+def prepare_unity_build(unity_config, unity_dir, db, sources, compile_costs):
+    """
+    Creates the unity groups for the supplied sources, keeping the groups from the previous build whenever possible.
+
+    The groups are stored in the database. As long as at least one of the previous groups' object files exists and
+    the unity settings are unchanged, the previous groups are reused: files that have changed since the last build
+    are moved out of their groups (if 'isolateChanged' is set and fewer than half of the group's files have changed)
+    and, like new files, are compiled individually from then on, so that editing a file does not cause its whole
+    group to be recompiled again and again. Otherwise (for example, after a clean), all files are grouped again.
+
+    :param unity_config: the unity build configuration
+    :param unity_dir: the directory for the generated unity files
+    :param db: the files database
+    :param sources: a dict of the processed source files
+    :param compile_costs: a dict of implementation file compile costs (see 'estimate_compile_costs')
+    :return: (dict of group names and data.UnityGroup objects, set of file paths to be compiled individually)
+    """
+    implementations = {
+        source.file_path: source for source in sources.values() if source.file_type == SourceType.Implementation
+    }
+
+    state = Database.get_metadata(db, 'unity')
+    settings = [unity_config.get('groupSize', 8), unity_config.get('groupBy', 'directory')]
+    recorded_groups = state.get('groups', {})
+
+    existing_group = any(
+        os.path.isfile(os.path.splitext(os.path.join(unity_dir, name))[0] + ".o") for name in recorded_groups
+    )
+
+    if state.get('settings') != settings or not existing_group:
+        groups = process_unity_groups(implementations, compile_costs, settings[0], settings[1])
+        isolated = set()
+    else:
+        isolate_changed = unity_config.get('isolateChanged', True)
+        isolated = {current for current in state.get('isolated', []) if current in implementations}
+        groups = {}
+        for name, members in recorded_groups.items():
+            kept = [current for current in members if current in implementations and current not in isolated]
+            changed = [current for current in kept if implementations[current].has_changed]
+            if isolate_changed and len(changed) * 2 < len(kept):
+                isolated.update(changed)
+                kept = [current for current in kept if not implementations[current].has_changed]
+
+            if len(kept) >= 2:
+                groups[name] = kept
+            else:
+                isolated.update(kept)
+
+    grouped = {current for members in groups.values() for current in members}
+    isolated.update(current for current in implementations if current not in grouped)
+
+    state['settings'] = settings
+    state['groups'] = groups
+    state['isolated'] = sorted(isolated)
+
+    unity_groups = {
+        name: UnityGroup(name, unity_dir, [implementations[current] for current in members])
+        for name, members in groups.items()
+    }
+
+    return unity_groups, isolated
+
+
+def process_compilation_batches(sources, batch_size, max_file_size, key=None):
+    """
+    Splits the supplied (small) source files into batches that can be compiled with a single compiler invocation.
+
+    Only files that are not larger than the maximum size are batched; the files in a batch always have different
+    file names and the same key. Batches with a single file are dropped.
+
+    :param sources: the source files to be compiled
+    :param batch_size: the maximum number of files per batch
+    :param max_file_size: the maximum size (in bytes) of a file that can be batched
+    :param key: a function returning a key for each source; only files with the same key are batched together
+    (default is None; all files can be batched together)
+    :return: (list of batches (lists of source files), list of source files that are not batched)
+    """
+    batches = []
+    remaining = []
+    open_batches = {}
+
+    for source in sources:
+        if source.size > max_file_size:
+            remaining.append(source)
+            continue
+
+        batch_key = key(source) if key is not None else None
+        file_name = os.path.splitext(os.path.basename(source.file_path))[0]
+
+        batch = next(
+            (
+                current for current in open_batches.get(batch_key, [])
+                if file_name not in current[1]
+            ),
+            None
+        )
+
+        if batch is None:
+            batch = ([], set())
+            open_batches.setdefault(batch_key, []).append(batch)
+
+        batch[0].append(source)
+        batch[1].add(file_name)
+        if len(batch[0]) >= batch_size:
+            open_batches[batch_key].remove(batch)
+            batches.append(batch[0])
+
+    for key_batches in open_batches.values():
+        for batch_sources, _ in key_batches:
+            if len(batch_sources) > 1:
+                batches.append(batch_sources)
+            else:
+                remaining.extend(batch_sources)
+
+    return batches, remaining
 
 
 def process_dependencies(sources, requested_file=None):
@@ -86,3 +1016,272 @@ def process_dependencies(sources, requested_file=None):
                 external_dependencies[current_external_dependency] = [source]
 
     return internal_dependencies, external_dependencies
+
+
+def process_transitive_dependencies(sources, requested_file=None):
+    """
+    Builds two dicts containing all internal and external dependencies based on the supplied sources data.
+
+    Unlike 'process_dependencies', a source is considered to use a dependency if it includes it directly or through
+    any of its internal dependencies.
+
+    :param sources: a dict of the processed source files
+    :param requested_file: a path to a specific file that is needed, if any (default is None)
+    :return: (internal dependencies dict, external dependencies dict)
+    """
+    internal_dependencies = {}
+    external_dependencies = {}
+
+    graph = get_dependency_graph(sources)
+
+    if requested_file is not None:
+        selected_sources = [sources[requested_file]] if requested_file in sources else []
+    else:
+        selected_sources = sources.values()
+
+    for source in selected_sources:
+        used_external_dependencies = set(source.external_dependencies)
+        for current_internal_dependency in graph.get_includes(source.file_path):
+            internal_dependencies.setdefault(current_internal_dependency, []).append(source)
+            if current_internal_dependency in sources:
+                used_external_dependencies.update(sources[current_internal_dependency].external_dependencies)
+
+        for current_external_dependency in used_external_dependencies:
+            external_dependencies.setdefault(current_external_dependency, []).append(source)
+
+    return internal_dependencies, external_dependencies
+
+
+def get_dependency_graph(sources):
+    """
+    Retrieves the dependency graph for the supplied sources.
+
+    The graph is built only once per sources dict (that is, once per scan) and is reused by all subsequent calls
+    so that its memoized transitive closures are shared between actions (and between builds that share a scan, see
+    'share_dependency_graph').
+
+    :param sources: a dict of the processed source files
+    :return: the dependency graph (data.DependencyGraph)
+    """
+    entry = _get_dependency_graph_entry(sources)
+    if entry['graph'] is None:
+        entry['graph'] = DependencyGraph(sources)
+
+    return entry['graph']
+
+
+def share_dependency_graph(sources, other_sources):
+    """
+    Makes the supplied sources dicts use the same dependency graph (see 'get_dependency_graph').
+
+    The sources must have exactly the same internal dependencies.
+
+    :param sources: a dict of the processed source files
+    :param other_sources: another dict of processed source files, with the same dependencies
+    :return: nothing
+    """
+    entry = _get_dependency_graph_entry(sources)
+    if not any(current is other_sources for current in entry['sources']):
+        entry['sources'].append(other_sources)
+
+
+def _get_dependency_graph_entry(sources):
+    """
+    Retrieves the dependency graph cache entry of the supplied sources, creating it if needed.
+
+    Only the entries of the last few sources dicts are kept (see 'MAX_CACHED_DEPENDENCY_GRAPHS'); the cache is also
+    cleared by each new scan (see 'process_build_sources').
+
+    :param sources: a dict of the processed source files
+    :return: the cache entry (a dict with the 'sources' using the entry and their 'graph', if already built)
+    """
+    for entry in _dependency_graph_cache:
+        if any(current is sources for current in entry['sources']):
+            return entry
+
+    entry = {'sources': [sources], 'graph': None}
+    _dependency_graph_cache.append(entry)
+    del _dependency_graph_cache[:-MAX_CACHED_DEPENDENCY_GRAPHS]
+    return entry
+
+
+def select_target_sources(sources, sources_dir, target_config):
+    """
+    Selects the sources linked into the supplied link target.
+
+    Implementation files are selected if their paths (relative to the sources directory) match any of the target's
+    'sources' glob patterns or if they are one of the target's 'entries'. The selection is then extended with the
+    transitive implementation closure of the selected files: for each header that a selected file includes
+    (directly or through other headers), the implementation files with the same path and name (for example,
+    'net/socket.cpp' for 'net/socket.h') are selected as well, until no more files are added.
+
+    If the target sets neither 'sources' nor 'entries', all sources are selected.
+
+    :param sources: a dict of the processed source files
+    :param sources_dir: the sources directory
+    :param target_config: the link target configuration (see 'utils.Build.get_link_targets')
+    :return: a dict of the selected source files
+    :raise: ValueError if any of the target's entries is not a known implementation file
+    """
+    patterns = target_config.get('sources', [])
+    entries = target_config.get('entries', [])
+
+    if len(patterns) == 0 and len(entries) == 0:
+        return sources
+
+    implementations = {
+        path: source for path, source in sources.items() if source.file_type == SourceType.Implementation
+    }
+
+    selected = set()
+    for entry in entries:
+        entry_path = os.path.join(sources_dir, entry)
+        if entry_path not in implementations:
+            raise ValueError("Link target entry [{0}] is not a known implementation file".format(entry))
+        selected.add(entry_path)
+
+    for path in implementations:
+        relative_path = os.path.relpath(path, sources_dir)
+        if any(fnmatch.fnmatch(relative_path, pattern) for pattern in patterns):
+            selected.add(path)
+
+    implementations_by_name = {}
+    for path in implementations:
+        implementations_by_name.setdefault(os.path.splitext(path)[0], []).append(path)
+
+    graph = get_dependency_graph(sources)
+    pending = list(selected)
+    while len(pending) > 0:
+        for include in graph.get_includes(pending.pop()):
+            for path in implementations_by_name.get(os.path.splitext(include)[0], []):
+                if path not in selected:
+                    selected.add(path)
+                    pending.append(path)
+
+    return {path: sources[path] for path in selected}
+
+
+def partition_shards(sources, compile_costs, shard_count):
+    """
+    Splits the supplied sources into shards with similar compile costs, so that all shards of a build take roughly
+    the same time.
+
+    Sources are assigned to the least expensive shard, most expensive sources first (ties are broken by path), so
+    the result only depends on the sources and their costs.
+
+    :param sources: the source files to be split
+    :param compile_costs: a dict of the compile costs of the sources (see 'estimate_compile_costs')
+    :param shard_count: the number of shards
+    :return: a list of shards, each a list of source files
+    """
+    shards = [[] for _ in range(shard_count)]
+    heap = [(0, index) for index in range(shard_count)]
+    for source in sorted(sources, key=lambda current: (-compile_costs.get(current.file_path, 0), current.file_path)):
+        shard_cost, index = heapq.heappop(heap)
+        shards[index].append(source)
+        heapq.heappush(heap, (shard_cost + compile_costs.get(source.file_path, 0), index))
+
+    return shards
+
+
+def get_shard_fragment(db, source_paths):
+    """
+    Retrieves the part of the files database produced by a sharded build (see 'merge_shard_fragment').
+
+    :param db: the files database
+    :param source_paths: the paths of the sources built by the shard
+    :return: a dict with the sources' hashes ('files'), their data in each metadata section ('metadata') and their
+    produced files ('artifacts')
+    """
+    recorded_artifacts = Database.get_metadata(db, 'artifacts').get('sources', {})
+
+    metadata = {}
+    for section in SHARD_METADATA_SECTIONS:
+        recorded = Database.get_metadata(db, section)
+        metadata[section] = {path: recorded[path] for path in source_paths if path in recorded}
+
+    return {
+        'files': {path: db[path] for path in source_paths if path in db},
+        'metadata': metadata,
+        'artifacts': {path: recorded_artifacts[path] for path in source_paths if path in recorded_artifacts}
+    }
+
+
+def merge_shard_fragment(db, fragment):
+    """
+    Adds the supplied part of the files database, produced by a sharded build, to the database.
+
+    :param db: the files database
+    :param fragment: the database fragment (see 'get_shard_fragment')
+    :return: nothing
+    """
+    db.update(fragment['files'])
+
+    for section, data in fragment['metadata'].items():
+        Database.get_metadata(db, section).update(data)
+
+    Database.get_metadata(db, 'artifacts').setdefault('sources', {}).update(fragment['artifacts'])
+
+
+def estimate_compile_costs(sources, compile_times):
+    """
+    Builds a dict containing the compile cost of each implementation file.
+
+    Recorded compile times (in seconds) are used whenever they are available. For all other files, the cost is
+    estimated based on the lines of code of the file and of all of its (transitive) internal dependencies; if there
+    are recorded times, the estimate is scaled to seconds using the average time per line of the recorded files,
+    otherwise all costs are expressed in lines of code.
+
+    :param sources: a dict of the processed source files
+    :param compile_times: a dict of recorded compile times (source path -> seconds)
+    :return: (compile costs dict, True if the costs are in seconds or False if they are in lines of code)
+    """
+    graph = get_dependency_graph(sources)
+
+    lines_counts = {}
+    for source in sources.values():
+        if source.file_type == SourceType.Implementation:
+            lines_count = source.total_lines
+            for dependency in graph.get_includes(source.file_path):
+                if dependency in sources:
+                    lines_count += sources[dependency].total_lines
+
+            lines_counts[source.file_path] = lines_count
+
+    recorded = [path for path in lines_counts if path in compile_times]
+    recorded_lines = sum(lines_counts[path] for path in recorded)
+
+    if recorded_lines > 0:
+        seconds_per_line = sum(compile_times[path] for path in recorded) / recorded_lines
+        costs = {
+            path: compile_times[path] if path in compile_times else lines_count * seconds_per_line
+            for path, lines_count in lines_counts.items()
+        }
+        return costs, True
+    else:
+        return lines_counts, False
+
+
+def process_header_impact(sources, compile_costs):
+    """
+    Builds a dict containing the impact of changing each header file.
+
+    The impact of a header is the list of implementation files that depend on it (directly or transitively) and
+    the sum of their compile costs; that is, the work needed to rebuild everything after the header is modified.
+
+    :param sources: a dict of the processed source files
+    :param compile_costs: a dict of implementation file compile costs (see 'estimate_compile_costs')
+    :return: a dict with header file paths as keys and (dependent implementation files list, total cost) as values
+    """
+    graph = get_dependency_graph(sources)
+
+    header_impact = {}
+    for header in sources.values():
+        if header.file_type == SourceType.Header:
+            dependents = [sources[path] for path in graph.get_impacted_implementations(header.file_path)]
+            header_impact[header.file_path] = (
+                dependents,
+                sum(compile_costs.get(current.file_path, 0) for current in dependents)
+            )
+
+    return header_impact
@@ -3,54 +3,151 @@
 # See the project's LICENSE file for the full text
 
 import os
-import re
+import sys
+from array import array
 
-from cadb.utils import FileSystem
-
-PATTERN_DIRECTIVES = re.compile(r"^(#.+)")
-PATTERN_INCLUDES = re.compile(r"^#include (.+)")
+from cadb.data.PathTable import PATHS
+from cadb.utils import FileSystem, Includes, Preprocessor
 
 
 class SourceFile:
-    def __init__(self, includes_config, path, file_type, db_hash=None, object_file_path=None):
+    __slots__ = (
+        'file_id', 'file_path', 'file_type', 'object_file_path', 'file_hash', 'has_changed', 'size', 'total_lines',
+        'internal_dependency_ids', 'external_dependency_ids'
+    )
+
+    def __init__(self, includes_config, path, file_type, db_hash=None, object_file_path=None, include_resolver=None,
+                 macros=None, file_hash=None, dependencies=None):
         """
         Creates a new source file object.
 
-        The file contents are hashed as part of this object's creation and all internal/external dependencies are
-        gathered. The source file is marked as changed if the current hash does not match the hash provided by the
-        database (if any).
+        The file contents are hashed (unless a hash is supplied) as part of this object's creation and all
+        internal/external dependencies are gathered. The source file is marked as changed if the current hash does
+        not match the hash provided by the database (if any).
+
+        All paths are interned in the shared path table (data.PathTable.PATHS) and the dependencies are stored as
+        arrays of path IDs, to keep the memory used by large source trees low.
 
         :param includes_config: JSON configuration object describing how to handle include directive parsing
         :param path: the file's full FS path
         :param file_type: the file's type (utils.Types.SourceType)
         :param db_hash: the previously calculated hash for the file, if any (default: None)
         :param object_file_path: the corresponding full object file path, if any (default: None)
+        :param include_resolver: the resolver used for finding included files in the configured include paths; if
+        not set, external includes are never resolved and internal ones are relative to the file (default: None)
+        :param macros: the known macros used for evaluating preprocessor conditionals (utils.Preprocessor.Macros); if
+        set, only includes that are not disabled by conditionals are used as dependencies (default: None)
+        :param file_hash: the file's current hash, if it is already known (for example, from the git index); if not
+        set, the file is hashed (default: None)
+        :param dependencies: the file's known internal/external dependency paths, as a tuple of two lists (for
+        example, from a compiler-generated dependency file); if set, the file's includes are not scanned (default:
+        None)
         """
-        self.file_path = path
+        self.file_id = PATHS.get_id(path)
+        self.file_path = PATHS.get_path(self.file_id)
         self.file_type = file_type
-        self.object_file_path = object_file_path
+        self.object_file_path = sys.intern(object_file_path) if object_file_path is not None else None
 
-        self.file_hash = FileSystem.get_file_hash(path)
+        self.file_hash = file_hash if file_hash is not None else FileSystem.get_file_hash(path)
 
-        self.raw_directives = []
-        self.external_dependencies = []
-        self.internal_dependencies = []
-        self.total_lines = 0
         with open(path, "r") as currentFile:
-            for currentLine in currentFile:
-                self.total_lines += 1
-                for directive in PATTERN_DIRECTIVES.findall(currentLine):
-                    self.raw_directives.append(directive)
-                    for include in PATTERN_INCLUDES.findall(currentLine):
-                        if include.startswith(includes_config['external']['start']) and include.endswith(
-                                includes_config['external']['end']):
-                            self.external_dependencies.append(include[1:-1])
-                        elif include.startswith(includes_config['internal']['start']) and include.endswith(
-                                includes_config['internal']['end']):
-                            relative_path = include[1:-1]
-                            file_dir = os.path.dirname(path)
-                            absolute_path = os.path.normpath(file_dir + os.path.sep + relative_path)
-                            self.internal_dependencies.append(absolute_path)
+            content = currentFile.read()
+
+        self.internal_dependency_ids = array('I')
+        self.external_dependency_ids = array('I')
+        self.total_lines = content.count("\n") + (1 if len(content) > 0 and not content.endswith("\n") else 0)
+
+        if dependencies is not None:
+            internal_dependencies, external_dependencies = dependencies
+            self.internal_dependency_ids.extend(PATHS.get_id(current) for current in internal_dependencies)
+            self.external_dependency_ids.extend(PATHS.get_id(current) for current in external_dependencies)
+        else:
+            stop_at_code = includes_config.get('stopAtCode', False)
+            if macros is not None:
+                includes = Preprocessor.scan_live_includes(content, macros, stop_at_code)
+            else:
+                includes = Includes.scan_includes(content, stop_at_code)
+
+            for include in includes:
+                if include.startswith(includes_config['external']['start']) and include.endswith(
+                        includes_config['external']['end']):
+                    self._add_dependency(include[1:-1], False, include_resolver)
+                elif include.startswith(includes_config['internal']['start']) and include.endswith(
+                        includes_config['internal']['end']):
+                    self._add_dependency(include[1:-1], True, include_resolver)
 
         self.has_changed = self.file_hash != db_hash
         self.size = os.path.getsize(path)
+
+    def derive(self, db_hash, object_file_path, dependencies=None):
+        """
+        Creates a copy of this source file for another build configuration, without reading the file again.
+
+        The copy shares the file's hash and (unless new ones are supplied) its dependencies.
+
+        :param db_hash: the previously calculated hash for the file in the other build's database, if any
+        :param object_file_path: the corresponding full object file path in the other build, if any
+        :param dependencies: the file's known internal/external dependency paths in the other build, as a tuple of
+        two lists, if they differ from this file's dependencies (default: None)
+        :return: the new source file object
+        """
+        source_file = SourceFile.__new__(SourceFile)
+        source_file.file_id = self.file_id
+        source_file.file_path = self.file_path
+        source_file.file_type = self.file_type
+        source_file.object_file_path = sys.intern(object_file_path) if object_file_path is not None else None
+        source_file.file_hash = self.file_hash
+        source_file.has_changed = self.file_hash != db_hash
+        source_file.size = self.size
+        source_file.total_lines = self.total_lines
+
+        if dependencies is not None:
+            internal_dependencies, external_dependencies = dependencies
+            source_file.internal_dependency_ids = array('I', map(PATHS.get_id, internal_dependencies))
+            source_file.external_dependency_ids = array('I', map(PATHS.get_id, external_dependencies))
+        else:
+            source_file.internal_dependency_ids = self.internal_dependency_ids
+            source_file.external_dependency_ids = self.external_dependency_ids
+
+        return source_file
+
+    @property
+    def internal_dependencies(self):
+        """
+        The paths of all internal dependencies of the file.
+
+        :return: a new list of paths
+        """
+        return [PATHS.get_path(current) for current in self.internal_dependency_ids]
+
+    @property
+    def external_dependencies(self):
+        """
+        The names of all external dependencies of the file.
+
+        :return: a new list of names
+        """
+        return [PATHS.get_path(current) for current in self.external_dependency_ids]
+
+    def _add_dependency(self, include, quoted, include_resolver):
+        """
+        Adds the supplied include to the file's internal or external dependencies.
+
+        Includes (quoted or angle-bracket) are internal only if they resolve to a file inside the sources directory;
+        all others (unresolved or found in include paths outside the sources directory) are external. Without a
+        resolver, quoted includes are taken as relative to the file and are always internal.
+
+        :param include: the included path, without its start/end characters
+        :param quoted: True, if the include is a quoted one
+        :param include_resolver: the resolver to use, if any
+        :return: nothing
+        """
+        file_dir = os.path.dirname(self.file_path)
+        resolved_path = include_resolver.resolve(file_dir, include, quoted) if include_resolver is not None else None
+
+        if resolved_path is not None and include_resolver.is_internal(resolved_path):
+            self.internal_dependency_ids.append(PATHS.get_id(resolved_path))
+        elif quoted and include_resolver is None:
+            self.internal_dependency_ids.append(PATHS.get_id(os.path.normpath(file_dir + os.path.sep + include)))
+        else:
+            self.external_dependency_ids.append(PATHS.get_id(include))
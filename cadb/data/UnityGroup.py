@@ -0,0 +1,38 @@
+# MIT License
+# Copyright (c) 2016 https://github.com/sndnv
+# See the project's LICENSE file for the full text
+
+import hashlib
+import os
+
+
+class UnityGroup:
+    __slots__ = ('name', 'file_path', 'object_file_path', 'file_hash', 'members')
+
+    def __init__(self, name, unity_dir, members):
+        """
+        Creates a new unity (jumbo) group.
+
+        A unity group is compiled as a single generated implementation file that includes all of its members, so
+        that the compiler is started (and the shared headers are parsed) only once for all of them.
+
+        :param name: the group's name; used as the generated file's name (with the members' extension)
+        :param unity_dir: the directory in which the generated file and its object file are stored
+        :param members: the implementation files (data.SourceFile) that belong to the group
+        """
+        self.name = name
+        self.file_path = os.path.join(unity_dir, name)
+        self.object_file_path = os.path.splitext(self.file_path)[0] + ".o"
+        self.members = members
+        self.file_hash = hashlib.sha256(self.content.encode()).hexdigest()
+
+    @property
+    def content(self):
+        """
+        The content of the generated implementation file.
+
+        :return: the file content, including all members (with their full paths)
+        """
+        lines = ["// Generated by cadb; do not edit"]
+        lines.extend("#include \"{0}\"".format(os.path.abspath(member.file_path)) for member in self.members)
+        return "\n".join(lines) + "\n"
@@ -2,11 +2,46 @@
 # Copyright (c) 2016 https://github.com/sndnv
 # See the project's LICENSE file for the full text
 
+import fnmatch
+import glob
+import hashlib
+import json
 import os
+import re
+import shlex
+import shutil
 import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+from cadb.utils import FileSystem
 from cadb.utils.Types import SourceType
 
+PRECOMPILED_HEADER_NAME = "cadb_precompiled.h"
+UNITY_DIR_NAME = "cadb_unity"
+BATCH_DIR_NAME = "cadb_batch"
+RESPONSE_FILE_THRESHOLD = 32000
+ARCHIVE_MANIFEST_EXTENSION = ".members"
+DEFAULT_ARCHIVER = "ar"
+DEFAULT_REMOVAL_WORKERS = 16
+SHARDS_DIR_NAME = "cadb_shards"
+SHARD_FRAGMENT_NAME = "fragment.json"
+SHARD_OBJECTS_DIR_NAME = "objects"
+PATH_OPTIONS = ["-I", "-iquote", "-isystem", "-idirafter", "-include", "-imacros"]
+
+PATTERN_DIAGNOSTIC = re.compile(
+    r"^(?P<path>[^:\s][^:]*):(?P<line>[0-9]+):(?:(?P<column>[0-9]+):)? "
+    r"(?P<severity>fatal error|error|warning|note): (?P<message>.*)$"
+)
+PATTERN_SHARD_DIR = re.compile(r"^shard-(?P<index>[0-9]+)-of-(?P<count>[0-9]+)$")
+PATTERN_DEPENDENCY_RULE_SEPARATOR = re.compile(r":(?=[ \t\n]|$)")
+PATTERN_DEPENDENCY_FILE_PATHS = re.compile(r"(?:\\.|[^\s\\])+")
+PATTERN_DEPENDENCY_FILE_ESCAPES = re.compile(r"\\([ #\\])|\$\$")
+
+_executables = {}
+_compiler_versions = {}
+
 
 def get_object_file_path(source_path, sources_dir, build_dir):
     """
@@ -21,6 +56,41 @@ def get_object_file_path(source_path, sources_dir, build_dir):
     return os.path.splitext(build_path)[0] + ".o"
 
 
+def get_dependency_file_path(object_file_path):
+    """
+    Creates a dependency file path ('.d', as generated by the compiler with '-MMD'), based on the supplied object
+    file path.
+
+    :param object_file_path: object file path
+    :return: the calculated dependency file path
+    """
+    return os.path.splitext(object_file_path)[0] + ".d"
+
+
+def parse_dependency_file(dependency_file_path):
+    """
+    Parses the specified dependency file (a make rule, as generated by the compiler with '-MMD').
+
+    Only the first rule in the file is used; escaped spaces, '#' and '$' in paths are supported.
+
+    :param dependency_file_path: the file to be parsed
+    :return: a list with the full paths of all prerequisites of the rule (including the source file itself)
+    :raise: ValueError if the file does not contain a valid rule
+    """
+    with open(dependency_file_path, "r") as dependency_file:
+        content = dependency_file.read().replace("\\\r\n", " ").replace("\\\n", " ")
+
+    separator = PATTERN_DEPENDENCY_RULE_SEPARATOR.search(content)
+    if separator is None:
+        raise ValueError("Invalid dependency file encountered: [{0}]".format(dependency_file_path))
+
+    prerequisites = content[separator.end():].split("\n", 1)[0]
+    return [
+        os.path.abspath(PATTERN_DEPENDENCY_FILE_ESCAPES.sub(lambda match: match.group(1) or "$", path))
+        for path in PATTERN_DEPENDENCY_FILE_PATHS.findall(prerequisites)
+    ]
+
+
 def object_file_exists(object_file_path):
     """
     Checks if the supplied object file path exists.
@@ -54,19 +124,79 @@ def remove_object_file(object_file_path):
         os.remove(object_file_path)
 
 
-def run_external_command(command):
+def remove_files(file_paths, root_dir, max_workers=DEFAULT_REMOVAL_WORKERS):
     """
-    Runs the supplied command in a new subprocess and waits for it to complete.
+    Removes the specified files (in parallel) and all directories left empty by their removal, up to (but not
+    including) the supplied root directory.
 
-    :param command: the command to be run
-    :return: a tuple: (command return code, messages sent to stdout, messages sent to stderr)
+    :param file_paths: the files to remove
+    :param root_dir: the directory at which to stop removing empty directories
+    :param max_workers: the maximum number of files removed at the same time (default is 'DEFAULT_REMOVAL_WORKERS')
+    :return: a tuple: (number of removed files, number of removed directories)
     """
-    process = subprocess.Popen(
-        command,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        universal_newlines=True
-    )
+    def remove_file(file_path):
+        try:
+            os.remove(file_path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        removed_files = sum(executor.map(remove_file, file_paths))
+
+    root_dir = os.path.abspath(root_dir)
+    removed_dirs = 0
+    for current_dir in sorted({os.path.dirname(os.path.abspath(path)) for path in file_paths}, reverse=True):
+        while current_dir.startswith(root_dir + os.path.sep):
+            try:
+                os.rmdir(current_dir)
+                removed_dirs += 1
+            except OSError:
+                # the directory is not empty (or cannot be removed), so neither are its parents
+                break
+            current_dir = os.path.dirname(current_dir)
+
+    return removed_files, removed_dirs
+
+
+def get_executable_path(executable):
+    """
+    Resolves the supplied executable to its full path, searching 'PATH' if needed; lookups are cached.
+
+    :param executable: the executable name or path
+    :return: the full path to the executable or the executable as it is, if it cannot be found
+    """
+    if executable not in _executables:
+        resolved = shutil.which(executable)
+        _executables[executable] = os.path.abspath(resolved) if resolved is not None else executable
+
+    return _executables[executable]
+
+
+def run_external_command(arguments, working_dir=None):
+    """
+    Runs the supplied command in a new subprocess (without a shell) and waits for it to complete.
+
+    The executable is resolved to its full path, so that (if no working directory is set) the subprocess can be
+    started with 'posix_spawn', which is much cheaper than fork/exec for a large parent process; file descriptors
+    are not inheritable by default, so there is no need to close them in the subprocess.
+
+    :param arguments: the command to be run, as a list of arguments (starting with the executable)
+    :param working_dir: the directory in which to run the command (default is None; the current directory)
+    :return: a tuple: (command return code, messages sent to stdout, messages sent to stderr); if the command cannot
+             be started, the return code is 127 and the error is sent as the stderr message
+    """
+    try:
+        process = subprocess.Popen(
+            [get_executable_path(arguments[0])] + list(arguments[1:]),
+            cwd=working_dir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            close_fds=False,
+            universal_newlines=True
+        )
+    except OSError as e:
+        return 127, "", "Failed to run command [{0}]: [{1}]".format(arguments[0], e)
 
     stdout, stderr = process.communicate()
     return_code = process.returncode
@@ -74,7 +204,38 @@ def run_external_command(command):
     return return_code, stdout, stderr
 
 
-def compile_object(source, compiler_config):
+def get_command_arguments(command):
+    """
+    Converts the supplied command into a list of arguments.
+
+    :param command: the command, as a string (split with shell-like syntax, see 'shlex') or as a list of arguments
+    :return: the list of arguments
+    """
+    if isinstance(command, str):
+        return shlex.split(command)
+    else:
+        return [str(current) for current in command]
+
+
+def get_response_file_argument(response_file_path, arguments):
+    """
+    Writes the supplied arguments into a response file and creates the argument for passing the file to a
+    compiler/linker ('@<file>').
+
+    Each argument is quoted (with backslashes and quotes escaped), as expected by GCC/Clang.
+
+    :param response_file_path: the path of the response file
+    :param arguments: the arguments to be written
+    :return: the response file argument
+    """
+    with open(response_file_path, "w") as response_file:
+        for argument in arguments:
+            response_file.write('"{0}"\n'.format(argument.replace("\\", "\\\\").replace('"', '\\"')))
+
+    return "@" + response_file_path
+
+
+def compile_object(source, compiler_config, dependency_file=False, precompiled_header=None):
     """
     Compiles the supplied source file using the specified compiler configuration.
 
@@ -82,44 +243,446 @@ def compile_object(source, compiler_config):
 
     :param source: the source file object describing the object to be compiled
     :param compiler_config: the compiler configuration to be used
+    :param dependency_file: set to True to have the compiler generate a dependency file ('-MMD'), next to the
+    object file (see 'get_dependency_file_path'); default is False
+    :param precompiled_header: the path to a (compiled) precompiled header to be included, if any (default is None)
     :return: a tuple: (compilation command return code, messages sent to stdout, messages sent to stderr)
     """
-    command = '{0} -o "{2.object_file_path}" {1} "{2.file_path}"'.format(
-        compiler_config['path'],
-        " ".join(compiler_config['options']),
-        source
-    )
+    arguments = [compiler_config['path'], "-o", source.object_file_path]
+    arguments.extend(compiler_config['options'])
+    arguments.append(source.file_path)
+
+    if dependency_file:
+        arguments.extend(["-MMD", "-MF", get_dependency_file_path(source.object_file_path)])
+
+    if precompiled_header is not None:
+        arguments.extend(["-Winvalid-pch", "-include", precompiled_header])
+
+    return run_external_command(arguments)
 
-    return run_external_command(command)
 
+def compile_object_timed(source, compiler_config, dependency_file=False, precompiled_header=None):
+    """
+    Compiles the supplied source file (see 'compile_object') and measures how long the compilation took.
+
+    :param source: the source file object describing the object to be compiled
+    :param compiler_config: the compiler configuration to be used
+    :param dependency_file: set to True to have the compiler generate a dependency file (default is False)
+    :param precompiled_header: the path to a precompiled header to be included, if any (default is None)
+    :return: a tuple: (compilation command return code, messages sent to stdout, messages sent to stderr,
+             compilation time in seconds)
+    """
+    start = time.perf_counter()
+    return_code, stdout, stderr = compile_object(source, compiler_config, dependency_file, precompiled_header)
+    return return_code, stdout, stderr, time.perf_counter() - start
 
-def link_objects(sources, linker_config, logger):
+
+def get_header_dependencies(source, compiler_config):
+    """
+    Retrieves all files included by the supplied source file, including system headers, by running only the
+    compiler's preprocessor ('-M').
+
+    No precompiled header is used, so the headers it would provide are listed as well.
+
+    :param source: the source file object describing the file to be checked
+    :param compiler_config: the compiler configuration to be used
+    :return: a list with the full paths of all included files (without the source file itself)
+    :raise: ValueError if the included files cannot be retrieved
+    """
+    descriptor, dependency_file_path = tempfile.mkstemp(suffix=".d")
+    os.close(descriptor)
+
+    try:
+        arguments = [compiler_config['path'], "-M", "-MF", dependency_file_path]
+        arguments.extend(compiler_config['options'])
+        arguments.append(source.file_path)
+
+        return_code, _, stderr = run_external_command(arguments)
+        if return_code != 0:
+            raise ValueError("Failed to retrieve included files of [{0}]: [{1}]".format(source.file_path, stderr))
+
+        source_path = os.path.abspath(source.file_path)
+        return [current for current in parse_dependency_file(dependency_file_path) if current != source_path]
+    finally:
+        os.remove(dependency_file_path)
+
+
+def get_compiler_version(compiler_path):
+    """
+    Retrieves the version information of the specified compiler (the output of '<compiler> --version').
+
+    The result is cached for each compiler path, so the compiler is only run once per process.
+
+    :param compiler_path: the compiler's path
+    :return: the compiler's version information (or the error, if the compiler could not be run)
+    """
+    if compiler_path not in _compiler_versions:
+        return_code, stdout, stderr = run_external_command([compiler_path, "--version"])
+        _compiler_versions[compiler_path] = stdout if return_code == 0 else "{0}: {1}".format(return_code, stderr)
+
+    return _compiler_versions[compiler_path]
+
+
+def check_syntax(source, compiler_config):
+    """
+    Checks the supplied source file for errors using the specified compiler configuration, without producing an
+    object file ('-fsyntax-only').
+
+    The command is run in a new subprocess and the function waits for it to complete.
+
+    :param source: the source file object describing the file to be checked
+    :param compiler_config: the compiler configuration to be used
+    :return: a tuple: (check command return code, messages sent to stdout, messages sent to stderr)
+    """
+    arguments = [compiler_config['path'], "-fsyntax-only"]
+    arguments.extend(compiler_config['options'])
+    arguments.append(source.file_path)
+
+    return run_external_command(arguments)
+
+
+def parse_diagnostics(messages):
+    """
+    Retrieves all diagnostics ('<path>:<line>:<column>: <severity>: <message>') from the supplied compiler messages.
+
+    Lines that are not diagnostics (for example, 'In file included from ...' or the source code lines shown by the
+    compiler) are ignored.
+
+    :param messages: the messages sent to stdout/stderr by the compiler
+    :return: a list of tuples: (normalized file path, line, column (0, if not set), severity, message)
+    """
+    diagnostics = []
+    for current in messages.splitlines():
+        match = PATTERN_DIAGNOSTIC.match(current)
+        if match is not None:
+            diagnostics.append((
+                os.path.normpath(match.group('path')),
+                int(match.group('line')),
+                int(match.group('column') or 0),
+                match.group('severity'),
+                match.group('message')
+            ))
+
+    return diagnostics
+
+
+def get_absolute_compiler_options(compiler_options):
+    """
+    Makes the paths in all path options (see 'PATH_OPTIONS') of the supplied compiler options absolute, so that the
+    options can be used from any working directory.
+
+    Both the joined ('-Ipath') and the separated ('-I', 'path') forms are supported; all other options are kept as
+    they are.
+
+    :param compiler_options: the compiler options
+    :return: a new list of compiler options
+    """
+    absolute_options = []
+    expects_path = False
+    for option in compiler_options:
+        if expects_path:
+            absolute_options.append(os.path.abspath(option))
+            expects_path = False
+        elif option in PATH_OPTIONS:
+            absolute_options.append(option)
+            expects_path = True
+        else:
+            prefix = next((current for current in PATH_OPTIONS if option.startswith(current)), None)
+            if prefix is not None and len(option) > len(prefix) and not option.startswith("-include-"):
+                absolute_options.append(prefix + os.path.abspath(option[len(prefix):]))
+            else:
+                absolute_options.append(option)
+
+    return absolute_options
+
+
+def split_batch_messages(messages, sources):
+    """
+    Splits the diagnostics of a batched compilation between the compiled sources.
+
+    Compilers report the diagnostics of each file together, starting with a line that contains the file's path (for
+    example, 'a.cpp: In function ...' or 'In file included from a.cpp:1:'), so every line is assigned to the last
+    source whose path was found in a line.
+
+    :param messages: the messages sent to stdout/stderr by the compiler
+    :param sources: the compiled sources
+    :return: a dict with source file paths as keys and their messages as values
+    """
+    paths = {os.path.abspath(source.file_path): source.file_path for source in sources}
+    split_messages = {source.file_path: [] for source in sources}
+    current = sources[0].file_path
+    for line in messages.splitlines():
+        current = next((source_path for path, source_path in paths.items() if path in line), current)
+        split_messages[current].append(line)
+
+    return {path: "\n".join(lines) + "\n" if len(lines) > 0 else "" for path, lines in split_messages.items()}
+
+
+def compile_batch_timed(sources, compiler_config, build_dir, dependency_file=False, precompiled_header=None):
+    """
+    Compiles the supplied source files with a single compiler invocation and measures how long it took.
+
+    The compiler is run in a new temporary directory (in the batch directory of the build directory), where it
+    creates all object (and dependency) files, which are then moved to their expected paths; this means that all
+    sources must have different file names and that relative paths are only supported in path options (see
+    'get_absolute_compiler_options'). Files for which no object file was created are compiled again individually
+    (see 'compile_object'), to get their exact return codes and messages.
+
+    :param sources: the source file objects describing the objects to be compiled
+    :param compiler_config: the compiler configuration to be used
+    :param build_dir: the build directory
+    :param dependency_file: set to True to have the compiler generate dependency files (default is False)
+    :param precompiled_header: the path to a precompiled header to be included, if any (default is None)
+    :return: a list of tuples, one for each source, in the same order:
+             (compilation return code, messages sent to stdout, messages sent to stderr, compilation time in seconds);
+             the time of the batch is split between the sources based on their sizes
+    """
+    batches_dir = os.path.join(build_dir, BATCH_DIR_NAME)
+    os.makedirs(batches_dir, exist_ok=True)
+    batch_dir = tempfile.mkdtemp(prefix="batch_", dir=batches_dir)
+
+    options = get_absolute_compiler_options(compiler_config['options'])
+    if "-c" not in options:
+        options.append("-c")
+
+    arguments = [compiler_config['path'] if os.path.sep not in compiler_config['path'] else os.path.abspath(
+        compiler_config['path']
+    )]
+    arguments.extend(options)
+    arguments.extend(os.path.abspath(source.file_path) for source in sources)
+
+    if dependency_file:
+        arguments.append("-MMD")
+
+    if precompiled_header is not None:
+        arguments.extend(["-Winvalid-pch", "-include", os.path.abspath(precompiled_header)])
+
+    try:
+        start = time.perf_counter()
+        _, stdout, stderr = run_external_command(arguments, batch_dir)
+        batch_time = time.perf_counter() - start
+
+        stdout_messages = split_batch_messages(stdout, sources)
+        stderr_messages = split_batch_messages(stderr, sources)
+        total_size = max(sum(source.size for source in sources), 1)
+
+        results = []
+        for source in sources:
+            name = os.path.splitext(os.path.basename(source.file_path))[0]
+            batch_object_file = os.path.join(batch_dir, name + ".o")
+            if os.path.isfile(batch_object_file):
+                os.replace(batch_object_file, source.object_file_path)
+                if dependency_file and os.path.isfile(os.path.join(batch_dir, name + ".d")):
+                    os.replace(os.path.join(batch_dir, name + ".d"), get_dependency_file_path(source.object_file_path))
+
+                results.append((
+                    0,
+                    stdout_messages[source.file_path],
+                    stderr_messages[source.file_path],
+                    batch_time * source.size / total_size
+                ))
+            else:
+                results.append(compile_object_timed(source, compiler_config, dependency_file, precompiled_header))
+
+        return results
+    finally:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+
+
+def get_precompiled_header_path(build_dir):
+    """
+    Creates the path of the generated precompiled header, in the supplied build directory.
+
+    :param build_dir: build directory path
+    :return: the precompiled header path (the compiled header is stored next to it, with a '.gch' extension)
+    """
+    return os.path.join(build_dir, PRECOMPILED_HEADER_NAME)
+
+
+def get_precompiled_header_content(external_headers, internal_headers):
+    """
+    Creates the content of a precompiled header that includes the supplied headers.
+
+    :param external_headers: the names of all external headers to include (as used in angle-bracket includes)
+    :param internal_headers: the paths of all internal headers to include
+    :return: the header's content
+    """
+    lines = ["// Generated by cadb; do not edit"]
+    lines.extend("#include <{0}>".format(current) for current in external_headers)
+    lines.extend("#include \"{0}\"".format(os.path.abspath(current)) for current in internal_headers)
+    return "\n".join(lines) + "\n"
+
+
+def write_precompiled_header(header_path, content):
+    """
+    Writes the supplied content into the precompiled header file, creating its directory, if needed.
+
+    :param header_path: the path of the precompiled header
+    :param content: the header content (see 'get_precompiled_header_content')
+    :return: nothing
+    """
+    os.makedirs(os.path.dirname(header_path), exist_ok=True)
+    with open(header_path, "w") as header_file:
+        header_file.write(content)
+
+
+def get_unity_dir(build_dir):
+    """
+    Creates the path of the directory for generated unity files, in the supplied build directory.
+
+    :param build_dir: build directory path
+    :return: the unity files directory path
+    """
+    return os.path.join(build_dir, UNITY_DIR_NAME)
+
+
+def write_unity_file(unity_group):
+    """
+    Writes the generated implementation file of the supplied unity group, if its content has changed.
+
+    :param unity_group: the unity group (data.UnityGroup)
+    :return: True, if the file was (re)written; False, if it already had the same content
+    """
+    content = unity_group.content
+    if os.path.isfile(unity_group.file_path):
+        with open(unity_group.file_path, "r") as unity_file:
+            if unity_file.read() == content:
+                return False
+
+    os.makedirs(os.path.dirname(unity_group.file_path), exist_ok=True)
+    with open(unity_group.file_path, "w") as unity_file:
+        unity_file.write(content)
+
+    return True
+
+
+def remove_unity_files(build_dir):
+    """
+    Removes all generated unity files and their object files from the supplied build directory.
+
+    :param build_dir: build directory path
+    :return: the number of removed files
+    """
+    removed = 0
+    unity_dir = get_unity_dir(build_dir)
+    if os.path.isdir(unity_dir):
+        with os.scandir(unity_dir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    os.remove(entry.path)
+                    removed += 1
+
+    return removed
+
+
+def compile_precompiled_header(header_path, compiler_config):
+    """
+    Compiles the supplied header into a precompiled header ('<header>.gch'), using the specified compiler
+    configuration; a dependency file ('<header>.d') is generated as well. The dependency file lists system headers
+    too ('-MD'), so that changes to any header used by the precompiled header (for example, after a library
+    upgrade) are detected.
+
+    The command is run in a new subprocess and the function waits for it to complete.
+
+    :param header_path: the path to the header to be compiled
+    :param compiler_config: the compiler configuration to be used
+    :return: a tuple: (compilation command return code, messages sent to stdout, messages sent to stderr)
+    """
+    arguments = [compiler_config['path'], "-x", "c++-header", "-o", header_path + ".gch"]
+    arguments.extend(compiler_config['options'])
+    arguments.extend([header_path, "-MD", "-MF", get_dependency_file_path(header_path)])
+
+    return run_external_command(arguments)
+
+
+def get_linked_object_files(sources, unity_groups=None):
+    """
+    Retrieves the object files to be linked for the supplied sources.
+
+    :param sources: the source file objects to be used for the linking process
+    :param unity_groups: the unity groups (data.UnityGroup) of a unity build, if any; their object files are linked
+    instead of the object files of their members (default is None)
+    :return: a list of object file paths
+    :raise: RuntimeError if only some of the members of a unity group are in the supplied sources
+    """
+    unity_groups = unity_groups if unity_groups is not None else {}
+    grouped_files = {member.file_path for group in unity_groups.values() for member in group.members}
+
+    object_files = []
+    for group in unity_groups.values():
+        linked_members = sum(1 for member in group.members if member.file_path in sources)
+        if linked_members == len(group.members):
+            object_files.append(group.object_file_path)
+        elif linked_members > 0:
+            raise RuntimeError(
+                "Unity group [{0}] is only partially used by the linked sources; "
+                "unity groups cannot be split between link targets".format(group.name)
+            )
+
+    for source in sources.values():
+        if source.file_type == SourceType.Implementation and source.file_path not in grouped_files:
+            object_files.append(source.object_file_path)
+
+    return object_files
+
+
+def get_link_targets(linker_config):
+    """
+    Retrieves the linker configurations of all link targets of a build.
+
+    Each target in the linker's 'targets' (keyed by name) is linked with the linker's configuration, updated with
+    the target's own settings (for example, its 'output', 'options' or 'archive'). If no targets are set, the
+    linker configuration itself is the build's only target.
+
+    :param linker_config: the linker configuration of the build
+    :return: a dict of linker configurations, keyed by target name (None, for the build's only target)
+    """
+    targets = linker_config.get('targets', {})
+    if len(targets) == 0:
+        return {None: linker_config}
+
+    base_config = {key: value for key, value in linker_config.items() if key != 'targets'}
+    return {name: dict(base_config, **target_config) for name, target_config in targets.items()}
+
+
+def link_objects(sources, linker_config, logger, unity_groups=None):
     """
     Links the supplied sources (after object files have been created) using the specified linker configuration.
 
-    The linking command is run in a new subprocess and the function waits for it to complete.
+    The linking command is run in a new subprocess and the function waits for it to complete. If the command would
+    be longer than the linker's 'responseFileThreshold' (in characters; default is 'RESPONSE_FILE_THRESHOLD'), the
+    object files are passed to the linker in a response file ('<output>.rsp').
+
+    If the linker's 'archive' mode is enabled, the output is a static archive that is updated incrementally instead
+    (see 'update_archive').
 
     :param sources: the source file objects to be used for the linking process
     :param linker_config: the linker configuration to be used
     :param logger: the object used for logging linker messages
+    :param unity_groups: the unity groups (data.UnityGroup) of a unity build, if any; their object files are linked
+    instead of the object files of their members (default is None)
     :return: nothing
     :raise: RuntimeError if the linking process fails
     """
-    object_files = []
-    for source in sources.values():
-        if source.file_type == SourceType.Implementation:
-            object_files.append(source.object_file_path)
+    object_files = get_linked_object_files(sources, unity_groups)
+
+    if linker_config.get('archive', {}).get('enabled', False) is True:
+        update_archive(object_files, linker_config, logger)
+        return
 
     output_file = linker_config['output']['name']
 
-    command = "{0} -o \"{1}\" {2} {3}".format(
-        linker_config['path'],
-        output_file,
-        " ".join(object_files),
-        " ".join(linker_config['options'])
-    )
+    arguments = [linker_config['path'], "-o", output_file]
+    arguments.extend(object_files)
+    arguments.extend(linker_config['options'])
+
+    response_file_threshold = linker_config.get('responseFileThreshold', RESPONSE_FILE_THRESHOLD)
+    if sum(len(current) + 1 for current in arguments) > response_file_threshold:
+        arguments = [linker_config['path'], "-o", output_file]
+        arguments.append(get_response_file_argument(output_file + ".rsp", object_files))
+        arguments.extend(linker_config['options'])
 
-    return_code, stdout, stderr = run_external_command(command)
+    return_code, stdout, stderr = run_external_command(arguments)
 
     if len(stdout) > 0:
         logger.info("[{0}]: {1}".format(output_file, stdout), extra={'action': 'link_objects'})
@@ -138,18 +701,245 @@ def link_objects(sources, linker_config, logger):
         raise RuntimeError(message)
 
 
+def get_archive_manifest_path(output_file):
+    """
+    Creates the path of the manifest of a static archive, listing the archive's members (see 'update_archive').
+
+    :param output_file: the archive's path
+    :return: the manifest path
+    """
+    return output_file + ARCHIVE_MANIFEST_EXTENSION
+
+
+def run_archiver(linker_config, operation, object_files):
+    """
+    Runs the archiver with the specified operation on the linker's output file.
+
+    :param linker_config: the linker configuration to be used
+    :param operation: the archiver operation and modifiers (for example, 'rS')
+    :param object_files: the object files (or member names) for the operation
+    :return: a tuple: (archiver return code, messages sent to stdout, messages sent to stderr)
+    """
+    output_file = linker_config['output']['name']
+    arguments = [linker_config['archive'].get('path', DEFAULT_ARCHIVER), operation, output_file]
+    arguments.extend(object_files)
+
+    response_file_threshold = linker_config.get('responseFileThreshold', RESPONSE_FILE_THRESHOLD)
+    if sum(len(current) + 1 for current in arguments) > response_file_threshold:
+        arguments = arguments[:3] + [get_response_file_argument(output_file + ".rsp", object_files)]
+
+    return run_external_command(arguments)
+
+
+def update_archive(object_files, linker_config, logger):
+    """
+    Creates or incrementally updates a static archive with the supplied object files.
+
+    The size and modification time of each archived object file are stored in the archive's manifest
+    ('<output>.members'). When the archive and its manifest exist, only the members whose object files have changed
+    are replaced and the members of object files that are no longer linked are removed, with the archive's index
+    updated once at the end. The archive is created from scratch when it (or its manifest) is missing, the archiver
+    has changed or two object files have the same name (as archive members are identified by their names only).
+
+    :param object_files: the object files to be archived
+    :param linker_config: the linker configuration to be used
+    :param logger: the object used for logging archiver messages
+    :return: nothing
+    :raise: RuntimeError if the archiver fails
+    """
+    output_file = linker_config['output']['name']
+    archiver = linker_config['archive'].get('path', DEFAULT_ARCHIVER)
+    manifest_path = get_archive_manifest_path(output_file)
+
+    members = {}
+    for object_file in object_files:
+        object_file_stat = os.stat(object_file)
+        members[object_file] = [object_file_stat.st_size, object_file_stat.st_mtime_ns]
+
+    try:
+        manifest = FileSystem.load_json_file(manifest_path) if os.path.isfile(output_file) else {}
+    except ValueError:
+        manifest = {}
+
+    recorded_members = manifest.get('members', {})
+    names_unique = all(
+        len({os.path.basename(current) for current in current_members}) == len(current_members)
+        for current_members in (members, recorded_members)
+    )
+
+    if manifest.get('archiver') == archiver and names_unique and len(recorded_members) > 0:
+        changed = [current for current in object_files if recorded_members.get(current) != members[current]]
+        removed = sorted(os.path.basename(current) for current in recorded_members if current not in members)
+
+        if len(changed) == 0 and len(removed) == 0:
+            logger.info(
+                "... archive [{0}] is up to date ...".format(output_file),
+                extra={'action': 'link_objects'}
+            )
+            return
+
+        logger.info(
+            "... updating archive [{0}]: [{1}] changed and [{2}] removed member(s) ...".format(
+                output_file,
+                len(changed),
+                len(removed)
+            ),
+            extra={'action': 'link_objects'}
+        )
+
+        # the manifest is removed first, so that the archive is created again if any of the steps fails
+        remove_object_file(manifest_path)
+        steps = []
+        if len(removed) > 0:
+            steps.append(("dS", removed))
+        if len(changed) > 0:
+            steps.append(("rS", changed))
+        steps.append(("s", []))
+    else:
+        logger.info(
+            "... creating archive [{0}] with [{1}] member(s) ...".format(output_file, len(object_files)),
+            extra={'action': 'link_objects'}
+        )
+
+        remove_object_file(manifest_path)
+        remove_object_file(output_file)
+        steps = [("qcs", object_files)]
+
+    for operation, operation_files in steps:
+        return_code, stdout, stderr = run_archiver(linker_config, operation, operation_files)
+
+        if len(stdout) > 0:
+            logger.info("[{0}]: {1}".format(output_file, stdout), extra={'action': 'link_objects'})
+
+        if len(stderr) > 0:
+            logger.error("[{0}]: {1}".format(output_file, stderr), extra={'action': 'link_objects'})
+
+        if return_code != 0:
+            message = "... archiving failed with return code [{0}] for file [{1}] ...".format(
+                return_code,
+                output_file
+            )
+            logger.error(message, extra={'action': 'link_objects'})
+            raise RuntimeError(message)
+
+    FileSystem.store_json_file(manifest_path, {'archiver': archiver, 'members': members})
+
+    logger.info(
+        "... archiving completed successfully for file [{0}] ...".format(output_file),
+        extra={'action': 'link_objects'}
+    )
+
+
+def get_shards_dir(build_dir):
+    """
+    Builds the default path of the directory in which the outputs of sharded builds are stored.
+
+    :param build_dir: build directory path
+    :return: the shards directory path
+    """
+    return os.path.join(build_dir, SHARDS_DIR_NAME)
+
+
+def get_shard_dir(shards_dir, shard_index, shard_count):
+    """
+    Builds the path of the directory in which the outputs of the specified shard are stored.
+
+    :param shards_dir: the directory containing the outputs of all shards
+    :param shard_index: the shard's index (starting at 1)
+    :param shard_count: the total number of shards
+    :return: the shard's directory path
+    """
+    return os.path.join(shards_dir, "shard-{0}-of-{1}".format(shard_index, shard_count))
+
+
+def find_shards(shards_dir):
+    """
+    Finds the outputs of all shards in the supplied directory (see 'export_shard').
+
+    :param shards_dir: the directory containing the outputs of all shards
+    :return: a sorted list of tuples: (shard index, shard count, shard directory path)
+    """
+    shards = []
+    if os.path.isdir(shards_dir):
+        with os.scandir(shards_dir) as entries:
+            for entry in entries:
+                match = PATTERN_SHARD_DIR.match(entry.name)
+                if match is not None and os.path.isfile(os.path.join(entry.path, SHARD_FRAGMENT_NAME)):
+                    shards.append((int(match.group('index')), int(match.group('count')), entry.path))
+
+    return sorted(shards)
+
+
+def export_shard(shard_dir, fragment, build_dir):
+    """
+    Stores the outputs of a sharded build: the files produced for its sources (see the fragment's 'artifacts') are
+    copied to '<shard dir>/objects' and the database fragment is written to '<shard dir>/fragment.json'.
+
+    Any previous outputs of the shard are removed first; the fragment is written last, so shards are only found
+    (see 'find_shards') if all of their files were copied.
+
+    :param shard_dir: the shard's directory path (see 'get_shard_dir')
+    :param fragment: the shard's database fragment (see 'data.Processing.get_shard_fragment')
+    :param build_dir: build directory path
+    :return: the number of copied files
+    """
+    if os.path.isdir(shard_dir):
+        shutil.rmtree(shard_dir)
+
+    objects_dir = os.path.join(shard_dir, SHARD_OBJECTS_DIR_NAME)
+    copied = 0
+    for artifact_paths in fragment['artifacts'].values():
+        for artifact_path in artifact_paths:
+            if os.path.isfile(artifact_path):
+                target_path = os.path.join(objects_dir, os.path.relpath(artifact_path, build_dir))
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                shutil.copy2(artifact_path, target_path)
+                copied += 1
+
+    os.makedirs(shard_dir, exist_ok=True)
+    with open(os.path.join(shard_dir, SHARD_FRAGMENT_NAME), "w") as fragment_file:
+        json.dump(fragment, fragment_file)
+
+    return copied
+
+
+def import_shard(shard_dir, build_dir):
+    """
+    Copies the files stored by a sharded build (see 'export_shard') into the build directory.
+
+    :param shard_dir: the shard's directory path
+    :param build_dir: build directory path
+    :return: a tuple: (the shard's database fragment, the number of copied files)
+    """
+    with open(os.path.join(shard_dir, SHARD_FRAGMENT_NAME), "r") as fragment_file:
+        fragment = json.load(fragment_file)
+
+    objects_dir = os.path.join(shard_dir, SHARD_OBJECTS_DIR_NAME)
+    copied = 0
+    for current_dir, _, file_names in os.walk(objects_dir):
+        for file_name in file_names:
+            source_path = os.path.join(current_dir, file_name)
+            target_path = os.path.join(build_dir, os.path.relpath(source_path, objects_dir))
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            shutil.copy2(source_path, target_path)
+            copied += 1
+
+    return fragment, copied
+
+
 def process_external_command(command, logger):
     """
     Processes the specified external command.
 
-    The command is run in a new subprocess and the function waits for it to complete.
+    The command is run in a new subprocess (without a shell) and the function waits for it to complete.
 
-    :param command: the command to be run and processed
+    :param command: the command to be run and processed, as a string (split with shell-like syntax, see 'shlex')
+    or as a list of arguments
     :param logger: the object used for logging command messages
     :return: nothing
     :raise: RuntimeError if the command fails
     """
-    return_code, stdout, stderr = run_external_command(command)
+    return_code, stdout, stderr = run_external_command(get_command_arguments(command))
 
     if len(stdout) > 0:
         logger.info("[{0}]: {1}".format(command, stdout), extra={'action': 'process_external_command'})
@@ -166,3 +956,130 @@ def process_external_command(command, logger):
         message = "... command failed with return code [{0}]: [{1}]".format(return_code, command)
         logger.error(message, extra={'action': 'process_external_command'})
         raise RuntimeError(message)
+
+
+def get_hook(command):
+    """
+    Converts the supplied pre/post command (hook) into a dict describing it.
+
+    Hooks are strings, lists of arguments or objects with a 'command' (a string or a list of arguments), the
+    'inputs' it reads (a list of glob patterns) and the 'outputs' it creates (a list of paths).
+
+    :param command: the hook, as set in the configuration
+    :return: a dict with the hook's 'command', 'arguments', 'inputs' (None, if not declared) and 'outputs' (None,
+    if not declared)
+    """
+    if isinstance(command, dict):
+        return {
+            'command': command['command'],
+            'arguments': get_command_arguments(command['command']),
+            'inputs': command.get('inputs'),
+            'outputs': command.get('outputs')
+        }
+    else:
+        return {'command': command, 'arguments': get_command_arguments(command), 'inputs': None, 'outputs': None}
+
+
+def get_hook_inputs_digest(input_patterns):
+    """
+    Calculates a digest of all files matching the supplied hook input patterns (their paths and contents).
+
+    :param input_patterns: the glob patterns of the inputs ('**' matches any number of directories)
+    :return: the calculated digest
+    """
+    input_files = sorted({
+        path for pattern in input_patterns for path in glob.glob(pattern, recursive=True) if os.path.isfile(path)
+    })
+
+    hasher = hashlib.sha256()
+    for input_file in input_files:
+        hasher.update("{0}:{1}\n".format(input_file, FileSystem.get_file_hash(input_file)).encode())
+
+    return hasher.hexdigest()
+
+
+def are_hooks_dependent(first, second):
+    """
+    Checks if the supplied hooks must be run one after the other.
+
+    Hooks that do not declare their inputs or outputs are always dependent; all others are dependent only if an
+    output of one of them matches an input or an output of the other.
+
+    :param first: the first hook (see 'get_hook')
+    :param second: the second hook (see 'get_hook')
+    :return: True, if the hooks are dependent
+    """
+    if any(hook['inputs'] is None and hook['outputs'] is None for hook in (first, second)):
+        return True
+
+    def matches(paths, patterns):
+        return any(
+            fnmatch.fnmatch(os.path.normpath(path), os.path.normpath(pattern))
+            for path in paths or [] for pattern in patterns or []
+        )
+
+    return (
+        matches(first['outputs'], (second['inputs'] or []) + (second['outputs'] or []))
+        or matches(second['outputs'], first['inputs'])
+    )
+
+
+def process_external_commands(commands, logger, recorded, max_workers=None):
+    """
+    Processes the specified external commands (the pre/post commands, or hooks, of a build stage).
+
+    Hooks that declare their inputs are skipped if their command and the digest of their inputs (see
+    'get_hook_inputs_digest') match the last successful run and all of their declared outputs exist. Hooks that
+    are not dependent (see 'are_hooks_dependent') are run at the same time; each hook waits only for the preceding
+    hooks it depends on, so hooks without declared inputs and outputs are run in the configured order. If a hook
+    fails, the hooks that depend on it are not run.
+
+    :param commands: the hooks to be run (see 'get_hook')
+    :param logger: the object used for logging command messages
+    :param recorded: the recorded hook data (from the database); updated after each successful run
+    :param max_workers: the maximum number of hooks run at the same time (default is the number of CPUs)
+    :return: the number of hooks that were run and recorded
+    :raise: RuntimeError if any of the hooks fails
+    """
+    hooks = [get_hook(command) for command in commands]
+    recorded_runs = []
+
+    def run_hook(hook, dependencies):
+        for dependency in dependencies:
+            dependency.result()
+
+        if hook['inputs'] is not None:
+            hook_key = json.dumps(hook['arguments'])
+            inputs_digest = get_hook_inputs_digest(hook['inputs'])
+            outputs_exist = all(os.path.exists(path) for path in hook['outputs'] or [])
+
+            if recorded.get(hook_key) == inputs_digest and outputs_exist:
+                logger.info(
+                    "... command skipped; inputs unchanged: [{0}]".format(hook['command']),
+                    extra={'action': 'process_external_command'}
+                )
+                return
+
+            process_external_command(hook['arguments'], logger)
+            recorded[hook_key] = inputs_digest
+            recorded_runs.append(hook_key)
+        else:
+            process_external_command(hook['arguments'], logger)
+
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+        results = []
+        for index, hook in enumerate(hooks):
+            dependencies = [results[other] for other in range(index) if are_hooks_dependent(hooks[other], hook)]
+            results.append(executor.submit(run_hook, hook, dependencies))
+
+        errors = []
+        for result in results:
+            try:
+                result.result()
+            except RuntimeError as e:
+                errors.append(e)
+
+    if len(errors) > 0:
+        raise errors[0]
+
+    return len(recorded_runs)
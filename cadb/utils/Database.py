@@ -4,6 +4,8 @@
 
 from cadb.utils.FileSystem import load_json_file, store_json_file
 
+METADATA_KEY = "__cadb__"
+
 
 def load_files_db(database_path):
     """
@@ -27,3 +29,16 @@ def store_files_db(database_path, data):
     :return: nothing
     """
     return store_json_file(database_path, data)
+
+
+def get_metadata(db, section):
+    """
+    Retrieves the specified metadata section from the supplied files database.
+
+    Metadata is kept under a reserved key, next to the file hashes; the section is created if it does not exist.
+
+    :param db: the files database
+    :param section: the name of the metadata section (for example, 'compile_times')
+    :return: the requested section (a dict that can be updated in place)
+    """
+    return db.setdefault(METADATA_KEY, {}).setdefault(section, {})
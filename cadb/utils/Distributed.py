@@ -0,0 +1,448 @@
+# MIT License
+# Copyright (c) 2016 https://github.com/sndnv
+# See the project's LICENSE file for the full text
+
+import hmac
+import json
+import os
+import queue
+import shutil
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+import time
+
+from cadb.utils import Build
+
+PROTOCOL_VERSION = 1
+HEADER_SIZE_FORMAT = "!I"
+HEADER_SIZE_LENGTH = struct.calcsize(HEADER_SIZE_FORMAT)
+DEFAULT_TIMEOUT = 300
+DEFAULT_WORKER_ADDRESS = "127.0.0.1:8765"
+TOKEN_VARIABLE = "CADB_WORKER_TOKEN"
+
+PREPROCESSOR_OPTIONS = Build.PATH_OPTIONS + ["-D", "-U"]
+LOCAL_ONLY_OPTIONS = ["-c", "-Winvalid-pch"]
+LOCAL_ONLY_OPTIONS_WITH_VALUES = ["-MF", "-MT", "-MQ", "-o", "-dumpdir", "-dumpbase", "-dumpbase-ext"]
+LOCAL_ONLY_OPTION_PREFIXES = ["-M"]
+SIDE_OUTPUT_OPTIONS = ["-dumpdir", "-dumpbase", "-dumpbase-ext", "-gsplit-dwarf", "-ftest-coverage", "--coverage"]
+SIDE_OUTPUT_OPTION_PREFIXES = [
+    "-save-temps", "-fdump-", "-fopt-info", "-fsave-optimization-record", "-fstack-usage", "-fcallgraph-info",
+    "-ftime-trace", "-fprofile-generate", "-fprofile-instr-generate", "-fcs-profile-generate"
+]
+ALLOWED_OPTIONS = ["-w", "-pedantic", "-pedantic-errors", "-pthread", "-pipe", "-ansi"]
+ALLOWED_OPTION_PREFIXES = ["-D", "-U", "-O", "-f", "-m", "-std=", "-W", "-g"]
+REJECTED_OPTION_PREFIXES = [
+    "-Wa,", "-Wp,", "-Wl,", "-mllvm", "-fplugin", "-fpass-plugin", "-fprofile-", "-fauto-profile", "-fcreate-profile",
+    "-fsanitize-blacklist", "-fsanitize-ignorelist", "-fsanitize-coverage-allowlist", "-fsanitize-coverage-ignorelist",
+    "-fxray-attr-list", "-fxray-always-instrument", "-fxray-never-instrument", "-fuse-ld", "-fmodule",
+    "-fprebuilt-module-path", "-fcoverage-data-file", "-fltrans", "-fwpa", "-fresolution", "-fself-test",
+    "-fcompare-debug"
+]
+ALLOWED_COMPILERS = ["gcc", "g++", "cc", "c++", "clang", "clang++"]
+
+
+def send_message(connection, header, payload=b""):
+    """
+    Sends a message (a JSON header, followed by an optional binary payload) over the supplied connection.
+
+    The header is prefixed with its size and contains the size of the payload ('payload_size').
+
+    :param connection: the socket to use
+    :param header: the message header (a dict)
+    :param payload: the message payload (default is empty)
+    :return: nothing
+    """
+    header = dict(header, payload_size=len(payload))
+    encoded_header = json.dumps(header).encode()
+    connection.sendall(struct.pack(HEADER_SIZE_FORMAT, len(encoded_header)) + encoded_header + payload)
+
+
+def receive_exactly(connection, size):
+    """
+    Receives exactly the specified number of bytes from the supplied connection.
+
+    :param connection: the socket to use
+    :param size: the number of bytes to receive
+    :return: the received data
+    :raise: ConnectionError if the connection is closed before all data is received
+    """
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = connection.recv(min(remaining, 1048576))
+        if len(chunk) == 0:
+            raise ConnectionError("Connection closed with [{0}] byte(s) remaining".format(remaining))
+        chunks.append(chunk)
+        remaining -= len(chunk)
+
+    return b"".join(chunks)
+
+
+def receive_message(connection):
+    """
+    Receives a message (see 'send_message') from the supplied connection.
+
+    :param connection: the socket to use
+    :return: a tuple: (message header dict, message payload)
+    :raise: ConnectionError if the connection is closed before the whole message is received
+    """
+    header_size = struct.unpack(HEADER_SIZE_FORMAT, receive_exactly(connection, HEADER_SIZE_LENGTH))[0]
+    header = json.loads(receive_exactly(connection, header_size).decode())
+    payload = receive_exactly(connection, header.get('payload_size', 0))
+    return header, payload
+
+
+def parse_address(address):
+    """
+    Parses the supplied 'host:port' address.
+
+    :param address: the address to parse
+    :return: a tuple: (host, port)
+    :raise: ValueError if the address is not valid
+    """
+    host, separator, port = address.rpartition(":")
+    if len(separator) == 0 or not port.isdigit():
+        raise ValueError("Invalid address specified: [{0}]; expected 'host:port'".format(address))
+
+    return host if len(host) > 0 else "0.0.0.0", int(port)
+
+
+def get_remote_compiler_options(compiler_options):
+    """
+    Removes all preprocessor, local-only and side output options from the supplied compiler options, leaving the
+    options needed for compiling an already preprocessed source file.
+
+    Local-only options include the dependency file options ('-M*') and the output file ('-o'); side output options
+    are the options that produce files other than the object file (see 'SIDE_OUTPUT_OPTIONS' and
+    'SIDE_OUTPUT_OPTION_PREFIXES'), such as '-save-temps' or '-fdump-*'.
+
+    :param compiler_options: the compiler options
+    :return: a new list of compiler options
+    """
+    remote_options = []
+    skip_next = False
+    for option in compiler_options:
+        if skip_next:
+            skip_next = False
+        elif option in PREPROCESSOR_OPTIONS or option in LOCAL_ONLY_OPTIONS_WITH_VALUES:
+            skip_next = True
+        elif option in LOCAL_ONLY_OPTIONS or option in SIDE_OUTPUT_OPTIONS or any(
+                option.startswith(current) and not option.startswith("-include-") for current in PREPROCESSOR_OPTIONS
+        ) or any(
+                option.startswith(current) for current in LOCAL_ONLY_OPTION_PREFIXES + SIDE_OUTPUT_OPTION_PREFIXES
+        ):
+            continue
+        else:
+            remote_options.append(option)
+
+    return remote_options
+
+
+def get_rejected_options(options):
+    """
+    Finds all options that a worker does not allow, out of the supplied (remote) compiler options.
+
+    Only code generation options are allowed (see 'ALLOWED_OPTIONS' and 'ALLOWED_OPTION_PREFIXES'), except for the
+    options that can load code into the compiler, pass arguments to other tools or read and write other files (see
+    'REJECTED_OPTION_PREFIXES').
+
+    :param options: the compiler options (see 'get_remote_compiler_options')
+    :return: a list of the rejected options
+    """
+    return [
+        option for option in options
+        if option not in ALLOWED_OPTIONS and (
+            not any(option.startswith(prefix) for prefix in ALLOWED_OPTION_PREFIXES)
+            or any(option.startswith(prefix) for prefix in REJECTED_OPTION_PREFIXES)
+        )
+    ]
+
+
+def is_remote_compatible(compiler_options):
+    """
+    Checks if files can be compiled by a worker with the supplied compiler options.
+
+    Files cannot be compiled remotely if any of the options would be rejected by the worker (see
+    'get_rejected_options') or would produce side output files, which the worker does not return.
+
+    :param compiler_options: the compiler options
+    :return: True, if the files can be compiled by a worker
+    """
+    has_side_outputs = any(
+        option in SIDE_OUTPUT_OPTIONS or any(option.startswith(prefix) for prefix in SIDE_OUTPUT_OPTION_PREFIXES)
+        for option in compiler_options
+    )
+
+    return not has_side_outputs and len(get_rejected_options(get_remote_compiler_options(compiler_options))) == 0
+
+
+def compile_preprocessed(compiler, options, language, source):
+    """
+    Compiles the supplied preprocessed source in a new temporary directory.
+
+    Only the compilers in 'ALLOWED_COMPILERS' (found on the worker's 'PATH') can be used. Local-only and side output
+    options are always removed (see 'get_remote_compiler_options') and all other options must be allowed (see
+    'get_rejected_options').
+
+    :param compiler: the name of the compiler to use
+    :param options: the compiler options (see 'get_remote_compiler_options')
+    :param language: 'c' or 'c++'
+    :param source: the preprocessed source (bytes)
+    :return: a tuple: (compilation return code, messages sent to stdout, messages sent to stderr, object file data)
+    :raise: ValueError if the compiler or any of the options are not allowed
+    """
+    if os.path.basename(compiler) not in ALLOWED_COMPILERS:
+        raise ValueError("Compiler [{0}] is not allowed on this worker".format(compiler))
+
+    options = get_remote_compiler_options(options)
+    rejected = get_rejected_options(options)
+    if len(rejected) > 0:
+        raise ValueError("Options [{0}] are not allowed on this worker".format(" ".join(rejected)))
+
+    job_dir = tempfile.mkdtemp(prefix="cadb_job_")
+    try:
+        source_path = os.path.join(job_dir, "job.i" if language == "c" else "job.ii")
+        object_path = os.path.join(job_dir, "job.o")
+        with open(source_path, "wb") as source_file:
+            source_file.write(source)
+
+        return_code, stdout, stderr = Build.run_external_command(
+            [os.path.basename(compiler)] + options + ["-c", "-o", object_path, source_path],
+            job_dir
+        )
+
+        object_data = b""
+        if return_code == 0 and os.path.isfile(object_path):
+            with open(object_path, "rb") as object_file:
+                object_data = object_file.read()
+
+        return return_code, stdout, stderr, object_data
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+
+class WorkerRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        """
+        Handles a single compile job: receives the job, compiles it (waiting for a free slot) and sends the result.
+
+        Jobs that cannot be compiled by the worker (for example, because of options that are not allowed) are sent
+        back as failed compilations; invalid messages (an unsupported version, an invalid token or missing fields)
+        are sent back as errors.
+
+        :return: nothing
+        """
+        try:
+            header, payload = receive_message(self.request)
+            if header.get('version') != PROTOCOL_VERSION:
+                raise ValueError("Unsupported protocol version [{0}]".format(header.get('version')))
+
+            if not hmac.compare_digest(str(header.get('token', "")).encode(), self.server.token.encode()):
+                raise ValueError("Invalid token")
+
+            compiler, options, language = header['compiler'], header['options'], header['language']
+
+            with self.server.slots:
+                try:
+                    return_code, stdout, stderr, object_data = compile_preprocessed(
+                        compiler, options, language, payload
+                    )
+                except ValueError as e:
+                    self.server.logger.warning(
+                        "Failed to compile job from [{0}]: [{1}]".format(self.client_address[0], e),
+                        extra={'action': 'worker'}
+                    )
+                    return_code, stdout, object_data = 1, "", b""
+                    stderr = "Worker failed to compile job: [{0}]\n".format(e)
+
+            send_message(
+                self.request,
+                {'return_code': return_code, 'stdout': stdout, 'stderr': stderr, 'error': False},
+                object_data
+            )
+
+            self.server.logger.info(
+                "Compiled job from [{0}] with return code [{1}]".format(self.client_address[0], return_code),
+                extra={'action': 'worker'}
+            )
+        except (ValueError, KeyError) as e:
+            self.server.logger.error(
+                "Rejected job from [{0}]: [{1}]".format(self.client_address[0], e),
+                extra={'action': 'worker'}
+            )
+            send_message(self.request, {'return_code': 1, 'stdout': "", 'stderr': str(e), 'error': True})
+        except OSError as e:
+            self.server.logger.error(
+                "Failed to process job from [{0}]: [{1}]".format(self.client_address[0], e),
+                extra={'action': 'worker'}
+            )
+
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, slots, logger, token):
+        """
+        Creates a new worker server, compiling jobs received over TCP.
+
+        Only jobs with the supplied shared secret token are compiled; all other jobs are rejected.
+
+        :param address: the address to listen on ('host:port')
+        :param slots: the maximum number of jobs compiled at the same time
+        :param logger: the object used for logging
+        :param token: the shared secret token (see 'TOKEN_VARIABLE')
+        :raise: ValueError if the token is empty
+        """
+        if len(token) == 0:
+            raise ValueError("A worker token is required; set the [{0}] environment variable".format(TOKEN_VARIABLE))
+
+        super().__init__(parse_address(address), WorkerRequestHandler)
+        self.slots = threading.BoundedSemaphore(slots)
+        self.logger = logger
+        self.token = token
+
+
+def compile_remote(address, source, compiler_config, dependency_file=False, precompiled_header=None,
+                   timeout=DEFAULT_TIMEOUT, token=""):
+    """
+    Compiles the supplied source file on a remote worker.
+
+    The file is preprocessed locally (generating the dependency file, if requested) and only the preprocessed
+    source is sent to the worker, which returns the object file and the compiler messages. Local failures (while
+    preprocessing the file or storing the object file) and jobs that the worker cannot compile are returned as
+    failed compilations.
+
+    :param address: the worker address ('host:port')
+    :param source: the source file object describing the object to be compiled
+    :param compiler_config: the compiler configuration to be used
+    :param dependency_file: set to True to generate a dependency file (default is False)
+    :param precompiled_header: the path to a precompiled header to be included, if any (default is None)
+    :param timeout: the maximum time (in seconds) to wait for the worker (default is 'DEFAULT_TIMEOUT')
+    :param token: the worker's shared secret token (default is empty)
+    :return: a tuple: (compilation return code, messages sent to stdout, messages sent to stderr)
+    :raise: OSError, ValueError or KeyError if the worker cannot be used (it cannot be reached or its reply is not
+            valid)
+    """
+    arguments = [compiler_config['path'], "-E"] + compiler_config['options'] + [source.file_path]
+    if dependency_file:
+        arguments.extend(["-MMD", "-MF", Build.get_dependency_file_path(source.object_file_path)])
+        arguments.extend(["-MT", source.object_file_path])
+    if precompiled_header is not None:
+        arguments.extend(["-include", precompiled_header])
+
+    try:
+        return_code, preprocessed, stderr = Build.run_external_command(arguments)
+    except ValueError as e:
+        return 1, "", "Failed to preprocess file [{0}]: [{1}]\n".format(source.file_path, e)
+
+    if return_code != 0:
+        return return_code, "", stderr
+
+    header = {
+        'version': PROTOCOL_VERSION,
+        'token': token,
+        'compiler': compiler_config['path'],
+        'options': get_remote_compiler_options(compiler_config['options']),
+        'language': "c" if source.file_path.endswith(".c") else "c++"
+    }
+
+    with socket.create_connection(parse_address(address), timeout=timeout) as connection:
+        send_message(connection, header, preprocessed.encode())
+        result, object_data = receive_message(connection)
+
+    if result.get('error', True):
+        raise ValueError("Worker [{0}] failed to process job: [{1}]".format(address, result.get('stderr')))
+
+    return_code, stdout, stderr = result['return_code'], result['stdout'], stderr + result['stderr']
+    if return_code == 0:
+        try:
+            with open(source.object_file_path, "wb") as object_file:
+                object_file.write(object_data)
+        except OSError as e:
+            return 1, stdout, stderr + "Failed to store object file [{0}]: [{1}]\n".format(source.object_file_path, e)
+
+    return return_code, stdout, stderr
+
+
+class Executor:
+    def __init__(self, workers, local_slots, logger, timeout=DEFAULT_TIMEOUT, token=""):
+        """
+        Creates a new distributed executor, scheduling compile jobs between remote workers and local slots.
+
+        Every worker and every local slot is represented by a token in a queue; each job takes the next free token
+        and runs on the token's worker (or locally). If a worker fails (it cannot be reached or its reply is not
+        valid), the job is compiled locally and the worker is not used again for the rest of the build; jobs that
+        fail to compile (including jobs the worker cannot compile) do not affect the worker. Files with compiler options that workers do not support (see
+        'is_remote_compatible') are always compiled locally.
+
+        :param workers: a list of workers, each as a dict with 'address' ('host:port') and 'slots' (default: 1)
+        :param local_slots: the number of jobs that can be compiled locally at the same time (at least 1)
+        :param logger: the object used for logging
+        :param timeout: the maximum time (in seconds) to wait for a worker (default is 'DEFAULT_TIMEOUT')
+        :param token: the workers' shared secret token (default is empty; see 'TOKEN_VARIABLE')
+        """
+        local_slots = max(1, local_slots)
+        self.logger = logger
+        self.timeout = timeout
+        self.token = token
+        self.failed_workers = set()
+        self.tokens = queue.Queue()
+
+        for _ in range(local_slots):
+            self.tokens.put(None)
+
+        for worker in workers:
+            for _ in range(worker.get('slots', 1)):
+                self.tokens.put(worker['address'])
+
+        self.slots = local_slots + sum(worker.get('slots', 1) for worker in workers)
+
+    def compile_object_timed(self, source, compiler_config, dependency_file=False, precompiled_header=None):
+        """
+        Compiles the supplied source file on the next free worker or local slot (see 'Build.compile_object_timed').
+
+        :return: a tuple: (compilation command return code, messages sent to stdout, messages sent to stderr,
+                 compilation time in seconds)
+        """
+        token = self.tokens.get()
+        while token is not None and token in self.failed_workers:
+            token = self.tokens.get()
+
+        try:
+            if token is not None and is_remote_compatible(compiler_config['options']):
+                start = time.perf_counter()
+                try:
+                    result = compile_remote(
+                        token, source, compiler_config, dependency_file, precompiled_header, self.timeout, self.token
+                    )
+                    return result + (time.perf_counter() - start,)
+                except (OSError, ValueError, KeyError) as e:
+                    self.failed_workers.add(token)
+                    self.logger.warning(
+                        "Worker [{0}] failed; compiling [{1}] locally: [{2}]".format(token, source.file_path, e),
+                        extra={'action': 'build'}
+                    )
+
+            return Build.compile_object_timed(source, compiler_config, dependency_file, precompiled_header)
+        finally:
+            if token not in self.failed_workers:
+                self.tokens.put(token)
+
+    def compile_batch_timed(self, *arguments):
+        """
+        Compiles the supplied batch of source files locally (see 'Build.compile_batch_timed').
+
+        Batches are never sent to workers but still take the next free slot, to keep the number of running jobs
+        within the configured limits.
+
+        :return: a list of compilation results
+        """
+        token = self.tokens.get()
+        try:
+            return Build.compile_batch_timed(*arguments)
+        finally:
+            self.tokens.put(token)
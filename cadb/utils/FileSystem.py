@@ -5,22 +5,96 @@
 from glob import glob
 import hashlib
 import json
+import mmap
 import os
+import zlib
 
 READ_BUFFER_SIZE = 65536
+MMAP_THRESHOLD = 1048576
+DEFAULT_HASH_ALGORITHM = "sha256"
 
 
-def get_source_files_list(sources_path, extensions):
+class Crc32Hasher:
+    def __init__(self):
+        """
+        Creates a new CRC-32 hasher, with the same update/hexdigest interface as the 'hashlib' hashers.
+
+        Used as the non-cryptographic hash option that needs no additional packages.
+        """
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self):
+        return "{0:08x}".format(self.value)
+
+
+def create_xxhash_hasher():
+    """
+    Creates a new XXH3 (64-bit) hasher; requires the 'xxhash' package.
+
+    :return: the new hasher
+    :raise: ValueError if the 'xxhash' package is not available
+    """
+    try:
+        import xxhash
+    except ImportError:
+        raise ValueError("Hash algorithm [xxhash] requires the 'xxhash' package")
+
+    return xxhash.xxh3_64()
+
+
+HASH_ALGORITHMS = {
+    "sha256": hashlib.sha256,
+    "blake2b": hashlib.blake2b,
+    "crc32": Crc32Hasher,
+    "xxhash": create_xxhash_hasher
+}
+
+
+def get_source_files(sources_path, extensions, excludes):
     """
-    Creates a list of source file paths, based on the supplied config.
+    Finds and classifies all source files in the supplied directory, in a single pass.
+
+    The directory tree is walked only once (with 'os.scandir') and each file is classified based on its extension.
+    Each exclude is a path prefix (for example, 'src/test' or 'src/gen_'): all files whose paths start with any of
+    them are skipped and directories whose paths start with any of them are never walked (as all of their files
+    would be skipped). Excludes are normalized in the same way as the file paths, keeping any trailing separator.
+    Hidden files and directories (starting with '.') are skipped, as with 'glob'.
 
     :param sources_path: the parent sources directory
-    :param extensions: the extensions to be used for filtering the files in the sources dir
-    :return: a list of source file paths
+    :param extensions: a dict of file extensions (without '.') and the categories (such as source types) of files
+    that have them; files with any other extension are ignored
+    :param excludes: a list of path prefixes to exclude
+    :return: a dict with the categories as keys and lists of source file paths (normalized, see 'os.path.normpath')
+    as values
     """
-    files = []
-    for extension in extensions:
-        files.extend(glob(sources_path + "/**/*." + extension, recursive=True))
+    excluded = tuple(
+        os.path.normpath(current) + (os.sep if current.endswith((os.sep, "/")) else "") for current in excludes
+    )
+    files = {category: [] for category in extensions.values()}
+
+    pending = [(sources_path, os.path.normpath(sources_path))]
+    while len(pending) > 0:
+        current_path, current_normalized_path = pending.pop()
+        try:
+            with os.scandir(current_path) as entries:
+                for entry in entries:
+                    normalized_path = current_normalized_path + os.sep + entry.name
+                    if entry.name.startswith('.') or normalized_path.startswith(excluded):
+                        continue
+                    elif entry.is_dir():
+                        if not (normalized_path + os.sep).startswith(excluded):
+                            pending.append((entry.path, normalized_path))
+                    else:
+                        _, separator, extension = entry.name.rpartition('.')
+                        category = extensions.get(extension) if len(separator) > 0 else None
+                        if category is not None:
+                            files[category].append(normalized_path)
+        except OSError:
+            continue
+
     return files
 
 
@@ -61,14 +135,45 @@ def store_json_file(file_path, data):
         json.dump(data, database, indent=4, sort_keys=True)
 
 
-def get_file_hash(file_path):
+def get_file_hash(file_path, algorithm=DEFAULT_HASH_ALGORITHM, mmap_threshold=MMAP_THRESHOLD):
     """
     Calculates the hash of the specified file.
 
+    Large files are memory-mapped and hashed in one call, instead of being copied into buffers; smaller files are
+    read in chunks of 'READ_BUFFER_SIZE' bytes.
+
     :param file_path: the file to hash
+    :param algorithm: the name of the hash algorithm to use (one of 'HASH_ALGORITHMS'; default is 'sha256')
+    :param mmap_threshold: the minimum file size (in bytes) for using a memory map (default is 'MMAP_THRESHOLD')
     :return: the calculated hash
+    :raise: ValueError if the algorithm is not supported
+    """
+    hasher_factory = HASH_ALGORITHMS.get(algorithm)
+    if hasher_factory is None:
+        raise ValueError("Unsupported hash algorithm specified: [{0}]".format(algorithm))
+
+    hasher = hasher_factory()
+    with open(file_path, "rb") as currentFile:
+        if os.fstat(currentFile.fileno()).st_size >= mmap_threshold:
+            with mmap.mmap(currentFile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                hasher.update(data)
+        else:
+            data = currentFile.read(READ_BUFFER_SIZE)
+            while len(data) > 0:
+                hasher.update(data)
+                data = currentFile.read(READ_BUFFER_SIZE)
+    return hasher.hexdigest()
+
+
+def get_git_blob_hash(file_path):
+    """
+    Calculates the git blob ID of the specified file (the SHA-1 of a 'blob <size>' header and the file contents).
+
+    :param file_path: the file to hash
+    :return: the calculated blob ID
     """
-    hasher = hashlib.sha256()
+    hasher = hashlib.sha1()
+    hasher.update("blob {0}\0".format(os.path.getsize(file_path)).encode())
     with open(file_path, "rb") as currentFile:
         data = currentFile.read(READ_BUFFER_SIZE)
         while len(data) > 0:
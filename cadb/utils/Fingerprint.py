@@ -0,0 +1,82 @@
+# MIT License
+# Copyright (c) 2016 https://github.com/sndnv
+# See the project's LICENSE file for the full text
+
+import re
+
+from cadb.utils import FileSystem
+
+SEMANTIC_HASH_PREFIX = "semantic-"
+
+LITERAL_PLACEHOLDER = b"\0"
+
+PATTERN_COMMENTS_AND_LITERALS = re.compile(
+    rb'R"(?P<delimiter>[^ ()\\\t\v\f\n]{0,16})\(.*?\)(?P=delimiter)"'
+    rb'|"[^"\\\n]*(?:\\.[^"\\\n]*)*"'
+    rb"|'[^'\\\n]*(?:\\.[^'\\\n]*)*'"
+    rb"|//[^\n]*"
+    rb"|/\*[^*]*(?:\*+[^*/][^*]*)*(?:\*+/|\Z)",
+    re.DOTALL
+)
+
+
+def normalize_source(content):
+    """
+    Removes all comments and insignificant whitespace from the supplied source code.
+
+    Each comment is treated as whitespace (as the preprocessor does) and each line's whitespace is collapsed into
+    single spaces, with empty lines removed; line breaks are kept, as they end preprocessor directives. Whitespace
+    between tokens is never removed completely, as it is significant for stringification ('#x') and function-like
+    macro definitions. String, character and raw string literals are preserved.
+
+    Literals are replaced by a placeholder while whitespace is collapsed, so content that already contains the
+    placeholder (a NUL byte) is returned unchanged.
+
+    :param content: the source code to normalize (bytes)
+    :return: the normalized source code (bytes)
+    """
+    if LITERAL_PLACEHOLDER in content:
+        return content
+
+    literals = []
+
+    def replace_token(match):
+        token = match.group()
+        if token.startswith(b"/"):
+            return b" "
+        else:
+            literals.append(token)
+            return LITERAL_PLACEHOLDER
+
+    code = PATTERN_COMMENTS_AND_LITERALS.sub(replace_token, content)
+    lines = (b" ".join(line.split()) for line in code.split(b"\n"))
+    parts = b"\n".join(line for line in lines if len(line) > 0).split(LITERAL_PLACEHOLDER)
+
+    normalized = [parts[0]]
+    for literal, part in zip(literals, parts[1:]):
+        normalized.append(literal)
+        normalized.append(part)
+
+    return b"".join(normalized)
+
+
+def get_semantic_hash(file_path, algorithm=FileSystem.DEFAULT_HASH_ALGORITHM):
+    """
+    Calculates a hash of the specified file's normalized source code (see 'normalize_source'), so that changes to
+    comments and formatting do not change it.
+
+    :param file_path: the file to hash
+    :param algorithm: the name of the hash algorithm to use (see 'utils.FileSystem.HASH_ALGORITHMS')
+    :return: the calculated hash
+    :raise: ValueError if the algorithm is not supported
+    """
+    hasher_factory = FileSystem.HASH_ALGORITHMS.get(algorithm)
+    if hasher_factory is None:
+        raise ValueError("Unsupported hash algorithm specified: [{0}]".format(algorithm))
+
+    with open(file_path, "rb") as currentFile:
+        content = currentFile.read()
+
+    hasher = hasher_factory()
+    hasher.update(normalize_source(content))
+    return hasher.hexdigest()
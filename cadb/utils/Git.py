@@ -0,0 +1,106 @@
+# MIT License
+# Copyright (c) 2016 https://github.com/sndnv
+# See the project's LICENSE file for the full text
+
+import os
+import subprocess
+
+REGULAR_FILE_MODES = ["100644", "100755"]
+
+
+def run_git_command(git_path, working_dir, arguments, stdin_data=None):
+    """
+    Runs the specified git command and waits for it to complete.
+
+    :param git_path: the git binary to use
+    :param working_dir: the directory in which to run the command
+    :param arguments: list of arguments for git
+    :param stdin_data: data to send to the command's stdin, if any (default is None)
+    :return: the data the command sent to stdout
+    :raise: RuntimeError if the command fails or git cannot be started
+    """
+    try:
+        result = subprocess.run(
+            [git_path] + arguments,
+            cwd=working_dir,
+            input=stdin_data,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True
+        )
+    except OSError as e:
+        raise RuntimeError("Failed to run git command [{0}]: [{1}]".format(" ".join(arguments), e))
+
+    if result.returncode != 0:
+        raise RuntimeError(
+            "Git command [{0}] failed with return code [{1}]: [{2}]".format(
+                " ".join(arguments),
+                result.returncode,
+                result.stderr.strip()
+            )
+        )
+
+    return result.stdout
+
+
+def get_clean_blob_ids(git_path, sources_path):
+    """
+    Retrieves the blob IDs of all files in the sources directory that are tracked by git and are not modified.
+
+    The IDs are taken from the git index ('git ls-files -s'), excluding any files reported as modified in the
+    working tree ('git diff --name-only'), files with merge conflicts and anything that is not a regular file.
+
+    :param git_path: the git binary to use
+    :param sources_path: the sources directory (inside a git working tree)
+    :return: a dict with file paths as keys and blob IDs as values
+    :raise: RuntimeError if the git commands fail
+    """
+    modified = set(run_git_command(git_path, sources_path, ["diff", "--name-only", "--relative", "-z"]).split("\0"))
+
+    blob_ids = {}
+    for entry in run_git_command(git_path, sources_path, ["ls-files", "-s", "-z"]).split("\0"):
+        if len(entry) > 0:
+            details, _, relative_path = entry.partition("\t")
+            mode, blob_id, stage = details.split(" ")
+            if mode in REGULAR_FILE_MODES and stage == "0" and relative_path not in modified:
+                blob_ids[os.path.normpath(os.path.join(sources_path, relative_path))] = blob_id
+
+    return blob_ids
+
+
+def get_blob_ids(git_path, sources_path, file_paths):
+    """
+    Retrieves the git blob IDs of the specified files.
+
+    Unmodified tracked files get the IDs stored in the git index; only the remaining (untracked or modified) files
+    are hashed, all with one 'git hash-object' call (so that the same filters as for 'git add' are applied). The
+    files are passed to git with absolute paths, as relative paths are not resolved against its working directory.
+
+    :param git_path: the git binary to use
+    :param sources_path: the sources directory (inside a git working tree)
+    :param file_paths: the files for which to get blob IDs
+    :return: a dict with file paths as keys and blob IDs as values
+    :raise: RuntimeError if the git commands fail
+    """
+    clean_blob_ids = get_clean_blob_ids(git_path, sources_path)
+
+    blob_ids = {}
+    dirty_files = []
+    for file_path in file_paths:
+        blob_id = clean_blob_ids.get(file_path)
+        if blob_id is not None:
+            blob_ids[file_path] = blob_id
+        else:
+            dirty_files.append(file_path)
+
+    if len(dirty_files) > 0:
+        hashed = run_git_command(
+            git_path,
+            sources_path,
+            ["hash-object", "--stdin-paths"],
+            stdin_data="\n".join(os.path.abspath(file_path) for file_path in dirty_files) + "\n"
+        ).split()
+
+        blob_ids.update(zip(dirty_files, hashed))
+
+    return blob_ids
@@ -0,0 +1,179 @@
+# MIT License
+# Copyright (c) 2016 https://github.com/sndnv
+# See the project's LICENSE file for the full text
+
+import os
+import re
+
+QUOTE_PATH_OPTIONS = ["-iquote"]
+ANGLE_PATH_OPTIONS = ["-I", "-isystem", "-idirafter"]
+
+PATTERN_COMMENTS_AND_LITERALS = (
+    r"//[^\n]*"
+    r"|/\*[^*]*(?:\*+[^*/][^*]*)*(?:\*+/|\Z)"
+    r'|"[^"\\\n]*(?:\\.[^"\\\n]*)*"'
+    r"|'[^'\\\n]*(?:\\.[^'\\\n]*)*'"
+)
+
+# the delimited name is matched first, so that '//' or '/*' inside it is not taken as the start of a comment
+PATTERN_INCLUDE_DIRECTIVE = (
+    r'\n[ \t]*\#[ \t]*include[ \t]*(?P<include>"[^"\n]*"|<[^>\n]*>|[^\n]*?)[ \t\r]*(?:/[/*][^\n]*)?$'
+)
+PATTERN_CODE_LINE = r"\n[ \t]*(?P<code>[^\s\#/])"
+
+PATTERN_INCLUDE_LINES = re.compile(PATTERN_INCLUDE_DIRECTIVE, re.MULTILINE)
+
+PATTERN_SCAN_INCLUDES = re.compile(
+    "{0}|{1}".format(PATTERN_INCLUDE_DIRECTIVE, PATTERN_COMMENTS_AND_LITERALS),
+    re.MULTILINE
+)
+
+PATTERN_SCAN_INCLUDES_UNTIL_CODE = re.compile(
+    "{0}|{1}|{2}".format(PATTERN_INCLUDE_DIRECTIVE, PATTERN_CODE_LINE, PATTERN_COMMENTS_AND_LITERALS),
+    re.MULTILINE
+)
+
+
+def get_search_paths(compiler_options):
+    """
+    Extracts the include search paths from the supplied compiler options.
+
+    Both the joined ('-Ipath') and the separated ('-I', 'path') forms are supported. Relative paths are resolved
+    against the current working directory, as the compiler would do.
+
+    :param compiler_options: list of compiler options
+    :return: a tuple: (paths searched for quoted includes only, paths searched for all includes)
+    """
+    quote_paths = []
+    angle_paths = []
+
+    options = iter(compiler_options)
+    for option in options:
+        for prefixes, target in ((QUOTE_PATH_OPTIONS, quote_paths), (ANGLE_PATH_OPTIONS, angle_paths)):
+            prefix = next((current for current in prefixes if option.startswith(current)), None)
+            if prefix is not None:
+                path = option[len(prefix):] or next(options, "")
+                if len(path) > 0:
+                    target.append(os.path.abspath(path))
+                break
+
+    return quote_paths, angle_paths
+
+
+def scan_includes(content, stop_at_code=False):
+    """
+    Finds all include directives in the supplied file contents.
+
+    Leading whitespace and whitespace between '#' and 'include' (spaces or tabs) are allowed and includes inside
+    block comments are ignored.
+
+    The whole buffer is first scanned in one pass for lines that look like include directives; that regex starts
+    with a single literal (newline) so the regex engine can skip over everything else quickly. Line comments and
+    string literals cannot span lines, so only block comments can hide such lines; if any appear before the last
+    include, that part of the buffer is scanned again with a regex that also skips over comments and literals.
+
+    :param content: the file contents
+    :param stop_at_code: set to True to stop scanning at the first line that starts with code (that is, anything
+    other than whitespace, comments and preprocessor directives); includes after that point are ignored
+    :return: list of the included paths, with their start/end characters (for example, ['<string>', '"a.h"'])
+    """
+    # all directives are matched by the newline preceding them, so one is added for the first line of the content
+    content = "\n" + content
+
+    if stop_at_code:
+        includes = []
+        for match in PATTERN_SCAN_INCLUDES_UNTIL_CODE.finditer(content):
+            if match.group('code') is not None:
+                break
+            elif match.group('include'):
+                includes.append(match.group('include'))
+        return includes
+    else:
+        candidates = list(PATTERN_INCLUDE_LINES.finditer(content))
+        if len(candidates) == 0:
+            return []
+
+        scanned_content = content[:candidates[-1].end()]
+        if "/*" in scanned_content:
+            return [include for include in PATTERN_SCAN_INCLUDES.findall(scanned_content) if include]
+        else:
+            return [match.group('include') for match in candidates if match.group('include')]
+
+
+class IncludeResolver:
+    def __init__(self, sources_dir, quote_paths, angle_paths):
+        """
+        Creates a new include resolver.
+
+        Quoted includes are searched for in the including file's directory, then in the quote paths and then in the
+        angle paths; angle-bracket includes are searched for only in the angle paths (same order as GCC/Clang).
+        All lookups are cached in a (dir, include) -> path table, so each include is resolved only once per scan.
+
+        Candidates are checked as absolute paths; files found inside the sources directory are returned in the same
+        form as the source file paths (the normalized sources directory, as configured, followed by the file's
+        relative path), so that they always match the paths of the scanned sources, whether the sources directory
+        is relative or absolute. All other files are returned as absolute paths.
+
+        :param sources_dir: the sources directory; files resolved inside it are considered internal dependencies
+        :param quote_paths: paths searched for quoted includes only (for example, '-iquote')
+        :param angle_paths: paths searched for all includes (for example, '-I')
+        """
+        self.sources_dir = os.path.normpath(sources_dir)
+        self._absolute_sources_dir = os.path.abspath(sources_dir)
+        self.quote_paths = quote_paths
+        self.angle_paths = angle_paths
+        self._resolved = {}
+
+    def resolve(self, file_dir, include, quoted):
+        """
+        Resolves the supplied include to an existing file.
+
+        :param file_dir: the directory of the including file
+        :param include: the included path, without its start/end characters
+        :param quoted: True, if the include is a quoted one (otherwise, it is an angle-bracket include)
+        :return: the normalized path to the included file or None, if it was not found
+        """
+        key = (file_dir if quoted else None, include)
+        if key not in self._resolved:
+            if quoted:
+                search_paths = [file_dir] + self.quote_paths + self.angle_paths
+            else:
+                search_paths = self.angle_paths
+
+            resolved_path = next(
+                (
+                    candidate
+                    for candidate in (os.path.abspath(os.path.join(current, include)) for current in search_paths)
+                    if os.path.isfile(candidate)
+                ),
+                None
+            )
+
+            if resolved_path is not None and resolved_path.startswith(self._absolute_sources_dir + os.path.sep):
+                resolved_path = os.path.normpath(
+                    os.path.join(self.sources_dir, os.path.relpath(resolved_path, self._absolute_sources_dir))
+                )
+
+            self._resolved[key] = resolved_path
+
+        return self._resolved[key]
+
+    def is_internal(self, path):
+        """
+        Checks if the supplied (resolved) path is inside the sources directory.
+
+        :param path: the path to check
+        :return: True, if the path is inside the sources directory
+        """
+        return os.path.abspath(path).startswith(self._absolute_sources_dir + os.path.sep)
+
+
+def get_include_resolver(build_config):
+    """
+    Creates a new include resolver for the supplied build configuration.
+
+    :param build_config: the build configuration to be used
+    :return: the new resolver
+    """
+    quote_paths, angle_paths = get_search_paths(build_config['compiler']['options'])
+    return IncludeResolver(build_config['paths']['sources'], quote_paths, angle_paths)
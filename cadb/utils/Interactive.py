@@ -309,6 +309,34 @@ class InteractiveSession(Cmd):
                     )
                 )
 
+    @staticmethod
+    def help_check():
+        print("Executes the 'check' action (after refreshing the sources, to find all changed files):")
+        print("\t>: check -> do action with current config, options and sources")
+        print("\t>: check <file path> -> do action for specified source only (replaces 'source-file' in options)")
+        print("\t>: check all -> do action for all changed sources (ignores 'source-file' in options)")
+
+    def do_check(self, args):
+        try:
+            self.sources = Processing.process_sources(self.config, self.options, self.db)
+            source_file = args.replace('"', '').replace('\'', '') if len(args) > 0 else None
+            if source_file is None:
+                self._run_timed_action('check')
+            else:
+                options = self.options.copy()
+                if source_file.lower() == "all":
+                    options.pop("source-file", None)
+                else:
+                    options["source-file"] = source_file
+                self._run_timed_action('check', with_options=options)
+        except Exception as e:
+            print(
+                "*** Exception encountered while processing action 'check': [({0}) {1}]".format(
+                    e.__class__,
+                    e
+                )
+            )
+
     @staticmethod
     def help_clean():
         print("Executes the 'clean' action:")
@@ -342,11 +370,18 @@ class InteractiveSession(Cmd):
 
     @staticmethod
     def help_deps():
-        print("Executes the 'deps' action with the current config, options and sources.")
+        print("Executes the 'deps' action:")
+        print("\t>: deps -> do action with current config, options and sources")
+        print("\t>: deps transitive -> do action and include transitive dependencies")
 
-    def do_deps(self, _):
+    def do_deps(self, args):
         try:
-            self._run_timed_action('deps')
+            if args.strip() == "transitive":
+                options = self.options.copy()
+                options["transitive"] = ""
+                self._run_timed_action('deps', with_options=options)
+            else:
+                self._run_timed_action('deps')
         except Exception as e:
             print(
                 "*** Exception encountered while processing action 'deps': [({0}) {1}]".format(
@@ -355,6 +390,29 @@ class InteractiveSession(Cmd):
                 )
             )
 
+    @staticmethod
+    def help_impact():
+        print("Executes the 'impact' action:")
+        print("\t>: impact -> do action for the 'source-file' in options")
+        print("\t>: impact <file path> -> do action for specified file (replaces 'source-file' in options)")
+
+    def do_impact(self, args):
+        try:
+            source_file = args.replace('"', '').replace('\'', '') if len(args) > 0 else None
+            if source_file is None:
+                self._run_timed_action('impact')
+            else:
+                options = self.options.copy()
+                options["source-file"] = source_file
+                self._run_timed_action('impact', with_options=options)
+        except Exception as e:
+            print(
+                "*** Exception encountered while processing action 'impact': [({0}) {1}]".format(
+                    e.__class__,
+                    e
+                )
+            )
+
     @staticmethod
     def help_graph():
         print("Executes the 'graph' action with the current config, options and sources.")
@@ -0,0 +1,384 @@
+# MIT License
+# Copyright (c) 2016 https://github.com/sndnv
+# See the project's LICENSE file for the full text
+
+import re
+
+from cadb.utils.Includes import PATTERN_COMMENTS_AND_LITERALS, PATTERN_CODE_LINE
+
+PATTERN_CONDITIONAL_DIRECTIVE = (
+    r"\n[ \t]*\#[ \t]*(?P<directive>ifdef|ifndef|if|elif|else|endif|define|undef|include)\b"
+    r"(?P<arguments>(?:[^\\\n]|\\(?:.|\n))*)"
+)
+
+PATTERN_SCAN_DIRECTIVES = re.compile(
+    "{0}|{1}".format(PATTERN_CONDITIONAL_DIRECTIVE, PATTERN_COMMENTS_AND_LITERALS),
+    re.MULTILINE
+)
+
+PATTERN_SCAN_DIRECTIVES_UNTIL_CODE = re.compile(
+    "{0}|{1}|{2}".format(PATTERN_CONDITIONAL_DIRECTIVE, PATTERN_CODE_LINE, PATTERN_COMMENTS_AND_LITERALS),
+    re.MULTILINE
+)
+
+PATTERN_ARGUMENT_COMMENTS = re.compile(r"/\*.*?\*/|//.*", re.DOTALL)
+
+PATTERN_EXPRESSION_TOKENS = re.compile(
+    r"\s*(?:(?P<number>(?:0[xX][0-9a-fA-F]+|\d+)[uUlL]*)"
+    r"|(?P<identifier>[A-Za-z_]\w*)"
+    r"|(?P<operator>&&|\|\||<<|>>|<=|>=|==|!=|[-+*/%<>!~&|^?:()])"
+    r"|(?P<other>\S))"
+)
+
+MAX_EXPANSION_DEPTH = 16
+
+
+class Macros:
+    def __init__(self, defined, undefined, assume_undefined=False):
+        """
+        Creates a new set of known macros, used for evaluating preprocessor conditions.
+
+        :param defined: dict of macros known to be defined (name -> value string)
+        :param undefined: set of macro names known to be undefined
+        :param assume_undefined: set to True to treat all other macros as undefined (as the preprocessor does);
+        otherwise, conditions using them cannot be evaluated and all of their branches are considered live
+        """
+        self.defined = defined
+        self.undefined = undefined
+        self.unknown = set()
+        self.assume_undefined = assume_undefined
+
+    def copy(self):
+        macros = Macros(dict(self.defined), set(self.undefined), self.assume_undefined)
+        macros.unknown = set(self.unknown)
+        return macros
+
+    def update(self, name, value=None, certain=True):
+        """
+        Updates the state of the specified macro, after a '#define' or '#undef'.
+
+        :param name: the macro name
+        :param value: the macro value (for '#define') or None (for '#undef')
+        :param certain: set to False if the directive is in a branch that is only possibly live; the state of the
+        macro becomes unknown
+        :return: nothing
+        """
+        self.defined.pop(name, None)
+        self.undefined.discard(name)
+        self.unknown.discard(name)
+
+        if not certain:
+            self.unknown.add(name)
+        elif value is not None:
+            self.defined[name] = value
+        else:
+            self.undefined.add(name)
+
+    def is_defined(self, name):
+        """
+        Checks if the specified macro is defined.
+
+        :param name: the macro name
+        :return: True or False, if the macro is known to be (un)defined or None, if it is unknown
+        """
+        if name in self.unknown:
+            return None
+        elif name in self.defined:
+            return True
+        elif name in self.undefined or self.assume_undefined:
+            return False
+        else:
+            return None
+
+
+def get_macros(compiler_options, conditionals_config):
+    """
+    Builds the set of known macros from the '-D'/'-U' compiler options and the supplied configuration.
+
+    :param compiler_options: list of compiler options
+    :param conditionals_config: the 'includes.conditionals' configuration
+    :return: the known macros (utils.Preprocessor.Macros)
+    """
+    defined = {}
+    undefined = set(conditionals_config.get('undefined', []))
+
+    options = iter(compiler_options)
+    for option in options:
+        if option.startswith("-D") or option.startswith("-U"):
+            macro = option[2:] or next(options, "")
+            name, _, value = macro.partition("=")
+            if option.startswith("-D"):
+                defined[name] = value if "=" in macro else "1"
+                undefined.discard(name)
+            else:
+                defined.pop(name, None)
+                undefined.add(name)
+
+    return Macros(defined, undefined, conditionals_config.get('assumeUndefined', False))
+
+
+def _and(left, right):
+    if left is False or right is False:
+        return False
+    elif left is None or right is None:
+        return None
+    else:
+        return True
+
+
+def _or(left, right):
+    if left is True or right is True:
+        return True
+    elif left is None or right is None:
+        return None
+    else:
+        return False
+
+
+def _not(value):
+    return None if value is None else not value
+
+
+def scan_live_includes(content, macros, stop_at_code=False):
+    """
+    Finds all include directives in the supplied file contents that are not disabled by preprocessor conditionals.
+
+    The '#if'/'#ifdef'/'#ifndef'/'#elif'/'#else'/'#endif' nesting is tracked and each condition is evaluated
+    against the supplied macros, updated with the '#define'/'#undef' directives found in the file. Every condition
+    that cannot be evaluated is treated as possibly true, so all of its branches are kept (conservative). The only
+    exception are include guards (a top-level '#ifndef X' directly followed by '#define X'), which are treated as
+    not defined, as they would be when the file is first included.
+
+    :param content: the file contents
+    :param macros: the known macros (utils.Preprocessor.Macros)
+    :param stop_at_code: set to True to stop scanning at the first line that starts with code
+    :return: list of the included paths, with their start/end characters (for example, ['<string>', '"a.h"'])
+    """
+    macros = macros.copy()
+    includes = []
+
+    # each frame is [parent branch live, any branch taken, current branch live]; all values are True/False/None
+    frames = []
+    live = True
+    guard = None
+
+    pattern = PATTERN_SCAN_DIRECTIVES_UNTIL_CODE if stop_at_code else PATTERN_SCAN_DIRECTIVES
+    for match in pattern.finditer("\n" + content):
+        directive = match.group('directive')
+        if directive is None:
+            if stop_at_code and match.group('code') is not None and live is not False:
+                break
+            continue
+
+        arguments = PATTERN_ARGUMENT_COMMENTS.sub(" ", match.group('arguments').replace("\\\n", " ")).strip()
+
+        if guard is not None:
+            if directive == "define" and arguments.split(" ")[0] == guard:
+                frames[-1][1] = frames[-1][2] = live = True
+            guard = None
+
+        if directive in ("if", "ifdef", "ifndef"):
+            if directive == "if":
+                condition = evaluate_condition(arguments, macros)
+            elif directive == "ifdef":
+                condition = macros.is_defined(arguments)
+            else:
+                condition = _not(macros.is_defined(arguments))
+
+            if directive == "ifndef" and condition is None and len(frames) == 0:
+                guard = arguments
+
+            frames.append([live, condition, _and(live, condition)])
+            live = frames[-1][2]
+        elif directive == "elif" and len(frames) > 0:
+            frame = frames[-1]
+            condition = evaluate_condition(arguments, macros)
+            frame[2] = _and(frame[0], _and(_not(frame[1]), condition))
+            frame[1] = _or(frame[1], condition)
+            live = frame[2]
+        elif directive == "else" and len(frames) > 0:
+            frame = frames[-1]
+            frame[2] = _and(frame[0], _not(frame[1]))
+            frame[1] = True
+            live = frame[2]
+        elif directive == "endif" and len(frames) > 0:
+            live = frames.pop()[0]
+        elif directive in ("define", "undef") and live is not False:
+            name, _, value = arguments.partition(" ")
+            name = name.split("(")[0]
+            if directive == "define":
+                macros.update(name, value.strip() or "1", certain=live is True)
+            else:
+                macros.update(name, None, certain=live is True)
+        elif directive == "include" and live is not False and len(arguments) > 0:
+            includes.append(arguments)
+
+    return includes
+
+
+def evaluate_condition(expression, macros):
+    """
+    Evaluates the supplied '#if'/'#elif' expression.
+
+    Integer literals, 'defined', macros with integer (or evaluable) values and the usual arithmetic, comparison,
+    logical and ternary operators are supported. Anything else (function-like macros, character literals,
+    '__has_include', etc.) makes the affected part of the expression unknown.
+
+    :param expression: the expression to evaluate
+    :param macros: the known macros (utils.Preprocessor.Macros)
+    :return: True/False or None, if the expression cannot be evaluated
+    """
+    value = _evaluate(expression, macros, 0)
+    return None if value is None else value != 0
+
+
+def _evaluate(expression, macros, depth):
+    if depth > MAX_EXPANSION_DEPTH:
+        return None
+
+    tokens = []
+    for match in PATTERN_EXPRESSION_TOKENS.finditer(expression):
+        if match.group('other') is not None:
+            return None
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+
+    try:
+        parser = _ExpressionParser(tokens, macros, depth)
+        value = parser.parse_ternary()
+        return value if parser.position == len(tokens) else None
+    except (IndexError, ValueError):
+        return None
+
+
+class _ExpressionParser:
+    BINARY_OPERATORS = [
+        ["||"], ["&&"], ["|"], ["^"], ["&"], ["==", "!="], ["<", ">", "<=", ">="], ["<<", ">>"], ["+", "-"],
+        ["*", "/", "%"]
+    ]
+
+    def __init__(self, tokens, macros, depth):
+        """
+        Creates a new recursive descent parser for preprocessor expressions; unknown values are represented by None.
+
+        :param tokens: the expression tokens, as (type, value) tuples
+        :param macros: the known macros
+        :param depth: the current macro expansion depth
+        """
+        self.tokens = tokens
+        self.macros = macros
+        self.depth = depth
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position][1] if self.position < len(self.tokens) else None
+
+    def take(self, expected=None):
+        token_type, token = self.tokens[self.position]
+        if expected is not None and token != expected:
+            raise ValueError("Expected [{0}] but found [{1}]".format(expected, token))
+        self.position += 1
+        return token_type, token
+
+    def parse_ternary(self):
+        condition = self.parse_binary(0)
+        if self.peek() == "?":
+            self.take("?")
+            when_true = self.parse_ternary()
+            self.take(":")
+            when_false = self.parse_ternary()
+            if condition is None:
+                return when_true if when_true == when_false else None
+            else:
+                return when_true if condition != 0 else when_false
+        return condition
+
+    def parse_binary(self, level):
+        if level == len(self.BINARY_OPERATORS):
+            return self.parse_unary()
+
+        left = self.parse_binary(level + 1)
+        while self.peek() in self.BINARY_OPERATORS[level]:
+            _, operator = self.take()
+            right = self.parse_binary(level + 1)
+            left = self.apply(operator, left, right)
+        return left
+
+    @staticmethod
+    def apply(operator, left, right):
+        if operator == "&&":
+            if left == 0 or right == 0:
+                return 0
+            return None if left is None or right is None else 1
+        elif operator == "||":
+            if (left is not None and left != 0) or (right is not None and right != 0):
+                return 1
+            return None if left is None or right is None else 0
+        elif left is None or right is None:
+            return None
+        elif operator in ("/", "%") and right == 0:
+            return None
+        else:
+            return {
+                "|": lambda: left | right,
+                "^": lambda: left ^ right,
+                "&": lambda: left & right,
+                "==": lambda: int(left == right),
+                "!=": lambda: int(left != right),
+                "<": lambda: int(left < right),
+                ">": lambda: int(left > right),
+                "<=": lambda: int(left <= right),
+                ">=": lambda: int(left >= right),
+                "<<": lambda: left << right if 0 <= right < 64 else None,
+                ">>": lambda: left >> right if 0 <= right < 64 else None,
+                "+": lambda: left + right,
+                "-": lambda: left - right,
+                "*": lambda: left * right,
+                "/": lambda: int(left / right),
+                "%": lambda: left - right * int(left / right)
+            }[operator]()
+
+    def parse_unary(self):
+        token = self.peek()
+        if token in ("!", "~", "-", "+"):
+            self.take()
+            value = self.parse_unary()
+            if value is None:
+                return None
+            return {"!": lambda: int(value == 0), "~": lambda: ~value, "-": lambda: -value, "+": lambda: value}[token]()
+        return self.parse_primary()
+
+    def parse_primary(self):
+        token_type, token = self.take()
+
+        if token == "(":
+            value = self.parse_ternary()
+            self.take(")")
+            return value
+        elif token_type == 'number':
+            return int(token.rstrip("uUlL"), 0) if not re.match(r"0\d", token) else int(token.rstrip("uUlL"), 8)
+        elif token_type == 'identifier':
+            if token == "defined":
+                parenthesized = self.peek() == "("
+                if parenthesized:
+                    self.take("(")
+                _, name = self.take()
+                if parenthesized:
+                    self.take(")")
+                defined = self.macros.is_defined(name)
+                return None if defined is None else int(defined)
+            elif self.peek() == "(":
+                # function-like macro or operator (such as '__has_include'); its arguments are skipped
+                nesting = 0
+                while True:
+                    _, current = self.take()
+                    nesting += 1 if current == "(" else -1 if current == ")" else 0
+                    if nesting == 0:
+                        return None
+            elif token in self.macros.defined:
+                return _evaluate(self.macros.defined[token], self.macros, self.depth + 1)
+            elif self.macros.is_defined(token) is False:
+                return 0
+            else:
+                return None
+        else:
+            raise ValueError("Unexpected token found: [{0}]".format(token))
@@ -0,0 +1,419 @@
+# MIT License
+# Copyright (c) 2016 https://github.com/sndnv
+# See the project's LICENSE file for the full text
+
+import hashlib
+import http.client
+import http.server
+import json
+import os
+import re
+import tempfile
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from cadb.utils import Build, FileSystem
+
+KEY_VERSION = "cadb-object-2"
+MANIFEST_KEY_VERSION = "cadb-manifest-1"
+KEY_HASH_ALGORITHM = "sha256"
+DEFAULT_TIMEOUT = 10
+DEFAULT_CONNECTIONS = 8
+DEFAULT_SERVER_ADDRESS = "127.0.0.1:8766"
+DEFAULT_SERVER_PATH = "cadb_cache"
+DEFAULT_MAX_OBJECT_SIZE = 256 * 1024 * 1024
+READ_BUFFER_SIZE = 65536
+
+PATTERN_OBJECT_PATH = re.compile(r"^/objects/(?P<key>[0-9a-f]{64})$")
+
+_prefetched = {}
+
+
+def get_build_digest(compiler_config):
+    """
+    Calculates a digest of the build settings that affect all object files: the compiler (its path and version, see
+    'Build.get_compiler_version') and its options.
+
+    :param compiler_config: the compiler configuration to be used
+    :return: the calculated digest
+    """
+    settings = [
+        KEY_VERSION,
+        compiler_config['path'],
+        Build.get_compiler_version(compiler_config['path']),
+        compiler_config['options']
+    ]
+    return hashlib.sha256(json.dumps(settings).encode()).hexdigest()
+
+
+def get_object_key(relative_path, file_hash, dependency_hashes, build_digest, extra=""):
+    """
+    Calculates the key of an object file, based on its source and internal dependencies.
+
+    This key does not cover the external (system) headers used by the source; objects are stored with a key that
+    also includes the hashes of those headers, as listed in the key's manifest (see 'get_headers_key' and
+    'fetch_cached_objects').
+
+    :param relative_path: the source file's path, relative to the sources directory
+    :param file_hash: the source file's content hash ('KEY_HASH_ALGORITHM')
+    :param dependency_hashes: a dict with the content hashes of all (transitive) internal dependencies of the source
+    file, keyed by their paths relative to the sources directory
+    :param build_digest: the build settings digest (see 'get_build_digest')
+    :param extra: any additional data that affects the compilation (default is empty)
+    :return: the calculated key
+    """
+    lines = [build_digest, extra, relative_path, file_hash]
+    lines.extend("{0}:{1}".format(path, dependency_hashes[path]) for path in sorted(dependency_hashes))
+    return hashlib.sha256("\n".join(lines).encode()).hexdigest()
+
+
+def get_manifest_key(key):
+    """
+    Calculates the key of the manifest of the supplied object key; the manifest lists all files included by the
+    object's source (see 'store_cached_objects').
+
+    :param key: the object key (see 'get_object_key')
+    :return: the manifest's key
+    """
+    return hashlib.sha256("{0}\n{1}".format(MANIFEST_KEY_VERSION, key).encode()).hexdigest()
+
+
+def get_headers_key(key, header_hashes):
+    """
+    Calculates the key with which an object is stored: the object key and the hashes of all files included by the
+    object's source.
+
+    :param key: the object key (see 'get_object_key')
+    :param header_hashes: a dict with the content hashes of all included files, keyed by their paths (as listed in
+    the manifest)
+    :return: the calculated key
+    """
+    lines = [key]
+    lines.extend("{0}:{1}".format(path, header_hashes[path]) for path in sorted(header_hashes))
+    return hashlib.sha256("\n".join(lines).encode()).hexdigest()
+
+
+def get_header_hashes(headers, sources_dir, known_hashes):
+    """
+    Calculates the content hashes of the supplied included files.
+
+    :param headers: the paths of the included files (as listed in a manifest; paths relative to the sources
+    directory or absolute paths)
+    :param sources_dir: the sources directory
+    :param known_hashes: a dict with already calculated hashes (keyed by full path), updated with all new hashes
+    :return: a dict with the hashes keyed by the supplied paths or None, if any of the files does not exist
+    """
+    header_hashes = {}
+    for header in headers:
+        header_path = os.path.join(os.path.abspath(sources_dir), header)
+        if header_path not in known_hashes:
+            if not os.path.isfile(header_path):
+                return None
+            known_hashes[header_path] = FileSystem.get_file_hash(header_path, KEY_HASH_ALGORITHM)
+        header_hashes[header] = known_hashes[header_path]
+
+    return header_hashes
+
+
+def get_object_url(url, key):
+    """
+    Builds the URL of the object with the specified key.
+
+    :param url: the cache's base URL
+    :param key: the object's key
+    :return: the object's URL
+    """
+    return "{0}/objects/{1}".format(url.rstrip("/"), key)
+
+
+def fetch_object(url, key, timeout=DEFAULT_TIMEOUT):
+    """
+    Retrieves the object with the specified key from the cache.
+
+    :param url: the cache's base URL
+    :param key: the object's key
+    :param timeout: the maximum time (in seconds) to wait for the cache (default is 'DEFAULT_TIMEOUT')
+    :return: the object's data or None, if the object is not in the cache
+    :raise: OSError if the cache cannot be used
+    """
+    try:
+        with urllib.request.urlopen(get_object_url(url, key), timeout=timeout) as response:
+            return response.read()
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            return None
+        raise
+    except http.client.HTTPException as e:
+        raise OSError("Invalid response received from cache: [{0}]".format(e))
+
+
+def store_object(url, key, data, timeout=DEFAULT_TIMEOUT):
+    """
+    Stores the supplied object data in the cache, with the specified key.
+
+    :param url: the cache's base URL
+    :param key: the object's key
+    :param data: the object's data
+    :param timeout: the maximum time (in seconds) to wait for the cache (default is 'DEFAULT_TIMEOUT')
+    :return: nothing
+    :raise: OSError if the cache cannot be used
+    """
+    request = urllib.request.Request(
+        get_object_url(url, key),
+        data=data,
+        method="PUT",
+        headers={'Content-Type': "application/octet-stream"}
+    )
+
+    try:
+        with urllib.request.urlopen(request, timeout=timeout):
+            pass
+    except http.client.HTTPException as e:
+        raise OSError("Invalid response received from cache: [{0}]".format(e))
+
+
+def prefetch_objects(cache_config, keys):
+    """
+    Starts retrieving the objects with the specified keys in the background; the results are used by
+    'fetch_objects'.
+
+    :param cache_config: the remote cache configuration
+    :param keys: the keys of the objects to retrieve
+    :return: nothing
+    """
+    if len(keys) > 0:
+        executor = ThreadPoolExecutor(max_workers=cache_config.get('connections', DEFAULT_CONNECTIONS))
+        for key in keys:
+            if key not in _prefetched:
+                _prefetched[key] = executor.submit(
+                    fetch_object,
+                    cache_config['url'],
+                    key,
+                    cache_config.get('timeout', DEFAULT_TIMEOUT)
+                )
+        executor.shutdown(wait=False)
+
+
+def fetch_objects(cache_config, keys):
+    """
+    Retrieves the objects with the specified keys from the cache, in parallel; prefetched objects are not retrieved
+    again.
+
+    :param cache_config: the remote cache configuration
+    :param keys: the keys of the objects to retrieve
+    :return: a tuple: (dict with the data of all objects found in the cache, keyed by their keys; list of errors)
+    """
+    with ThreadPoolExecutor(max_workers=cache_config.get('connections', DEFAULT_CONNECTIONS)) as executor:
+        results = {
+            key: _prefetched.pop(key, None) or executor.submit(
+                fetch_object,
+                cache_config['url'],
+                key,
+                cache_config.get('timeout', DEFAULT_TIMEOUT)
+            )
+            for key in keys
+        }
+
+        objects = {}
+        errors = []
+        for key, result in results.items():
+            try:
+                data = result.result()
+                if data is not None:
+                    objects[key] = data
+            except OSError as e:
+                errors.append(str(e))
+
+    return objects, errors
+
+
+def store_objects(cache_config, objects):
+    """
+    Stores the supplied objects in the cache, in parallel.
+
+    :param cache_config: the remote cache configuration
+    :param objects: a dict with the objects to store (the paths of object files or the objects' data, as bytes),
+    keyed by their keys
+    :return: a list of errors
+    """
+    def store(key, data):
+        if not isinstance(data, bytes):
+            with open(data, "rb") as object_file:
+                data = object_file.read()
+        store_object(cache_config['url'], key, data, cache_config.get('timeout', DEFAULT_TIMEOUT))
+
+    with ThreadPoolExecutor(max_workers=cache_config.get('connections', DEFAULT_CONNECTIONS)) as executor:
+        results = [executor.submit(store, key, data) for key, data in objects.items()]
+
+        errors = []
+        for result in results:
+            try:
+                result.result()
+            except OSError as e:
+                errors.append(str(e))
+
+    return errors
+
+
+def fetch_cached_objects(cache_config, keys, sources_dir):
+    """
+    Retrieves the object files with the specified keys from the cache.
+
+    The manifest of each key (see 'get_manifest_key') is retrieved first; the objects are then retrieved with keys
+    that include the current hashes of all files listed in their manifests (see 'get_headers_key'), so objects
+    built with different external (system) headers are never used.
+
+    :param cache_config: the remote cache configuration
+    :param keys: the object keys (see 'get_object_key')
+    :param sources_dir: the sources directory
+    :return: a tuple: (dict with the data of all objects found in the cache, keyed by their object keys; list of
+             errors)
+    """
+    manifests, errors = fetch_objects(cache_config, [get_manifest_key(key) for key in keys])
+
+    known_hashes = {}
+    object_keys = {}
+    for key in keys:
+        manifest = manifests.get(get_manifest_key(key))
+        if manifest is not None:
+            try:
+                headers = json.loads(manifest.decode())
+            except ValueError as e:
+                errors.append("Invalid manifest received for key [{0}]: [{1}]".format(key, e))
+                continue
+
+            header_hashes = get_header_hashes(headers, sources_dir, known_hashes)
+            if header_hashes is not None:
+                object_keys[get_headers_key(key, header_hashes)] = key
+
+    objects, object_errors = fetch_objects(cache_config, list(object_keys))
+    return {object_keys[current]: data for current, data in objects.items()}, errors + object_errors
+
+
+def store_cached_objects(cache_config, objects, sources_dir):
+    """
+    Stores the supplied object files in the cache, together with their manifests (see 'fetch_cached_objects').
+
+    :param cache_config: the remote cache configuration
+    :param objects: a dict with (object file path, list of included files) tuples, keyed by their object keys; the
+    included files are stored in the manifest as they are (see 'get_header_hashes')
+    :param sources_dir: the sources directory
+    :return: a list of errors
+    """
+    known_hashes = {}
+    uploads = {}
+    for key, (object_file_path, headers) in objects.items():
+        header_hashes = get_header_hashes(headers, sources_dir, known_hashes)
+        if header_hashes is not None:
+            uploads[get_manifest_key(key)] = json.dumps(sorted(headers)).encode()
+            uploads[get_headers_key(key, header_hashes)] = object_file_path
+
+    return store_objects(cache_config, uploads)
+
+
+class CacheRequestHandler(http.server.BaseHTTPRequestHandler):
+    def get_object_path(self):
+        """
+        Retrieves the file path of the requested object; sends an error response if the request path is not valid.
+
+        :return: the object's file path or None, if the request is not valid
+        """
+        match = PATTERN_OBJECT_PATH.match(self.path)
+        if match is None:
+            self.send_error(400, "Expected '/objects/<sha256 key>'")
+            return None
+
+        key = match.group('key')
+        return os.path.join(self.server.cache_dir, key[:2], key)
+
+    def do_GET(self):
+        object_path = self.get_object_path()
+        if object_path is not None:
+            try:
+                with open(object_path, "rb") as object_file:
+                    data = object_file.read()
+            except FileNotFoundError:
+                self.send_error(404)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    def do_PUT(self):
+        object_path = self.get_object_path()
+        if object_path is not None:
+            if self.server.read_only:
+                self.send_error(403, "Cache is read-only")
+                return
+
+            size = int(self.headers.get("Content-Length", -1))
+            if size < 0:
+                self.send_error(411)
+                return
+
+            if size > self.server.max_object_size:
+                # the body is not read, so the connection cannot be reused
+                self.close_connection = True
+                self.send_error(413, "Objects are limited to [{0}] bytes".format(self.server.max_object_size))
+                return
+
+            # objects are streamed to a temporary file first, so that readers never see partial objects
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(object_path))
+            remaining = size
+            try:
+                with os.fdopen(descriptor, "wb") as temp_file:
+                    while remaining > 0:
+                        data = self.rfile.read(min(remaining, READ_BUFFER_SIZE))
+                        if len(data) == 0:
+                            break
+                        temp_file.write(data)
+                        remaining -= len(data)
+            except OSError:
+                os.remove(temp_path)
+                raise
+
+            if remaining > 0:
+                os.remove(temp_path)
+                self.close_connection = True
+                self.log_message("Connection closed with [%d] byte(s) of the object remaining", remaining)
+                return
+
+            os.replace(temp_path, object_path)
+
+            self.send_response(201)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    def log_message(self, message_format, *args):
+        self.server.logger.info(
+            "[{0}]: {1}".format(self.client_address[0], message_format % args),
+            extra={'action': 'cache-server'}
+        )
+
+
+class CacheServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, cache_dir, logger, read_only=False, max_object_size=DEFAULT_MAX_OBJECT_SIZE):
+        """
+        Creates a new reference cache server, storing objects in a local directory.
+
+        Objects are retrieved with 'GET /objects/<key>' and stored with 'PUT /objects/<key>'; larger objects than the
+        maximum size are rejected (with '413').
+
+        :param address: the address to listen on, as a (host, port) tuple
+        :param cache_dir: the directory in which objects are stored
+        :param logger: the object used for logging
+        :param read_only: set to True to reject all 'PUT' requests (default is False)
+        :param max_object_size: the maximum size (in bytes) of a stored object (default is 'DEFAULT_MAX_OBJECT_SIZE')
+        """
+        super().__init__(address, CacheRequestHandler)
+        self.cache_dir = cache_dir
+        self.logger = logger
+        self.read_only = read_only
+        self.max_object_size = max_object_size
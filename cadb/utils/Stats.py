@@ -229,3 +229,77 @@ def get_external_deps_data(external_deps_by_use_count, external_dependencies, ro
         )
 
     return data
+
+
+def get_header_impact_data(sources_dir, headers_by_impact, header_impact, total_cost, costs_in_seconds, rows_count):
+    """
+    Builds table rows list containing data about the impact of changing header files (highest first).
+
+    :param sources_dir: configured sources directory
+    :param headers_by_impact: list of header files ordered by impact (lowest to highest)
+    :param header_impact: dict with the impact of all headers (see 'Processing.process_header_impact')
+    :param total_cost: the compile cost of all implementation files (full rebuild)
+    :param costs_in_seconds: True, if the compile costs are in seconds (otherwise, they are in lines of code)
+    :param rows_count: number of rows to build
+    :return: the requested table rows
+    """
+    data = [
+        ("--------------------------", "-------------", "------------", "---------"),
+        ("Highest Impact Header File", "Dependent TUs", "Rebuild Cost", "% of Full"),
+        ("--------------------------", "-------------", "------------", "---------")
+    ]
+
+    highest_impact_headers = headers_by_impact[-rows_count:]
+    highest_impact_headers.reverse()
+    for n in range(0, rows_count):
+        top = highest_impact_headers[n] if len(highest_impact_headers) > n else None
+
+        if top is not None:
+            dependents, cost = header_impact[top]
+            data.append(
+                (
+                    top.replace(sources_dir, '~'),
+                    len(dependents),
+                    "{0:.2f} s".format(cost) if costs_in_seconds else "{0:,.0f} LoC".format(cost),
+                    "{0:.1f} %".format(cost / total_cost * 100) if total_cost else "-"
+                )
+            )
+        else:
+            data.append(("-", "-", "-", "-"))
+
+    return data
+
+
+def get_cached_warnings_data(sources_dir, warnings_by_file, warnings_by_option, rows_count):
+    """
+    Builds table rows list containing data about the cached compiler warnings of up-to-date files (most first).
+
+    :param sources_dir: configured sources directory
+    :param warnings_by_file: dict with the number of cached warnings of each implementation file
+    :param warnings_by_option: dict with the number of cached warnings for each warning option (for example,
+    '-Wunused-variable')
+    :param rows_count: number of rows to build
+    :return: the requested table rows
+    """
+    data = [
+        ("------------------------------", "--------", "---------------------", "-----"),
+        ("File With Most Cached Warnings", "Warnings", "Most Frequent Warning", "Count"),
+        ("------------------------------", "--------", "---------------------", "-----")
+    ]
+
+    top_files = sorted(warnings_by_file, key=lambda current: (-warnings_by_file[current], current))[:rows_count]
+    top_options = sorted(warnings_by_option, key=lambda current: (-warnings_by_option[current], current))[:rows_count]
+    for n in range(0, rows_count):
+        top_file = top_files[n] if len(top_files) > n else None
+        top_option = top_options[n] if len(top_options) > n else None
+
+        data.append(
+            (
+                top_file.replace(sources_dir, '~') if top_file is not None else "-",
+                warnings_by_file[top_file] if top_file is not None else "-",
+                top_option if top_option is not None else "-",
+                warnings_by_option[top_option] if top_option is not None else "-"
+            )
+        )
+
+    return data
@@ -27,11 +27,12 @@ setup(
         'Intended Audience :: Developers',
         'License :: OSI Approved :: MIT License',
         'Natural Language :: English',
-        'Programming Language :: Python :: 3.5',
+        'Programming Language :: Python :: 3.7',
         'Topic :: Software Development :: Build Tools'
     ],
     keywords='cpp c++ build compile automation',
     packages=find_packages(),
+    python_requires='>=3.7',
     entry_points={
         'console_scripts': ['cadb=cadb.__main__:main']
     }